@@ -0,0 +1,139 @@
+"""Bounded per-session agent pool.
+
+Each session gets its own ReActAgent instance (session affinity) so that
+concurrent sessions never overwrite each other's memory. Instances share
+the model client and toolkit supplied by the factory. When the pool is full
+the least recently used idle agent is evicted.
+"""
+
+import asyncio
+import logging
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from typing import AsyncIterator, Callable, Tuple
+
+from agentscope.agent import ReActAgent
+
+
+class _PoolEntry:
+    """An agent bound to one session plus its request lock."""
+
+    def __init__(self, agent: ReActAgent):
+        self.agent = agent
+        self.lock = asyncio.Lock()
+        self.leases = 0
+        self.loaded = False
+
+
+class AgentPool:
+    """LRU pool of ReActAgent instances keyed by session.
+
+    Requests for the same session are serialized on the session's lock,
+    requests for different sessions run in parallel.
+    """
+
+    def __init__(self, factory: Callable[[], ReActAgent], max_size: int = 32):
+        """Initialize agent pool.
+
+        Args:
+            factory: Callable creating a new ReActAgent (sharing model/toolkit)
+            max_size: Maximum number of pooled agents (default 32)
+        """
+        if max_size < 1:
+            raise ValueError(f"max_size must be >= 1, got {max_size}")
+        self.factory = factory
+        self.max_size = max_size
+        self._entries: "OrderedDict[str, _PoolEntry]" = OrderedDict()
+        self._cond = asyncio.Condition()
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def session_key(session_id: str, user_id: str) -> str:
+        """Build the pool key for a user session."""
+        return f"{user_id}:{session_id}"
+
+    def _evict_idle(self) -> bool:
+        """Evict the least recently used idle agent.
+
+        Returns:
+            True if an agent was evicted, False if all agents are leased
+        """
+        for key, entry in self._entries.items():
+            if entry.leases == 0:
+                del self._entries[key]
+                logging.info(f"Agent 池淘汰会话 - Key: {key}")
+                return True
+        return False
+
+    async def _checkout(self, key: str) -> _PoolEntry:
+        """Get or create the entry for key, waiting if the pool is saturated."""
+        async with self._cond:
+            while True:
+                entry = self._entries.get(key)
+                if entry is not None:
+                    self._entries.move_to_end(key)
+                    entry.leases += 1
+                    return entry
+
+                if len(self._entries) < self.max_size or self._evict_idle():
+                    entry = _PoolEntry(self.factory())
+                    entry.leases += 1
+                    self._entries[key] = entry
+                    return entry
+
+                await self._cond.wait()
+
+    async def _release(self, key: str, entry: _PoolEntry, discard: bool) -> None:
+        async with self._cond:
+            entry.leases -= 1
+            if discard and self._entries.get(key) is entry:
+                del self._entries[key]
+            self._cond.notify_all()
+
+    @asynccontextmanager
+    async def lease(
+        self, session_id: str, user_id: str
+    ) -> AsyncIterator[Tuple[ReActAgent, bool]]:
+        """Lease the agent bound to a session.
+
+        Args:
+            session_id: Session identifier
+            user_id: User identifier
+
+        Yields:
+            Tuple of (agent, fresh). ``fresh`` is True when the agent's
+            state must be (re)loaded from the state service.
+            If the body raises, the agent is discarded so the next request
+            restores a clean state.
+        """
+        key = self.session_key(session_id, user_id)
+        entry = await self._checkout(key)
+        discard = False
+        try:
+            async with entry.lock:
+                try:
+                    yield entry.agent, not entry.loaded
+                    entry.loaded = True
+                except BaseException:
+                    entry.loaded = False
+                    discard = True
+                    raise
+        finally:
+            await self._release(key, entry, discard)
+
+    async def invalidate(self, session_id: str, user_id: str) -> None:
+        """Drop a session's agent from the pool if it is idle."""
+        key = self.session_key(session_id, user_id)
+        async with self._cond:
+            entry = self._entries.get(key)
+            if entry is not None and entry.leases == 0:
+                del self._entries[key]
+                self._cond.notify_all()
+
+    async def clear(self) -> None:
+        """Remove all pooled agents."""
+        async with self._cond:
+            self._entries.clear()
+            self._cond.notify_all()
@@ -1,16 +1,34 @@
 """Bounded memory with token limit management."""
 
+import asyncio
 import logging
-from typing import Union, Iterable, Any
+from collections import deque
+from contextlib import contextmanager
+from typing import Union, Iterable, Any, Optional
 from agentscope.memory import MemoryBase
 from agentscope.message import Msg
 
+from .content_reducer import reduce_content
+from .tokenizer import get_token_counter
+
 
 class BoundedMemory(MemoryBase):
     """Memory with token limit enforcement.
 
     Keeps only the most recent messages within token budget.
     Uses sliding window to maintain conversation context.
+
+    Messages live in a deque (O(1) eviction of the oldest message), token
+    estimates are memoized per message id and an id index makes duplicate
+    detection O(1), so adding a message costs amortized constant time.
+
+    With a ``summarizer`` configured, evicted messages are folded into a
+    rolling summary message that is kept in front of the window instead of
+    being dropped (see ``agent/memory_compaction.py``).
+
+    Changes since the last persisted state are tracked so that callers can
+    save an incremental delta (``state_delta``) instead of the full state
+    (see ``agent/state_journal.py``).
     """
 
     def __init__(
@@ -18,6 +36,10 @@ class BoundedMemory(MemoryBase):
         max_tokens: int = 100000,
         reserve_ratio: float = 0.7,
         max_single_message_tokens: int = 50000,
+        token_counter: Optional[Any] = None,
+        summarizer: Optional[Any] = None,
+        summary_max_tokens: int = 2000,
+        tool_result_clean_tokens: int = 2000,
     ):
         """Initialize bounded memory.
 
@@ -26,22 +48,117 @@ class BoundedMemory(MemoryBase):
             reserve_ratio: Reserve this ratio for response (default 0.7)
                           Actual limit = max_tokens * reserve_ratio
             max_single_message_tokens: Maximum tokens for a single message (default 50K)
+            token_counter: Token counter backend (default: shared counter from
+                ``get_token_counter``, BPE if configured else heuristic)
+            summarizer: Optional summarizer folding evicted messages into a
+                rolling summary (default None: evicted messages are dropped)
+            summary_max_tokens: Token budget of the rolling summary (default 2K)
+            tool_result_clean_tokens: Tool results above this size have HTML
+                boilerplate and base64 payloads stripped on add (default 2K)
         """
         super().__init__()
         self.max_tokens = max_tokens
         self.reserve_ratio = reserve_ratio
         self.effective_limit = int(max_tokens * reserve_ratio)
         self.max_single_message_tokens = max_single_message_tokens
-        self.content: list[Msg] = []
+        self.tool_result_clean_tokens = tool_result_clean_tokens
+        self.token_counter = token_counter or get_token_counter()
+        self.content: deque[Msg] = deque()
         self._estimated_tokens = 0
+        # msg.id -> [number of stored copies, estimated tokens]
+        self._index: dict[str, list[int]] = {}
+
+        self.summarizer = summarizer
+        self.summary_max_tokens = summary_max_tokens
+        self._summary: Optional[Msg] = None
+        self._summary_tokens = 0
+        # Summary text already refined by the model, plus evicted messages
+        # only folded in extractively so far
+        self._summary_base = ""
+        self._summary_pending: list[Msg] = []
+        self._summary_generation = 0
+        self._refine_task: Optional[asyncio.Task] = None
+
+        # Changes since the last persisted state (insertion-ordered by id)
+        self._exclude_content = False
+        self._mark_persisted()
 
     def state_dict(self) -> dict:
         """Convert memory to state dict."""
-        return {
-            "content": [_.to_dict() for _ in self.content],
+        state = {
+            "max_tokens": self.max_tokens,
+            "reserve_ratio": self.reserve_ratio,
+            "summary": self._summary.content if self._summary else None,
+        }
+        if not self._exclude_content:
+            state["content"] = [_.to_dict() for _ in self.content]
+        return state
+
+    @contextmanager
+    def content_excluded(self):
+        """Make ``state_dict`` skip the message content (used for deltas)."""
+        self._exclude_content = True
+        try:
+            yield
+        finally:
+            self._exclude_content = False
+
+    def _mark_persisted(self) -> None:
+        self._dirty_reset = False
+        self._dirty_added: dict[str, Msg] = {}
+        self._dirty_replaced: dict[str, Msg] = {}
+        self._dirty_removed: dict[str, None] = {}
+        self._summary_dirty = False
+
+    def state_delta(self) -> dict:
+        """Return the changes since the last ``mark_persisted`` call.
+
+        Returns:
+            dict with ``reset`` (content was cleared first), ``remove``
+            (ids), ``replace`` and ``append`` (message dicts) and, if it
+            changed, ``summary``; apply it with ``apply_state_delta``
+        """
+        delta = {
             "max_tokens": self.max_tokens,
             "reserve_ratio": self.reserve_ratio,
+            "reset": self._dirty_reset,
+            "remove": list(self._dirty_removed),
+            "replace": [_.to_dict() for _ in self._dirty_replaced.values()],
+            "append": [_.to_dict() for _ in self._dirty_added.values()],
+        }
+        if self._summary_dirty:
+            delta["summary"] = self._summary.content if self._summary else None
+        return delta
+
+    def mark_persisted(self) -> None:
+        """Mark the current state as persisted (resets delta tracking)."""
+        self._mark_persisted()
+
+    @staticmethod
+    def apply_state_delta(state: dict, delta: dict) -> dict:
+        """Apply a ``state_delta`` to a memory state dict.
+
+        Args:
+            state: Memory state dict (as returned by ``state_dict``)
+            delta: Delta as returned by ``state_delta``
+
+        Returns:
+            New memory state dict
+        """
+        content = [] if delta.get("reset") else state.get("content", [])
+        removed = set(delta.get("remove", []))
+        replaced = {_["id"]: _ for _ in delta.get("replace", [])}
+        if removed or replaced:
+            content = [
+                replaced.get(_["id"], _) for _ in content if _["id"] not in removed
+            ]
+        new_state = {
+            "content": content + delta.get("append", []),
+            "max_tokens": delta.get("max_tokens", state.get("max_tokens")),
+            "reserve_ratio": delta.get("reserve_ratio", state.get("reserve_ratio")),
+            "summary": delta["summary"] if "summary" in delta else state.get("summary"),
         }
+        return new_state
 
     def load_state_dict(
         self,
@@ -53,13 +170,24 @@ class BoundedMemory(MemoryBase):
         self.reserve_ratio = state_dict.get("reserve_ratio", self.reserve_ratio)
         self.effective_limit = int(self.max_tokens * self.reserve_ratio)
 
-        self.content = []
+        self.content = deque()
+        self._estimated_tokens = 0
+        self._index = {}
+        self._reset_summary(state_dict.get("summary"))
+        loaded = []
         for data in state_dict.get("content", []):
-            data.pop("type", None)
-            msg = Msg.from_dict(data)
-            self._add_message_safely(msg)
-
-        self._enforce_token_limit()
+            data = {k: v for k, v in data.items() if k != "type"}
+            loaded.append(Msg.from_dict(data))
+
+        # Count all restored messages in one bulk tokenizer call
+        counts = self.token_counter.count_batch([str(_.content) for _ in loaded])
+        for msg, tokens in zip(loaded, counts):
+            self._add_message_safely(msg, tokens)
+
+        # The loaded state is persisted; only load-time truncation and
+        # eviction below are recorded as changes
+        self._mark_persisted()
+        self._enforce_token_limit(loaded)
         logging.info(
             f"Loaded {len(self.content)} messages "
             f"(~{self._estimated_tokens} tokens, "
@@ -67,52 +195,61 @@ class BoundedMemory(MemoryBase):
         )
 
     def _estimate_tokens(self, msg: Msg) -> int:
-        """More accurate token estimation for a message.
+        """Count tokens of a message with the configured token counter."""
+        return self.token_counter.count(str(msg.content))
 
-        Uses different strategies based on content type:
-        - Text content: 1 token ≈ 3 characters (conservative)
-        - HTML/code: 1 token ≈ 4 characters (more dense)
-        - Binary/base64: 1 token ≈ 5 characters
-        """
-        text = str(msg.content)
-
-        if text.startswith("<!DOCTYPE html>") or text.startswith("<html"):
-            return len(text) // 4
-        elif text.startswith("data:") or len(text) // len(text.strip()) > 10:
-            return len(text) // 5
-        else:
-            return len(text) // 3
+    def _message_tokens(self, msg: Msg) -> int:
+        """Return the memoized token estimate of a stored message."""
+        entry = self._index.get(msg.id)
+        if entry is not None:
+            return entry[1]
+        return self._estimate_tokens(msg)
 
-    def _add_message_safely(self, msg: Msg) -> None:
+    def _add_message_safely(self, msg: Msg, tokens: Optional[int] = None) -> None:
         """Add message without enforcing limit."""
+        entry = self._index.get(msg.id)
+        if entry is None:
+            if tokens is None:
+                tokens = self._estimate_tokens(msg)
+            entry = self._index[msg.id] = [0, tokens]
+        entry[0] += 1
         self.content.append(msg)
-        self._estimated_tokens += self._estimate_tokens(msg)
-
-    def _truncate_message_content(self, msg: Msg, max_tokens: int) -> Msg:
-        """Truncate a single message's content if it exceeds token limit."""
-        current_tokens = self._estimate_tokens(msg)
+        self._estimated_tokens += entry[1]
+        self._dirty_added[msg.id] = msg
+
+    def _forget_message(self, msg: Msg) -> None:
+        """Update token total and id index after a message was removed."""
+        entry = self._index[msg.id]
+        self._estimated_tokens -= entry[1]
+        entry[0] -= 1
+        if entry[0] == 0:
+            del self._index[msg.id]
+            self._dirty_replaced.pop(msg.id, None)
+            if self._dirty_added.pop(msg.id, None) is None:
+                self._dirty_removed[msg.id] = None
+
+    def _truncate_message_content(
+        self, msg: Msg, max_tokens: Optional[int]
+    ) -> Msg:
+        """Reduce a single message's content, preserving its block structure.
 
-        if current_tokens <= max_tokens:
-            return msg
+        Args:
+            msg: Message to reduce
+            max_tokens: Token budget; None only strips HTML boilerplate and
+                base64 payloads
 
-        truncate_ratio = max_tokens / current_tokens
-        keep_length = int(len(str(msg.content)) * truncate_ratio)
+        Returns:
+            The original message if nothing changed, otherwise a reduced copy
+            with the same id
+        """
+        current_tokens = self._message_tokens(msg)
 
-        if isinstance(msg.content, str):
-            new_content = (
-                msg.content[:keep_length]
-                + "\n\n[... Content truncated due to size ...]"
-            )
-        elif isinstance(msg.content, list):
-            new_content = (
-                str(msg.content)[:keep_length] + "\n\n[... Content truncated ...]"
-            )
-        else:
-            new_content = (
-                str(msg.content)[:keep_length] + "\n\n[... Content truncated ...]"
-            )
+        if max_tokens is not None and current_tokens <= max_tokens:
+            return msg
 
-        from agentscope.message import Msg
+        new_content = reduce_content(msg.content, max_tokens, self.token_counter)
+        if new_content == msg.content:
+            return msg
 
         truncated_msg = Msg(
             name=msg.name,
@@ -120,84 +257,145 @@ class BoundedMemory(MemoryBase):
             role=msg.role,
             metadata=getattr(msg, "metadata", None),
         )
+        # Keep identity so duplicate detection still recognizes the message
+        truncated_msg.id = msg.id
+        truncated_msg.timestamp = msg.timestamp
 
+        new_tokens = self._estimate_tokens(truncated_msg)
         logging.warning(
-            f"Truncated message from {current_tokens} to {max_tokens} tokens "
-            f"(removed {current_tokens - max_tokens} tokens)"
+            f"Reduced message from {current_tokens} to {new_tokens} tokens "
+            f"(removed {current_tokens - new_tokens} tokens)"
         )
 
         return truncated_msg
 
-    def _enforce_token_limit(self) -> None:
-        """Remove oldest messages and truncate large messages until within token limit."""
-        for i in range(len(self.content)):
-            msg_tokens = self._estimate_tokens(self.content[i])
-            if msg_tokens > self.max_single_message_tokens:
-                self.content[i] = self._truncate_message_content(
-                    self.content[i], self.max_single_message_tokens
-                )
-                self._estimated_tokens -= msg_tokens
-                self._estimated_tokens += self._estimate_tokens(self.content[i])
+    @staticmethod
+    def _has_tool_result(msg: Msg) -> bool:
+        return isinstance(msg.content, list) and any(
+            isinstance(block, dict) and block.get("type") == "tool_result"
+            for block in msg.content
+        )
 
-        while self._estimated_tokens > self.effective_limit and len(self.content) > 0:
-            removed = self.content.pop(0)
-            self._estimated_tokens -= self._estimate_tokens(removed)
+    def _enforce_token_limit(self, new_msgs: list[Msg]) -> None:
+        """Reduce large new messages, then evict oldest messages.
+
+        Args:
+            new_msgs: Messages just appended; only these are checked against
+                ``max_single_message_tokens`` (older ones already were).
+        """
+        if new_msgs:
+            tail_start = len(self.content) - len(new_msgs)
+            for offset, msg in enumerate(new_msgs):
+                msg_tokens = self._message_tokens(msg)
+                if msg_tokens > self.max_single_message_tokens:
+                    budget = self.max_single_message_tokens
+                elif msg_tokens > self.tool_result_clean_tokens and (
+                    self._has_tool_result(msg)
+                ):
+                    budget = None
+                else:
+                    continue
+                truncated = self._truncate_message_content(msg, budget)
+                if truncated is msg:
+                    continue
+                new_tokens = self._estimate_tokens(truncated)
+                self.content[tail_start + offset] = truncated
+                if msg.id in self._dirty_added:
+                    self._dirty_added[msg.id] = truncated
+                else:
+                    self._dirty_replaced[msg.id] = truncated
+                entry = self._index[msg.id]
+                # Duplicated ids keep the (conservative) original estimate
+                if entry[0] == 1:
+                    entry[1] = new_tokens
+                    self._estimated_tokens += new_tokens - msg_tokens
+
+        while self._over_limit() and self.content:
+            evicted = []
+            while self._over_limit() and self.content:
+                msg = self.content.popleft()
+                self._forget_message(msg)
+                evicted.append(msg)
+            # Folding grows the summary, so re-check the limit afterwards
+            if self.summarizer is not None:
+                self._fold_evicted(evicted)
 
         if len(self.content) > 0:
             logging.info(
                 f"Memory: {len(self.content)} messages, ~{self._estimated_tokens} tokens "
                 f"(limit: {self.effective_limit})"
             )
-        elif isinstance(msg.content, list):
-            new_content = (
-                str(msg.content)[:keep_length] + "\n\n[... Content truncated ...]"
-            )
-        else:
-            new_content = (
-                str(msg.content)[:keep_length] + "\n\n[... Content truncated ...]"
-            )
-
-        # Create new message with truncated content
-        from agentscope.message import Msg
 
-        truncated_msg = Msg(
-            role=msg.role,
-            content=new_content,
-            name=getattr(msg, "name", None),
-            url=getattr(msg, "url", None),
+    def _over_limit(self) -> bool:
+        return self._estimated_tokens + self._summary_tokens > self.effective_limit
+
+    @property
+    def _summary_budget(self) -> int:
+        return min(self.summary_max_tokens, self.effective_limit // 2)
+
+    def _reset_summary(self, text: Optional[str] = None) -> None:
+        """Replace the rolling summary (None clears it)."""
+        self._summary_generation += 1
+        self._summary_base = text or ""
+        self._summary_pending = []
+        self._summary = None
+        self._summary_tokens = 0
+        self._summary_dirty = True
+        if text:
+            self._summary = Msg("memory_summary", text, "user")
+            self._summary_tokens = self.token_counter.count(text)
+
+    def _refresh_summary(self) -> None:
+        text = self.summarizer.summarize(
+            self._summary_base, self._summary_pending, self._summary_budget
         )
-
-        logging.warning(
-            f"Truncated message from {current_tokens} to {max_tokens} tokens "
-            f"(removed {current_tokens - max_tokens} tokens)"
+        self._summary = Msg("memory_summary", text, "user")
+        self._summary_tokens = self.token_counter.count(text)
+        self._summary_dirty = True
+
+    def _fold_evicted(self, evicted: list[Msg]) -> None:
+        """Fold evicted messages into the rolling summary."""
+        self._summary_pending.extend(evicted)
+        self._refresh_summary()
+        logging.info(
+            f"Compacted {len(evicted)} evicted messages into summary "
+            f"(~{self._summary_tokens} tokens)"
         )
 
-        return truncated_msg
+        if not hasattr(self.summarizer, "summarize_async"):
+            self._summary_base = self._summary.content
+            self._summary_pending = []
+            return
 
-    def _enforce_token_limit(self) -> None:
-        """Remove oldest messages and truncate large messages until within token limit."""
-        # Step 1: Truncate any single message that exceeds max_single_message_tokens
-        for i in range(len(self.content)):
-            msg_tokens = self._estimate_tokens(self.content[i])
-            if msg_tokens > self.max_single_message_tokens:
-                old_msg = self.content[i]
-                self.content[i] = self._truncate_message_content(
-                    self.content[i], self.max_single_message_tokens
+        if self._refine_task is not None and not self._refine_task.done():
+            return
+        try:
+            loop = asyncio.get_running_loop()
+        except RuntimeError:
+            # No loop (e.g. sync state loading): keep the extractive summary
+            return
+        self._refine_task = loop.create_task(self._refine_summary())
+
+    async def _refine_summary(self) -> None:
+        """Refine pending evictions with batched model calls."""
+        generation = self._summary_generation
+        while self._summary_pending:
+            batch = self._summary_pending[: self.summarizer.batch_size]
+            try:
+                text = await self.summarizer.summarize_async(
+                    self._summary_base, batch, self._summary_budget
                 )
-                # Update estimated tokens
-                self._estimated_tokens -= msg_tokens
-                self._estimated_tokens += self._estimate_tokens(self.content[i])
-
-        # Step 2: Remove oldest messages until within effective limit
-        while self._estimated_tokens > self.effective_limit and len(self.content) > 0:
-            removed = self.content.pop(0)
-            self._estimated_tokens -= self._estimate_tokens(removed)
-
-        if len(self.content) > 0:
-            logging.info(
-                f"Memory: {len(self.content)} messages, ~{self._estimated_tokens} tokens "
-                f"(limit: {self.effective_limit})"
-            )
+            except Exception as e:
+                logging.warning(f"模型摘要失败，保留抽取式摘要: {e}")
+                if generation == self._summary_generation:
+                    self._summary_base = self._summary.content
+                    self._summary_pending = []
+                return
+            if generation != self._summary_generation:
+                return
+            self._summary_base = text
+            del self._summary_pending[: len(batch)]
+            self._refresh_summary()
 
     async def add(
         self,
@@ -218,40 +416,54 @@ class BoundedMemory(MemoryBase):
             if not isinstance(msg, Msg):
                 raise TypeError(f"Expected Msg, got {type(msg)}")
 
-        if not allow_duplicates:
-            existing_ids = [_.id for _ in self.content]
-            memories = [_ for _ in memories if _.id not in existing_ids]
-
+        added = []
         for msg in memories:
+            if not allow_duplicates and msg.id in self._index:
+                continue
             self._add_message_safely(msg)
+            added.append(msg)
 
-        self._enforce_token_limit()
+        self._enforce_token_limit(added)
 
     async def size(self) -> int:
         """Return number of messages in memory."""
         return len(self.content)
 
     async def get_memory(self) -> list[Msg]:
-        """Get memory content."""
-        return self.content
+        """Get memory content (rolling summary first, if any)."""
+        if self._summary is not None:
+            return [self._summary, *self.content]
+        return list(self.content)
 
     async def clear(self) -> None:
         """Clear memory."""
-        self.content = []
+        self.content = deque()
         self._estimated_tokens = 0
+        self._index = {}
+        self._reset_summary()
+        self._mark_persisted()
+        self._dirty_reset = True
+        self._summary_dirty = True
 
     async def delete(self, index: Union[Iterable, int]) -> None:
-        """Delete messages by index."""
+        """Delete messages by index (as returned by ``get_memory``)."""
         if isinstance(index, int):
             index = [index]
 
-        invalid_index = [_ for _ in index if 0 > _ or _ >= len(self.content)]
+        offset = 1 if self._summary is not None else 0
+        invalid_index = [_ for _ in index if 0 > _ or _ >= len(self.content) + offset]
         if invalid_index:
             raise IndexError(f"Invalid index: {invalid_index}")
 
-        for idx in sorted(index, reverse=True):
-            removed = self.content.pop(idx)
-            self._estimated_tokens -= self._estimate_tokens(removed)
+        if offset:
+            if 0 in index:
+                self._reset_summary()
+            index = [_ - 1 for _ in index if _ != 0]
+
+        for idx in sorted(set(index), reverse=True):
+            removed = self.content[idx]
+            del self.content[idx]
+            self._forget_message(removed)
 
     async def retrieve(self, *args: Any, **kwargs: Any) -> None:
         """Retrieve not implemented."""
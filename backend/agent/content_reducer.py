@@ -0,0 +1,208 @@
+"""Structure-aware reduction of message content.
+
+Shrinks large messages (typically playwright snapshots and fetched pages in
+tool results) without destroying the content block structure:
+- HTML: drops scripts, styles, navigation and other boilerplate elements
+- base64 payloads: replaced by a short reference
+- long text: keeps the head and the tail
+- ToolUse inputs: counted as serialized JSON; their string values are
+  shortened like text, and whole inputs are elided (largest first) when the
+  message is still over budget
+- ToolUse/ToolResult/text blocks keep their type and ids; inline media with
+  base64 data becomes a text reference block
+"""
+
+import copy
+import hashlib
+import json
+import re
+from typing import Any, Optional, Union
+
+_HTML_BOILERPLATE = re.compile(
+    r"<(script|style|noscript|nav|header|footer|svg|iframe|template)\b[^>]*>"
+    r".*?</\1\s*>",
+    re.IGNORECASE | re.DOTALL,
+)
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.DOTALL)
+_HTML_VOID_BOILERPLATE = re.compile(r"<(?:link|meta)\b[^>]*>", re.IGNORECASE)
+_BLANK_LINES = re.compile(r"\n\s*\n+")
+_DATA_URL = re.compile(r"data:[\w/+.\-]+;base64,[A-Za-z0-9+/=\s]{256,}")
+_BASE64_RUN = re.compile(r"[A-Za-z0-9+/]{512,}={0,2}")
+_HTML_HINT = re.compile(r"<(?:!DOCTYPE|html|head|body|div|script)\b", re.IGNORECASE)
+
+_MEDIA_TYPES = ("image", "audio", "video")
+_HEAD_RATIO = 0.6
+
+
+def _payload_ref(payload: str, kind: str = "base64") -> str:
+    digest = hashlib.sha1(payload.encode("utf-8")).hexdigest()[:12]
+    return f"[{kind} 数据已省略: {len(payload)} 字符, sha1={digest}]"
+
+
+def _base64_ref(match: re.Match) -> str:
+    run = match.group(0)
+    # Real base64 mixes cases and digits; long runs of one class are kept
+    if run.isdigit() or run.isalpha() and (run.islower() or run.isupper()):
+        return run
+    return _payload_ref(run)
+
+
+def clean_text(text: str) -> str:
+    """Drop HTML boilerplate and base64 payloads from text."""
+    text = _DATA_URL.sub(lambda m: _payload_ref(m.group(0), "data URL"), text)
+    text = _BASE64_RUN.sub(_base64_ref, text)
+    if _HTML_HINT.search(text):
+        text = _HTML_BOILERPLATE.sub("", text)
+        text = _HTML_COMMENT.sub("", text)
+        text = _HTML_VOID_BOILERPLATE.sub("", text)
+        text = _BLANK_LINES.sub("\n", text)
+    return text
+
+
+def head_tail(text: str, max_chars: int) -> str:
+    """Keep the head and tail of text within ``max_chars``."""
+    if len(text) <= max_chars:
+        return text
+    head = int(max_chars * _HEAD_RATIO)
+    tail = max(max_chars - head, 0)
+    omitted = len(text) - head - tail
+    return (
+        text[:head]
+        + f"\n\n[... 内容过长，已省略 {omitted} 字符 ...]\n\n"
+        + (text[-tail:] if tail else "")
+    )
+
+
+def _media_ref(block: dict) -> Optional[dict]:
+    source = block.get("source")
+    if not isinstance(source, dict) or source.get("type") != "base64":
+        return None
+    data = source.get("data", "")
+    media_type = source.get("media_type", block["type"])
+    return {"type": "text", "text": f"[{media_type} {_payload_ref(data)}]"}
+
+
+class _TextSlots:
+    """Collects references to every text field inside a content tree."""
+
+    def __init__(self):
+        self.slots: list[tuple[Any, Any]] = []
+        # Number of slots outside tool_use inputs (collected first)
+        self.text_count = 0
+        self.tool_uses: list[dict] = []
+
+    def get(self, i: int) -> str:
+        container, key = self.slots[i]
+        return container[key]
+
+    def set(self, i: int, value: str) -> None:
+        container, key = self.slots[i]
+        container[key] = value
+
+    def collect_blocks(self, blocks: list) -> None:
+        for i, block in enumerate(blocks):
+            if not isinstance(block, dict):
+                continue
+            block_type = block.get("type")
+            if block_type in _MEDIA_TYPES:
+                ref = _media_ref(block)
+                if ref is not None:
+                    blocks[i] = block = ref
+                    block_type = "text"
+            if block_type == "text" and isinstance(block.get("text"), str):
+                self.slots.append((block, "text"))
+            elif block_type == "thinking" and isinstance(block.get("thinking"), str):
+                self.slots.append((block, "thinking"))
+            elif block_type == "tool_result":
+                output = block.get("output")
+                if isinstance(output, str):
+                    self.slots.append((block, "output"))
+                elif isinstance(output, list):
+                    self.collect_blocks(output)
+            elif block_type == "tool_use" and isinstance(
+                block.get("input"), (dict, list)
+            ):
+                self.tool_uses.append(block)
+        self.text_count = len(self.slots)
+
+    def collect_tool_inputs(self) -> None:
+        for block in self.tool_uses:
+            self._collect_values(block["input"])
+
+    def _collect_values(self, container: Union[dict, list]) -> None:
+        keys = container.keys() if isinstance(container, dict) else range(len(container))
+        for key in keys:
+            value = container[key]
+            if isinstance(value, str):
+                self.slots.append((container, key))
+            elif isinstance(value, (dict, list)):
+                self._collect_values(value)
+
+    def measure(self, token_counter: Any) -> int:
+        """Tokens of the text fields plus the serialized tool_use inputs."""
+        texts = [self.get(i) for i in range(self.text_count)]
+        texts += [
+            json.dumps(block["input"], ensure_ascii=False) for block in self.tool_uses
+        ]
+        return token_counter.count("".join(texts))
+
+    def shrink(self, total_tokens: int, max_tokens: int) -> None:
+        """Share the character budget among all text fields by size."""
+        texts = [self.get(i) for i in range(len(self.slots))]
+        total_chars = sum(len(text) for text in texts)
+        if not total_chars:
+            return
+        char_budget = int(total_chars * max_tokens / total_tokens * 0.95)
+        for i, text in enumerate(texts):
+            share = max(int(char_budget * len(text) / total_chars), 0)
+            self.set(i, head_tail(text, share))
+
+
+def reduce_content(
+    content: Union[str, list],
+    max_tokens: Optional[int],
+    token_counter: Any,
+) -> Union[str, list]:
+    """Reduce message content while preserving its block structure.
+
+    Args:
+        content: Message content (string or list of content blocks)
+        max_tokens: Token budget; None only cleans (boilerplate, base64)
+        token_counter: Counter with ``count`` used to measure the result
+
+    Returns:
+        Reduced copy of the content (the input is not modified)
+    """
+    if isinstance(content, str):
+        holder = [{"type": "text", "text": content}]
+    else:
+        holder = copy.deepcopy(content)
+
+    slots = _TextSlots()
+    slots.collect_blocks(holder)
+    slots.collect_tool_inputs()
+    for i in range(len(slots.slots)):
+        slots.set(i, clean_text(slots.get(i)))
+
+    if max_tokens is not None:
+        total_tokens = slots.measure(token_counter)
+        if total_tokens > max_tokens:
+            slots.shrink(total_tokens, max_tokens)
+            total_tokens = slots.measure(token_counter)
+        # Key names and non-string values of tool_use inputs cannot be
+        # shortened; elide whole inputs, largest first, while still over
+        tool_uses = sorted(
+            slots.tool_uses,
+            key=lambda block: len(json.dumps(block["input"], ensure_ascii=False)),
+            reverse=True,
+        )
+        for block in tool_uses:
+            if total_tokens <= max_tokens:
+                break
+            payload = json.dumps(block["input"], ensure_ascii=False)
+            block["input"] = {"_omitted": _payload_ref(payload, "tool_use input")}
+            total_tokens = slots.measure(token_counter)
+
+    if isinstance(content, str):
+        return holder[0]["text"]
+    return holder
@@ -10,16 +10,36 @@ from agentscope_runtime.engine.schemas.agent_schemas import (
 )
 from agent.simple_agent import simple_agent_fucntion
 from agent.scrapy_agent import scrapy_agent_fucntion
-from config import mcp_servers_config, main_agent_sys_prompt
+from config import (
+    MCP_LAZY_START,
+    SESSION_TTL_SECONDS,
+    STATE_BACKEND,
+    STATE_DB_PATH,
+    UPLOAD_GC_INTERVAL,
+    UPLOAD_QUOTA_BYTES,
+    UPLOAD_TTL_SECONDS,
+    UPLOAD_USER_QUOTA_BYTES,
+    mcp_servers_config,
+    mcp_pool_config,
+    main_agent_sys_prompt,
+)
 from agentscope.tool import Toolkit
 from agentscope.formatter import OpenAIChatFormatter
-from agentscope.mcp import StdIOStatefulClient
 from agentscope_runtime.engine.app import AgentApp
 from agentscope.agent import ReActAgent
 from agentscope.message import Msg
 from agentscope.model import OpenAIChatModel
-from agentscope.plan import PlanNotebook
 from .bounded_memory import BoundedMemory
+from .agent_pool import AgentPool
+from .memory_compaction import ExtractiveSummarizer, ModelSummarizer
+from .mcp_pool import MCPPoolManager, mcp_affinity, set_mcp_pool_manager
+from .state_journal import StateJournal, StateServiceJournalBackend
+from .sqlite_store import (
+    SQLiteDatabase,
+    SQLiteJournalBackend,
+    SQLiteSessionHistoryService,
+    SQLiteStateService,
+)
 from agentscope.pipeline import stream_printing_messages
 from agentscope_runtime.engine.services.agent_state import (
     InMemoryStateService,
@@ -33,8 +53,29 @@ from agentscope_runtime.engine.services.session_history.session_history_service
 import sys
 
 sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
-from util.file_util import process_file_content, process_messages
-from api.file_api import UploadRequest, upload_file_handler, serve_file_handler
+from util.file_util import (
+    PARTIAL_DIR,
+    blob_store,
+    extraction_cache,
+    forget_chunked_upload,
+    index_legacy_uploads,
+    process_file_content,
+    process_messages,
+    upload_index,
+    wait_pending_uploads,
+)
+from util.upload_retention import UploadRetention, set_upload_retention
+from tools.attachment_reader import read_attachment
+from services.scrapy_service import create_collection_scheduler
+from api.file_api import (
+    UploadRequest,
+    chunked_upload_handler,
+    list_files_handler,
+    serve_file_handler,
+    upload_file_handler,
+)
+from fastapi import Request
+from fastapi.responses import JSONResponse
 
 SKILLS_DIR = os.path.join(os.path.dirname(__file__), "../skills")
 
@@ -49,51 +90,98 @@ agent_app = AgentApp(
 @agent_app.init
 async def init_func(self):
     logging.info("初始化 scrapy_agent 应用...")
-    self.state_service = InMemoryStateService()
-    self.session_service = InMemorySessionHistoryService()
+    if STATE_BACKEND == "sqlite":
+        state_db = SQLiteDatabase(
+            STATE_DB_PATH, ttl_seconds=SESSION_TTL_SECONDS or None
+        )
+        self.state_service = SQLiteStateService(state_db)
+        self.session_service = SQLiteSessionHistoryService(state_db)
+        journal_backend = SQLiteJournalBackend(self.state_service)
+    else:
+        state_db = None
+        self.state_service = InMemoryStateService()
+        self.session_service = InMemorySessionHistoryService()
+        journal_backend = StateServiceJournalBackend(self.state_service)
 
     await self.state_service.start()
     await self.session_service.start()
 
-    # 初始化信号量，控制 MCP 客户端并发访问
-    self.mcp_semaphore = asyncio.Semaphore(1)
+    # 增量状态持久化：快照 + 追加日志，后台压缩
+    self.state_journal = StateJournal(
+        journal_backend,
+        compact_every=int(os.getenv("STATE_COMPACT_EVERY", "20")),
+    )
+
+    # 过期会话：清理日志记录并移出 Agent 池，下次请求从空状态开始
+    if state_db is not None:
+        state_db.add_expire_listener(self.state_journal.forget)
+        state_db.add_expire_listener(
+            lambda user_id, session_id: self.agent_pool.invalidate(
+                session_id, user_id
+            )
+        )
+
+    # 上传目录后台清理（过期、超额淘汰、孤立文件、提取文本）与单用户配额
+    self.upload_retention = UploadRetention(
+        upload_index,
+        blob_store,
+        PARTIAL_DIR,
+        max_age=UPLOAD_TTL_SECONDS or None,
+        global_quota=UPLOAD_QUOTA_BYTES or None,
+        user_quota=UPLOAD_USER_QUOTA_BYTES or None,
+        interval=UPLOAD_GC_INTERVAL,
+        extraction_cache=extraction_cache,
+        on_partial_removed=forget_chunked_upload,
+    )
+    set_upload_retention(self.upload_retention)
+    await asyncio.to_thread(index_legacy_uploads)
+    self.upload_retention.start()
+
+    # 初始化 MCP 连接池（并发启动常驻进程，带存活检测与自动重启；
+    # MCP_LAZY_START=true 时首次调用工具才启动进程）
+    self.mcp_pools = MCPPoolManager(
+        mcp_servers_config, mcp_pool_config, lazy=MCP_LAZY_START
+    )
+    await self.mcp_pools.start()
+    set_mcp_pool_manager(self.mcp_pools)
 
-    # 初始化 MCP 客户端（应用启动时一次性创建）
-    self.mcp_clients: dict[str, StdIOStatefulClient] = {}
-    await _init_mcp_clients(self.mcp_clients)
+    # 预构建子 Agent 使用的搜索工具集快照（懒启动时在首次调用子 Agent 时构建）
+    if not MCP_LAZY_START:
+        await self.mcp_pools.get_search_toolkit()
 
-    # 初始化全局 Agent（复用以减少开销）
+    # 初始化 Agent 池（按会话复用，共享模型与工具集）
     await _init_agent(self)
 
+    # 定时采集（config.yaml 的 schedule 段，默认关闭）
+    self.collection_scheduler = create_collection_scheduler()
+    if self.collection_scheduler is not None:
+        self.collection_scheduler.start()
+
     logging.info("初始化完成")
 
 
 @agent_app.shutdown
 async def shutdown_func(self):
     logging.info("关闭 scrapy_agent 应用...")
+    if self.collection_scheduler is not None:
+        await self.collection_scheduler.stop()
+    await self.state_journal.close()
     await self.state_service.stop()
-    for name, client in self.mcp_clients.items():
-        if client.is_connected:
-            logging.info(f"关闭 MCP 客户端: {name}")
-            await client.close()
-    self.mcp_clients.clear()
+    set_mcp_pool_manager(None)
+    await self.mcp_pools.close()
     await self.session_service.stop()
-    self.agent = None
+    await self.agent_pool.clear()
+    await wait_pending_uploads()
+    set_upload_retention(None)
+    await self.upload_retention.stop()
     logging.info("应用已关闭")
 
 
 async def _init_agent(app_instance) -> None:
-    """Initialize global ReActAgent instance."""
+    """Initialize the shared model/toolkit and the per-session agent pool."""
     toolkit = Toolkit()
 
-    async with app_instance.mcp_semaphore:
-        for name, client in app_instance.mcp_clients.items():
-            logging.info(f"注册 MCP 客户端: {name}")
-            try:
-                await toolkit.register_mcp_client(client)
-                logging.info(f"MCP 工具 {name} 注册成功")
-            except Exception as e:
-                logging.warning(f"MCP 客户端 {name} 注册失败: {e}")
+    await app_instance.mcp_pools.register_tools(toolkit)
 
     for skill_name in os.listdir(SKILLS_DIR):
         skill_path = os.path.join(SKILLS_DIR, skill_name)
@@ -103,66 +191,67 @@ async def _init_agent(app_instance) -> None:
             toolkit.register_agent_skill(skill_path)
             logging.info(f"Skill {skill_name} 注册成功 !")
 
-    notebook = PlanNotebook()
-    model_name = os.getenv("model_name")
-    logging.info(f"创建全局 ReActAgent - Model: {model_name}")
-
-    max_tokens = int(os.getenv("MAX_CONTEXT_TOKENS", "150000"))
-    memory = BoundedMemory(
-        max_tokens=max_tokens, reserve_ratio=0.6, max_single_message_tokens=50000
-    )
-    logging.info(
-        f"初始化 BoundedMemory - Max: {max_tokens}, Effective: {int(max_tokens * 0.7)}"
-    )
-
     toolkit.register_tool_function(scrapy_agent_fucntion)
+    toolkit.register_tool_function(read_attachment)
 
-    app_instance.agent = ReActAgent(
-        name="main_agent",
-        sys_prompt=main_agent_sys_prompt,
-        model=OpenAIChatModel(
-            model_name=model_name,
-            api_key=os.getenv("api_key"),
-            client_kwargs={"base_url": os.getenv("base_url")},
-        ),
-        max_iters=90,
-        toolkit=toolkit,
-        memory=memory,
-        # plan_notebook=notebook,
-        formatter=OpenAIChatFormatter(),
+    model_name = os.getenv("model_name")
+    model = OpenAIChatModel(
+        model_name=model_name,
+        api_key=os.getenv("api_key"),
+        client_kwargs={"base_url": os.getenv("base_url")},
     )
+    formatter = OpenAIChatFormatter()
+    max_tokens = int(os.getenv("MAX_CONTEXT_TOKENS", "150000"))
+    pool_size = int(os.getenv("AGENT_POOL_SIZE", "32"))
+
+    # 上下文压缩模式：off（直接丢弃最早消息）/ extractive（本地抽取式摘要）/
+    # model（抽取式摘要 + 异步批量模型摘要）
+    compaction = os.getenv("MEMORY_COMPACTION", "off").lower()
+    summarizer = None
+    if compaction == "extractive":
+        summarizer = ExtractiveSummarizer()
+    elif compaction == "model":
+        summarizer = ModelSummarizer(model, formatter)
+
+    def _create_agent() -> ReActAgent:
+        memory = BoundedMemory(
+            max_tokens=max_tokens,
+            reserve_ratio=0.6,
+            max_single_message_tokens=50000,
+            summarizer=summarizer,
+        )
+        return ReActAgent(
+            name="main_agent",
+            sys_prompt=main_agent_sys_prompt,
+            model=model,
+            max_iters=90,
+            toolkit=toolkit,
+            memory=memory,
+            formatter=formatter,
+        )
 
-
-async def _init_mcp_clients(mcp_clients_dict: dict) -> None:
-    """Initialize all MCP clients at application startup."""
-    for name, config in mcp_servers_config.items():
-        logging.info(f"初始化 MCP 服务器: {name}")
-        try:
-            client = StdIOStatefulClient(name, **config)
-            await client.connect()
-            mcp_clients_dict[name] = client
-            logging.info(f"MCP 客户端 {name} 连接成功")
-        except Exception as e:
-            logging.error(f"MCP 客户端 {name} 连接失败: {e}", exc_info=True)
+    app_instance.agent_pool = AgentPool(_create_agent, max_size=pool_size)
+    logging.info(
+        f"初始化 Agent 池 - Model: {model_name}, PoolSize: {pool_size}, "
+        f"MaxTokens: {max_tokens}, Effective: {int(max_tokens * 0.6)}, "
+        f"Compaction: {compaction}"
+    )
 
 
-async def _load_agent_state(self, session_id: str, user_id: str) -> bool:
-    """Load agent state from state service.
+async def _load_agent_state(
+    self, agent: ReActAgent, session_id: str, user_id: str
+) -> bool:
+    """Load agent state (snapshot + delta log) from the state journal.
 
     Args:
+        agent: Agent leased for this session
         session_id: Session identifier
         user_id: User identifier
 
     Returns:
         True if state was loaded, False if no state existed
     """
-    state = await self.state_service.export_state(
-        session_id=session_id,
-        user_id=user_id,
-    )
-    if state:
-        logging.info(f"加载历史状态成功 - SessionID: {session_id}")
-        self.agent.load_state_dict(state)
+    if await self.state_journal.load(agent, user_id, session_id):
         logging.info(f"恢复 agent 状态 - SessionID: {session_id}")
         return True
     else:
@@ -170,38 +259,76 @@ async def _load_agent_state(self, session_id: str, user_id: str) -> bool:
         return False
 
 
-async def _save_agent_state(self, session_id: str, user_id: str) -> None:
-    """Save current agent state to state service.
+async def _save_agent_state(
+    self, agent: ReActAgent, session_id: str, user_id: str
+) -> None:
+    """Save the agent's changes since the last save to the state journal.
 
     Args:
+        agent: Agent leased for this session
         session_id: Session identifier
         user_id: User identifier
     """
-    state = self.agent.state_dict()
-    await self.state_service.save_state(
-        user_id=user_id,
-        session_id=session_id,
-        state=state,
-    )
+    await self.state_journal.save(agent, user_id, session_id)
     logging.info(f"保存状态成功 - SessionID: {session_id}")
 
 
-@agent_app.endpoint("/files/{file_id}")
-async def file_handler(file_id: str):
+@agent_app.endpoint("/files/{file_id}", methods=["GET"])
+async def file_handler(file_id: str, request: Request):
     """Serve uploaded files by file_id.
 
     Args:
         file_id: UUID of the uploaded file
+        request: HTTP request (Range and conditional headers are honored)
+
+    Returns:
+        File content with appropriate Content-Type header (206 for ranges,
+        304 if not modified) or 404 error if file not found
+    """
+    return await serve_file_handler(file_id, request.headers)
+
+
+@agent_app.endpoint("/files", methods=["GET"])
+async def files_list_handler(user_id: str, limit: int = 100, offset: int = 0):
+    """List a user's uploaded files, newest first.
+
+    Args:
+        user_id: Owner whose files are listed (required)
+        limit: Maximum number of files (at most 1000)
+        offset: Number of files to skip
+
+    Returns:
+        dict with files metadata and total_size in bytes, or error with
+        HTTP 400 if user_id is empty
+    """
+    result = await list_files_handler(user_id, limit, offset)
+    if "status" in result:
+        return JSONResponse(result, status_code=result["status"])
+    return result
+
+
+@agent_app.endpoint("/mcp/metrics")
+async def mcp_metrics_handler():
+    """Report MCP connection pool utilization.
 
     Yields:
-        File content with appropriate Content-Type header
-        or 404 error if file not found
+        dict mapping server name to its pool metrics
     """
-    result = await serve_file_handler(file_id)
-    if "status" in result and result["status"] != 200:
-        yield {"error": result.get("error"), "status": result.get("status")}
-    else:
-        yield result
+    yield agent_app.mcp_pools.metrics()
+
+
+@agent_app.endpoint("/collection/schedule")
+async def collection_schedule_handler():
+    """Report the periodic collection jobs.
+
+    Yields:
+        dict with enabled and the schedule state of every job
+    """
+    scheduler = agent_app.collection_scheduler
+    yield {
+        "enabled": scheduler is not None,
+        "jobs": scheduler.status() if scheduler is not None else [],
+    }
 
 
 @agent_app.endpoint("/upload")
@@ -222,6 +349,52 @@ async def upload_handler(body: UploadRequest):
         yield result
 
 
+@agent_app.endpoint("/upload/stream")
+async def stream_upload_handler(
+    request: Request,
+    filename: str = "uploaded_file",
+    upload_id: Optional[str] = None,
+    offset: int = 0,
+    final: bool = True,
+    user_id: Optional[str] = None,
+):
+    """Handle a streaming (chunked, resumable) upload of the raw request body.
+
+    Send the file bytes as the body (``application/octet-stream``). Large
+    files can be split: send ``final=false`` for all but the last chunk and
+    pass the returned upload_id and offset with the next chunk. After a
+    dropped connection, resume from the offset in the error response.
+
+    Args:
+        request: HTTP request whose body is streamed to disk
+        filename: Original filename
+        upload_id: Upload to resume (omit to start a new upload)
+        offset: Byte offset of this chunk within the file
+        final: Whether this is the last chunk
+        user_id: Owner of the upload (for quota accounting; later chunks must
+            come from the same user)
+
+    Returns:
+        JSON with file_id, file_url, filename, size, sha256 when complete,
+        upload_id and offset while incomplete, or error with HTTP status
+    """
+    content_length = request.headers.get("content-length")
+    try:
+        content_length = int(content_length) if content_length else None
+    except ValueError:
+        return JSONResponse({"error": "Invalid Content-Length"}, status_code=400)
+    result = await chunked_upload_handler(
+        request.stream(),
+        filename=filename,
+        upload_id=upload_id,
+        offset=offset,
+        final=final,
+        content_length=content_length,
+        user_id=user_id,
+    )
+    return JSONResponse(result, status_code=result.get("status", 200))
+
+
 @agent_app.query(framework="agentscope")
 async def query_func(
     self,
@@ -245,24 +418,31 @@ async def query_func(
 
     logging.info(f"收到查询请求 - SessionID: {session_id}, UserID: {user_id}")
 
-    await _load_agent_state(self, session_id, user_id)
+    # 附件并发分配 file_id 后立即开始对话，解码与落盘在后台完成
+    msgs = await process_messages(msgs, session_id, user_id)
 
-    msgs = process_messages(msgs, session_id)
+    # 同一会话的 MCP 调用固定到同一进程（保持浏览器页面等状态）
+    mcp_affinity.set(AgentPool.session_key(session_id, user_id))
 
-    logging.info(f"开始执行 agent 任务 - SessionID: {session_id}")
-    try:
-        async for msg, last in stream_printing_messages(
-            agents=[self.agent],
-            coroutine_task=self.agent(msgs),
-        ):
-            yield msg, last
-        logging.info(f"agent 任务执行完成 - SessionID: {session_id}")
-    except Exception as e:
-        logging.error(
-            f"agent 任务执行失败 - SessionID: {session_id}, Error: {e}", exc_info=True
-        )
-        raise
+    async with self.agent_pool.lease(session_id, user_id) as (agent, fresh):
+        if fresh:
+            await _load_agent_state(self, agent, session_id, user_id)
+
+        logging.info(f"开始执行 agent 任务 - SessionID: {session_id}")
+        try:
+            async for msg, last in stream_printing_messages(
+                agents=[agent],
+                coroutine_task=agent(msgs),
+            ):
+                yield msg, last
+            logging.info(f"agent 任务执行完成 - SessionID: {session_id}")
+        except Exception as e:
+            logging.error(
+                f"agent 任务执行失败 - SessionID: {session_id}, Error: {e}",
+                exc_info=True,
+            )
+            raise
 
-    await _save_agent_state(self, session_id, user_id)
+        await _save_agent_state(self, agent, session_id, user_id)
 
     logging.info(f"查询请求处理完成 - SessionID: {session_id}")
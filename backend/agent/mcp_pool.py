@@ -0,0 +1,647 @@
+"""Pooled, health-checked MCP stdio clients.
+
+Each configured MCP server gets a pool of warm ``StdIOStatefulClient``
+processes. Every process is owned by a dedicated task that connects it,
+waits until a restart or shutdown is requested and closes it again, so the
+anyio cancel scopes of the stdio transport are always entered and exited in
+the same task (see MCP_LIFECYCLE_FIX_REPORT.md).
+
+Tool calls lease a process from the pool. Calls of one session stick to the
+same process (``mcp_affinity``), which keeps stateful servers such as
+playwright on the same browser page between calls.
+
+Pools start concurrently. In lazy mode a pool registers its tools from the
+on-disk schema cache and only spawns its processes on the first tool call.
+A lazy pool with no cached schemas still has to spawn once when its tools
+are first registered (to list them); that run fills the cache, so later
+starts stay lazy.
+
+The app-lifetime manager is published through ``set_mcp_pool_manager`` so
+sub-agent tool functions can reuse warm clients and shared toolkit snapshots
+instead of spawning their own MCP processes. Outside the app (scripts,
+scheduled collection jobs) ``search_toolkit`` falls back to short-lived
+clients.
+"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import time
+from collections import OrderedDict
+from contextlib import asynccontextmanager
+from contextvars import ContextVar
+from typing import Any, AsyncIterator, Optional
+
+from agentscope.mcp import StdIOStatefulClient
+from agentscope.tool import Toolkit, ToolResponse
+
+
+# 当前请求的会话标识，用于将同一会话的 MCP 调用路由到同一进程
+mcp_affinity: ContextVar[Optional[str]] = ContextVar("mcp_affinity", default=None)
+
+_MAX_AFFINITY_BINDINGS = 1024
+_MAX_RESPAWN_BACKOFF = 60.0
+
+# 工具 schema 缓存，懒启动时无需拉起进程即可注册工具
+MCP_TOOL_CACHE = os.path.join(os.path.dirname(__file__), "../data/mcp_tools_cache.json")
+
+_manager: Optional["MCPPoolManager"] = None
+
+
+class _MCPSlot:
+    """One warm MCP process, owned by its own task."""
+
+    def __init__(self, pool: "MCPServerPool", index: int):
+        self.pool = pool
+        self.index = index
+        self.client: Optional[StdIOStatefulClient] = None
+        self.in_flight = 0
+        self.functions: dict[str, Any] = {}
+        self.ready = asyncio.Event()
+        self._restart = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def alive(self) -> bool:
+        return (
+            self.ready.is_set()
+            and self.client is not None
+            and self.client.is_connected
+        )
+
+    def start(self) -> None:
+        self._task = asyncio.create_task(
+            self._run(), name=f"mcp-{self.pool.name}-{self.index}"
+        )
+
+    def restart(self) -> None:
+        """Ask the owner task to close and respawn the process."""
+        self._restart.set()
+
+    async def stop(self) -> None:
+        self._restart.set()
+        if self._task is not None:
+            await self._task
+
+    async def _close_client(self, client: StdIOStatefulClient) -> None:
+        try:
+            if client.is_connected:
+                await client.close()
+            elif getattr(client, "stack", None) is not None:
+                # connect() failed or timed out half-way: release the stdio
+                # transport (and child process) it may already have entered
+                await client.stack.aclose()
+        except Exception as e:
+            logging.warning(
+                f"关闭 MCP 进程出错 - Server: {self.pool.name}#{self.index}, "
+                f"Error: {e}"
+            )
+
+    async def _run(self) -> None:
+        backoff = 1.0
+        while not self.pool.closing:
+            client = StdIOStatefulClient(self.pool.name, **self.pool.config)
+            connected = False
+            try:
+                async with asyncio.timeout(self.pool.connect_timeout):
+                    await client.connect()
+                connected = True
+            except Exception as e:
+                self.pool.failures += 1
+                logging.error(
+                    f"MCP 进程启动失败 - Server: {self.pool.name}#{self.index}, "
+                    f"Error: {e}, {backoff:.0f}s 后重试"
+                )
+            finally:
+                if not connected:
+                    await self._close_client(client)
+            if not connected:
+                try:
+                    await asyncio.wait_for(self._restart.wait(), backoff)
+                except asyncio.TimeoutError:
+                    pass
+                self._restart.clear()
+                backoff = min(backoff * 2, _MAX_RESPAWN_BACKOFF)
+                continue
+
+            backoff = 1.0
+            self.client = client
+            self.functions = {}
+            if not self.pool.closing:
+                self._restart.clear()
+            self.ready.set()
+            logging.info(f"MCP 进程就绪 - Server: {self.pool.name}#{self.index}")
+
+            await self._restart.wait()
+
+            self.ready.clear()
+            self.client = None
+            await self._close_client(client)
+            if not self.pool.closing:
+                self.pool.respawns += 1
+                logging.warning(
+                    f"重启 MCP 进程 - Server: {self.pool.name}#{self.index}"
+                )
+
+
+class MCPServerPool:
+    """A pool of warm stdio processes for one MCP server."""
+
+    def __init__(
+        self,
+        name: str,
+        config: dict,
+        size: int = 1,
+        max_concurrency: Optional[int] = None,
+        connect_timeout: float = 60.0,
+        probe_timeout: float = 10.0,
+        lazy: bool = False,
+    ):
+        """Initialize server pool.
+
+        Args:
+            name: MCP server name
+            config: Keyword arguments for ``StdIOStatefulClient``
+            size: Number of warm processes (default 1)
+            max_concurrency: Maximum concurrent tool calls across the pool
+                (default: one per process)
+            connect_timeout: Timeout in seconds for spawning a process
+            probe_timeout: Timeout in seconds for a liveness probe
+            lazy: Spawn processes on the first tool call instead of at start
+        """
+        if size < 1:
+            raise ValueError(f"size must be >= 1, got {size}")
+        self.name = name
+        self.config = config
+        self.size = size
+        self.max_concurrency = max_concurrency or size
+        self.connect_timeout = connect_timeout
+        self.probe_timeout = probe_timeout
+        self.lazy = lazy
+        self.closing = False
+        self.spawned = False
+
+        self._slots = [_MCPSlot(self, i) for i in range(size)]
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._affinity: "OrderedDict[str, int]" = OrderedDict()
+        self._tool_schemas: Optional[list[dict]] = None
+        self._schema_lock = asyncio.Lock()
+        # Probes started after failed calls (referenced until done)
+        self._probe_tasks: set[asyncio.Task] = set()
+
+        # 池使用指标
+        self.in_flight = 0
+        self.waiting = 0
+        self.calls = 0
+        self.call_errors = 0
+        self.failures = 0
+        self.respawns = 0
+        self._lease_wait_total = 0.0
+
+    @property
+    def config_hash(self) -> str:
+        """Fingerprint of the server config, used to validate cached schemas."""
+        raw = json.dumps(self.config, sort_keys=True, default=str)
+        return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+    def _spawn(self) -> None:
+        if self.spawned or self.closing:
+            return
+        self.spawned = True
+        for slot in self._slots:
+            slot.start()
+
+    async def start(self) -> bool:
+        """Spawn all processes and wait until at least one is ready.
+
+        Lazy pools return immediately; they spawn on the first lease.
+
+        Returns:
+            True if the pool is usable (lazy, or a process became ready
+            within ``connect_timeout``)
+        """
+        if self.lazy:
+            return True
+        self._spawn()
+        return await self._wait_ready(self.connect_timeout)
+
+    async def close(self) -> None:
+        """Close all processes."""
+        self.closing = True
+        probes = list(self._probe_tasks)
+        for probe in probes:
+            probe.cancel()
+        await asyncio.gather(*probes, return_exceptions=True)
+        await asyncio.gather(
+            *(slot.stop() for slot in self._slots), return_exceptions=True
+        )
+
+    async def _wait_ready(self, timeout: float) -> bool:
+        if any(slot.alive for slot in self._slots):
+            return True
+        waiters = [asyncio.create_task(slot.ready.wait()) for slot in self._slots]
+        try:
+            done, _ = await asyncio.wait(
+                waiters, timeout=timeout, return_when=asyncio.FIRST_COMPLETED
+            )
+        finally:
+            for waiter in waiters:
+                waiter.cancel()
+        return bool(done)
+
+    async def _pick_slot(self, affinity: Optional[str]) -> _MCPSlot:
+        self._spawn()
+        live = [slot for slot in self._slots if slot.alive]
+        if not live:
+            await self._wait_ready(self.connect_timeout)
+            live = [slot for slot in self._slots if slot.alive]
+        if not live:
+            raise RuntimeError(f"MCP 服务器 {self.name} 无可用连接")
+
+        if affinity is not None:
+            index = self._affinity.get(affinity)
+            if index is not None and self._slots[index].alive:
+                self._affinity.move_to_end(affinity)
+                return self._slots[index]
+
+        slot = min(live, key=lambda s: s.in_flight)
+        if affinity is not None:
+            self._affinity[affinity] = slot.index
+            self._affinity.move_to_end(affinity)
+            while len(self._affinity) > _MAX_AFFINITY_BINDINGS:
+                self._affinity.popitem(last=False)
+        return slot
+
+    @asynccontextmanager
+    async def _lease_slot(
+        self, affinity: Optional[str] = None
+    ) -> AsyncIterator[_MCPSlot]:
+        started = time.monotonic()
+        self.waiting += 1
+        try:
+            await self._semaphore.acquire()
+        finally:
+            self.waiting -= 1
+        try:
+            slot = await self._pick_slot(affinity)
+            self._lease_wait_total += time.monotonic() - started
+            self.calls += 1
+            self.in_flight += 1
+            slot.in_flight += 1
+            try:
+                yield slot
+            except Exception:
+                self.call_errors += 1
+                probe = asyncio.create_task(self.probe_slot(slot))
+                self._probe_tasks.add(probe)
+                probe.add_done_callback(self._probe_tasks.discard)
+                raise
+            finally:
+                slot.in_flight -= 1
+                self.in_flight -= 1
+        finally:
+            self._semaphore.release()
+
+    @asynccontextmanager
+    async def lease(
+        self, affinity: Optional[str] = None
+    ) -> AsyncIterator[StdIOStatefulClient]:
+        """Lease a connected client from the pool.
+
+        Args:
+            affinity: Optional session key; defaults to ``mcp_affinity``
+
+        Yields:
+            A connected ``StdIOStatefulClient``
+        """
+        if affinity is None:
+            affinity = mcp_affinity.get()
+        async with self._lease_slot(affinity) as slot:
+            yield slot.client
+
+    async def call_tool(self, tool_name: str, **kwargs: Any) -> ToolResponse:
+        """Call an MCP tool on a leased process."""
+        async with self._lease_slot(mcp_affinity.get()) as slot:
+            func = slot.functions.get(tool_name)
+            if func is None:
+                func = await slot.client.get_callable_function(
+                    tool_name, wrap_tool_result=True
+                )
+                slot.functions[tool_name] = func
+            return await func(**kwargs)
+
+    def _make_tool_function(self, tool_name: str):
+        async def _call_pooled_tool(**kwargs: Any) -> ToolResponse:
+            return await self.call_tool(tool_name, **kwargs)
+
+        _call_pooled_tool.__name__ = tool_name
+        return _call_pooled_tool
+
+    async def _get_tool_schemas(self) -> list[dict]:
+        """Return the server's tool schemas, listed once per pool."""
+        if self._tool_schemas is not None:
+            return self._tool_schemas
+        # Concurrent first callers wait for one listing instead of each
+        # spawning and listing the server
+        async with self._schema_lock:
+            if self._tool_schemas is None:
+                async with self._lease_slot() as slot:
+                    schemas = []
+                    for tool in await slot.client.list_tools():
+                        func = await slot.client.get_callable_function(
+                            tool.name, wrap_tool_result=True
+                        )
+                        schemas.append(func.json_schema)
+                    self._tool_schemas = schemas
+        return self._tool_schemas
+
+    async def register_tools(self, toolkit: Toolkit) -> None:
+        """Register the server's tools in a toolkit, routed through the pool."""
+        for schema in await self._get_tool_schemas():
+            toolkit.register_tool_function(
+                self._make_tool_function(schema["function"]["name"]),
+                json_schema=schema,
+            )
+
+    async def probe_slot(self, slot: _MCPSlot) -> bool:
+        """Check one process and respawn it if it does not answer.
+
+        Returns:
+            True if the process is healthy
+        """
+        if not slot.ready.is_set():
+            return False
+        client = slot.client
+        if client is None or not client.is_connected:
+            slot.restart()
+            return False
+        try:
+            await asyncio.wait_for(client.list_tools(), self.probe_timeout)
+            return True
+        except Exception as e:
+            logging.warning(
+                f"MCP 存活检测失败 - Server: {self.name}#{slot.index}, Error: {e}"
+            )
+            slot.restart()
+            return False
+
+    async def probe(self) -> None:
+        """Probe all idle processes."""
+        await asyncio.gather(
+            *(self.probe_slot(slot) for slot in self._slots if slot.in_flight == 0),
+            return_exceptions=True,
+        )
+
+    def metrics(self) -> dict:
+        """Return pool utilization metrics."""
+        return {
+            "size": self.size,
+            "alive": sum(1 for slot in self._slots if slot.alive),
+            "max_concurrency": self.max_concurrency,
+            "in_flight": self.in_flight,
+            "waiting": self.waiting,
+            "utilization": round(self.in_flight / self.max_concurrency, 3),
+            "calls": self.calls,
+            "call_errors": self.call_errors,
+            "spawn_failures": self.failures,
+            "respawns": self.respawns,
+            "avg_lease_wait_ms": round(
+                self._lease_wait_total / self.calls * 1000, 2
+            )
+            if self.calls
+            else 0.0,
+        }
+
+
+class MCPPoolManager:
+    """Owns one ``MCPServerPool`` per configured MCP server."""
+
+    def __init__(
+        self,
+        servers_config: dict,
+        pool_config: Optional[dict] = None,
+        probe_interval: float = 30.0,
+        lazy: bool = False,
+        tool_cache_path: Optional[str] = MCP_TOOL_CACHE,
+    ):
+        """Initialize pool manager.
+
+        Args:
+            servers_config: ``mcp_servers_config`` mapping name -> client kwargs
+            pool_config: Optional mapping name -> ``MCPServerPool`` options
+            probe_interval: Seconds between liveness probes
+            lazy: Default lazy mode for pools without an explicit ``lazy``
+            tool_cache_path: JSON file caching tool schemas (None disables)
+        """
+        pool_config = pool_config or {}
+        self.pools: dict[str, MCPServerPool] = {
+            name: MCPServerPool(
+                name, config, **{"lazy": lazy, **pool_config.get(name, {})}
+            )
+            for name, config in servers_config.items()
+        }
+        self.probe_interval = probe_interval
+        self._health_task: Optional[asyncio.Task] = None
+        self._toolkits: dict[tuple, Toolkit] = {}
+        self._toolkit_lock = asyncio.Lock()
+        self.tool_cache_path = tool_cache_path
+        self._load_tool_cache()
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.pools
+
+    def get(self, name: str) -> MCPServerPool:
+        return self.pools[name]
+
+    def _load_tool_cache(self) -> None:
+        """Prefill pools' tool schemas from the on-disk cache."""
+        if not self.tool_cache_path or not os.path.exists(self.tool_cache_path):
+            return
+        try:
+            with open(self.tool_cache_path, "r", encoding="utf-8") as f:
+                cache = json.load(f)
+        except (OSError, ValueError) as e:
+            logging.warning(f"读取 MCP 工具缓存失败: {e}")
+            return
+        for name, pool in self.pools.items():
+            entry = cache.get(name)
+            if entry and entry.get("config_hash") == pool.config_hash:
+                pool._tool_schemas = entry.get("tools")
+
+    def _save_tool_cache(self) -> None:
+        if not self.tool_cache_path:
+            return
+        cache = {
+            name: {"config_hash": pool.config_hash, "tools": pool._tool_schemas}
+            for name, pool in self.pools.items()
+            if pool._tool_schemas is not None
+        }
+        try:
+            os.makedirs(os.path.dirname(self.tool_cache_path), exist_ok=True)
+            tmp_path = f"{self.tool_cache_path}.tmp"
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(cache, f, ensure_ascii=False)
+            os.replace(tmp_path, self.tool_cache_path)
+        except OSError as e:
+            logging.warning(f"写入 MCP 工具缓存失败: {e}")
+
+    async def _start_pool(self, name: str, pool: MCPServerPool) -> None:
+        mode = "lazy" if pool.lazy else "eager"
+        logging.info(f"初始化 MCP 连接池: {name} (size={pool.size}, {mode})")
+        if await pool.start():
+            logging.info(f"MCP 连接池 {name} 就绪")
+        else:
+            logging.error(f"MCP 连接池 {name} 启动超时，将在后台继续重试")
+
+    async def start(self) -> None:
+        """Start all pools concurrently and the liveness probe loop.
+
+        Each pool waits at most its own ``connect_timeout``; a slow or
+        failing server does not delay the others.
+        """
+        started = time.monotonic()
+        await asyncio.gather(
+            *(self._start_pool(name, pool) for name, pool in self.pools.items())
+        )
+        logging.info(
+            f"MCP 连接池启动完成，耗时 {(time.monotonic() - started) * 1000:.0f}ms"
+        )
+        self._health_task = asyncio.create_task(self._health_loop())
+
+    async def close(self) -> None:
+        """Stop probing and close all pools."""
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+        for name, pool in self.pools.items():
+            logging.info(f"关闭 MCP 连接池: {name}")
+            await pool.close()
+
+    async def _health_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.probe_interval)
+            for pool in self.pools.values():
+                await pool.probe()
+
+    async def register_tools(
+        self, toolkit: Toolkit, names: Optional[list[str]] = None
+    ) -> bool:
+        """Register tools of the selected (default: all) servers in a toolkit.
+
+        Returns:
+            True if every selected server was registered
+        """
+        selected = [
+            (name, pool)
+            for name, pool in self.pools.items()
+            if names is None or name in names
+        ]
+        cached = {name for name, pool in selected if pool._tool_schemas is not None}
+        # 并发获取各服务器的工具列表，再按配置顺序注册
+        results = await asyncio.gather(
+            *(pool._get_tool_schemas() for _, pool in selected),
+            return_exceptions=True,
+        )
+        complete = True
+        for (name, pool), result in zip(selected, results):
+            if isinstance(result, BaseException):
+                complete = False
+                logging.warning(f"MCP 客户端 {name} 注册失败: {result}")
+                continue
+            await pool.register_tools(toolkit)
+            logging.info(f"MCP 工具 {name} 注册成功")
+        if any(name not in cached for name, pool in selected if pool._tool_schemas):
+            self._save_tool_cache()
+        return complete
+
+    async def get_toolkit(self, names: Optional[list[str]] = None) -> Toolkit:
+        """Return a shared toolkit snapshot for the selected servers.
+
+        The snapshot is built once and reused by every caller; its tools
+        lease warm processes from the pools. Incomplete snapshots (a server
+        failed to register) are not cached and are rebuilt on the next call.
+
+        Args:
+            names: Server names to include (default: all servers)
+
+        Returns:
+            Toolkit with the servers' MCP tools registered
+        """
+        key = tuple(sorted(self.pools if names is None else names))
+        toolkit = self._toolkits.get(key)
+        if toolkit is not None:
+            return toolkit
+        async with self._toolkit_lock:
+            toolkit = self._toolkits.get(key)
+            if toolkit is None:
+                toolkit = Toolkit()
+                if await self.register_tools(toolkit, list(key)):
+                    self._toolkits[key] = toolkit
+        return toolkit
+
+    async def get_search_toolkit(self) -> Toolkit:
+        """Return the shared toolkit snapshot of search-related servers."""
+        return await self.get_toolkit(
+            [name for name in self.pools if "search" in name.lower()]
+        )
+
+    def metrics(self) -> dict:
+        """Return utilization metrics of all pools."""
+        return {name: pool.metrics() for name, pool in self.pools.items()}
+
+
+def set_mcp_pool_manager(manager: Optional[MCPPoolManager]) -> None:
+    """Publish (or clear) the app-lifetime MCP pool manager."""
+    global _manager
+    _manager = manager
+
+
+def get_mcp_pool_manager() -> Optional[MCPPoolManager]:
+    """Return the app-lifetime MCP pool manager, if the app is running."""
+    return _manager
+
+
+@asynccontextmanager
+async def search_toolkit(servers_config: dict) -> AsyncIterator[Toolkit]:
+    """Toolkit with the search-related MCP servers' tools.
+
+    Leases the app-lifetime pools when the app is running; otherwise opens a
+    short-lived client per search server and closes them on exit.
+
+    Args:
+        servers_config: MCP server configs (used only without a pool manager)
+    """
+    manager = get_mcp_pool_manager()
+    if manager is not None:
+        yield await manager.get_search_toolkit()
+        return
+
+    toolkit = Toolkit()
+    clients = []
+    try:
+        for server_name, server_config in servers_config.items():
+            if "search" not in server_name.lower():
+                continue
+            try:
+                client = StdIOStatefulClient(server_name, **server_config)
+                await client.connect()
+                await toolkit.register_mcp_client(client)
+                clients.append(client)
+                logging.info(f"Registered search MCP: {server_name}")
+            except Exception as e:
+                logging.warning(f"Failed to register {server_name}: {e}")
+        yield toolkit
+    finally:
+        for client in reversed(clients):
+            try:
+                if client.is_connected:
+                    await client.close()
+                    logging.info(f"Closed MCP client: {client.name}")
+            except Exception as e:
+                logging.warning(f"Error closing MCP client: {e}")
@@ -0,0 +1,166 @@
+"""Summarizers that fold evicted memory into a rolling summary.
+
+Provides:
+- ExtractiveSummarizer: local, synchronous; keeps the sentences that carry
+  facts worth remembering (URLs, files, numbers, errors, decisions, next
+  steps) plus the first sentence of every message
+- ModelSummarizer: refines the summary with a batched, asynchronous model
+  call; the extractive summary is used until the model result arrives
+
+Tune ``summary_max_tokens`` with ``examples/evaluate_compaction.py``, which
+scores summaries with the probes of
+``skills/context-engineering/scripts/compression_evaluator.py``.
+"""
+
+import json
+import logging
+import re
+from typing import Any, Optional
+
+from agentscope.message import Msg
+
+from .tokenizer import get_token_counter
+
+
+SUMMARY_HEADER = "[历史对话摘要] 以下为已移出上下文的早期对话要点："
+
+_SENTENCE_SPLIT = re.compile(r"(?<=[。！？!?；;])|\n+|(?<=\.)\s+")
+_KEY_PATTERNS = [
+    re.compile(p, re.IGNORECASE)
+    for p in [
+        r"https?://\S+",
+        r"[\w\-/]+\.(?:py|js|ts|json|xlsx|csv|pdf|txt|md|html)\b",
+        r"\d{2,}",
+        r"error|exception|failed|错误|失败|异常",
+        r"decided|decision|conclusion|决定|结论|确认",
+        r"next step|todo|待办|下一步|接下来",
+        r"found that|result|发现|结果|采集到|共计",
+    ]
+]
+_MAX_LINE_CHARS = 200
+
+
+def _message_text(msg: Msg) -> str:
+    """Flatten a message's content blocks into plain text."""
+    if isinstance(msg.content, str):
+        return msg.content
+    parts = []
+    for block in msg.content or []:
+        if not isinstance(block, dict):
+            parts.append(str(block))
+            continue
+        block_type = block.get("type")
+        if block_type == "text":
+            parts.append(block.get("text", ""))
+        elif block_type == "tool_use":
+            args = json.dumps(block.get("input", {}), ensure_ascii=False)
+            parts.append(f"调用工具 {block.get('name')}({args[:_MAX_LINE_CHARS]})")
+        elif block_type == "tool_result":
+            output = block.get("output")
+            if isinstance(output, list):
+                output = " ".join(
+                    item.get("text", "")
+                    for item in output
+                    if isinstance(item, dict) and item.get("type") == "text"
+                )
+            parts.append(f"工具 {block.get('name')} 返回: {output}")
+    return "\n".join(parts)
+
+
+class ExtractiveSummarizer:
+    """Local extractive summarizer for evicted messages."""
+
+    def __init__(self, token_counter: Optional[Any] = None):
+        self.token_counter = token_counter or get_token_counter()
+
+    def _extract_lines(self, msgs: list[Msg]) -> list[str]:
+        lines = []
+        for msg in msgs:
+            sentences = [
+                s.strip()
+                for s in _SENTENCE_SPLIT.split(_message_text(msg))
+                if s and s.strip()
+            ]
+            for i, sentence in enumerate(sentences):
+                if i == 0 or any(p.search(sentence) for p in _KEY_PATTERNS):
+                    lines.append(f"- {msg.name}: {sentence[:_MAX_LINE_CHARS]}")
+        return lines
+
+    def summarize(self, previous: str, msgs: list[Msg], max_tokens: int) -> str:
+        """Fold messages into the previous summary within ``max_tokens``.
+
+        Older lines are dropped first when the budget is exceeded.
+        """
+        lines = [
+            line
+            for line in previous.splitlines()
+            if line and line != SUMMARY_HEADER
+        ]
+        lines.extend(self._extract_lines(msgs))
+        # Repeated observations (e.g. re-read pages) are kept once
+        lines = list(dict.fromkeys(lines))
+
+        budget = max_tokens - self.token_counter.count(SUMMARY_HEADER)
+        counts = self.token_counter.count_batch(lines)
+        total = sum(counts)
+        start = 0
+        while total > budget and start < len(lines):
+            total -= counts[start]
+            start += 1
+        return "\n".join([SUMMARY_HEADER, *lines[start:]])
+
+
+class ModelSummarizer(ExtractiveSummarizer):
+    """Summarizer that refines the rolling summary with a model call."""
+
+    def __init__(
+        self,
+        model: Any,
+        formatter: Any,
+        token_counter: Optional[Any] = None,
+        batch_size: int = 20,
+    ):
+        """Initialize model summarizer.
+
+        Args:
+            model: agentscope chat model
+            formatter: Formatter matching the model
+            token_counter: Token counter (default: shared counter)
+            batch_size: Maximum evicted messages folded per model call
+        """
+        super().__init__(token_counter)
+        self.model = model
+        self.formatter = formatter
+        self.batch_size = batch_size
+
+    async def summarize_async(
+        self, previous: str, msgs: list[Msg], max_tokens: int
+    ) -> str:
+        """Fold messages into the previous summary with one model call."""
+        transcript = "\n".join(
+            f"{msg.name}: {_message_text(msg)[:2000]}" for msg in msgs
+        )
+        prompt = (
+            f"请将以下早期对话合并进已有摘要，保留访问过的网址、文件、关键数据、"
+            f"错误、已做出的决定和下一步计划，输出不超过 {max_tokens} token 的要点列表。\n\n"
+            f"已有摘要：\n{previous or '（无）'}\n\n新增对话：\n{transcript}"
+        )
+        prompt_msgs = await self.formatter.format(
+            [Msg("user", prompt, "user")]
+        )
+        response = await self.model(prompt_msgs)
+        if hasattr(response, "__aiter__"):
+            # Streaming models yield accumulated chunks; keep the final one
+            stream = response
+            async for response in stream:
+                pass
+        text = "".join(
+            block.get("text", "")
+            for block in response.content
+            if block.get("type") == "text"
+        ).strip()
+        if not text:
+            logging.warning("模型摘要为空，保留抽取式摘要")
+            return self.summarize(previous, msgs, max_tokens)
+        # Enforce the budget on the model output as well
+        return self.summarize(text, [], max_tokens)
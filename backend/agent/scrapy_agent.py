@@ -9,16 +9,17 @@ This module provides a simple conversational agent that:
 
 import logging
 import os
+from contextlib import AsyncExitStack
 from typing import Optional
 
 from agentscope.agent import ReActAgent
 from agentscope.message import Msg
 from agentscope.model import OpenAIChatModel
 from agentscope.formatter import OpenAIChatFormatter
-from agentscope.tool import Toolkit, ToolResponse
-from agentscope.mcp import StdIOStatefulClient
+from agentscope.tool import ToolResponse
 
 from config import mcp_servers_config, scrapy_agent_sys_prompt
+from .mcp_pool import search_toolkit
 
 
 SKILLS_DIR = os.path.join(os.path.dirname(__file__), "../skills")
@@ -48,26 +49,15 @@ async def scrapy_agent_fucntion(
         client_kwargs={"base_url": os.getenv("base_url")},
     )
 
-    # Initialize toolkit if search is enabled
+    # Lease search tools from the app-lifetime MCP pools (short-lived
+    # clients when running outside the app)
     toolkit = None
-    mcp_clients = []
-    if enable_search:
-        toolkit = Toolkit()
+    async with AsyncExitStack() as stack:
+        if enable_search:
+            toolkit = await stack.enter_async_context(
+                search_toolkit(mcp_servers_config)
+            )
 
-        # Register MCP clients for search tools
-        for server_name, server_config in mcp_servers_config.items():
-            # Only register search-related MCP servers
-            if "search" in server_name.lower():
-                try:
-                    client = StdIOStatefulClient(server_name, **server_config)
-                    await client.connect()
-                    await toolkit.register_mcp_client(client)
-                    mcp_clients.append(client)
-                    logging.info(f"Registered search MCP: {server_name}")
-                except Exception as e:
-                    logging.warning(f"Failed to register {server_name}: {e}")
-
-    try:
         # Create agent
         scrapy_agent = ReActAgent(
             name="scrapy_agent",
@@ -79,14 +69,5 @@ async def scrapy_agent_fucntion(
         )
         res = await scrapy_agent(Msg("user", custom_prompt, "user"))
 
-        logging.info(f"SimpleAgent '{name}' created successfully")
-        return ToolResponse(content=res.get_content_blocks("text"))
-    finally:
-        # Clean up MCP clients
-        for client in mcp_clients:
-            try:
-                if client.is_connected:
-                    await client.close()
-                    logging.info(f"Closed MCP client: {client.name}")
-            except Exception as e:
-                logging.warning(f"Error closing MCP client: {e}")
+    logging.info(f"SimpleAgent '{name}' created successfully")
+    return ToolResponse(content=res.get_content_blocks("text"))
@@ -0,0 +1,670 @@
+"""Durable SQLite-backed state and session history services.
+
+Drop-in replacements for ``InMemoryStateService`` and
+``InMemorySessionHistoryService`` that keep sessions on local disk:
+- WAL mode, one connection used from a single worker thread
+- writes are queued and flushed in batches (one transaction per batch)
+- sessions idle longer than ``ttl_seconds`` are swept in the background
+- a bounded LRU read cache keeps hot sessions out of the database
+
+Queued writes are flushed every ``flush_interval`` seconds, so a crash loses at
+most that window. Both services and ``SQLiteJournalBackend`` share one
+``SQLiteDatabase`` so the TTL sweep removes a session from every table.
+"""
+
+import asyncio
+import copy
+import json
+import logging
+import os
+import sqlite3
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Union
+
+from agentscope_runtime.engine.schemas.agent_schemas import Message
+from agentscope_runtime.engine.schemas.session import Session
+from agentscope_runtime.engine.services.agent_state import StateService
+from agentscope_runtime.engine.services.session_history.session_history_service import (  # pylint: disable=line-too-long
+    SessionHistoryService,
+)
+
+DEFAULT_SESSION_ID = "default"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS session_activity (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    last_active REAL NOT NULL,
+    PRIMARY KEY (user_id, session_id)
+);
+CREATE INDEX IF NOT EXISTS idx_activity_last_active
+    ON session_activity (last_active);
+CREATE TABLE IF NOT EXISTS agent_state (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    round_id INTEGER NOT NULL,
+    state TEXT NOT NULL,
+    PRIMARY KEY (user_id, session_id, round_id)
+);
+CREATE TABLE IF NOT EXISTS state_log (
+    seq INTEGER PRIMARY KEY,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    delta TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_state_log_session
+    ON state_log (user_id, session_id, seq);
+CREATE TABLE IF NOT EXISTS sessions (
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    PRIMARY KEY (user_id, session_id)
+);
+CREATE TABLE IF NOT EXISTS session_messages (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    user_id TEXT NOT NULL,
+    session_id TEXT NOT NULL,
+    message TEXT NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_session_messages_session
+    ON session_messages (user_id, session_id, id);
+"""
+
+# Flushes of one batch before its failing statements are dropped
+_FLUSH_ATTEMPTS = 3
+
+_SESSION_TABLES = (
+    "agent_state",
+    "state_log",
+    "session_messages",
+    "sessions",
+    "session_activity",
+)
+
+
+class _LRUCache:
+    """Small bounded LRU mapping."""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max_entries
+        self._data: OrderedDict = OrderedDict()
+
+    def get(self, key: Any) -> Any:
+        value = self._data.get(key)
+        if value is not None:
+            self._data.move_to_end(key)
+        return value
+
+    def put(self, key: Any, value: Any) -> None:
+        self._data[key] = value
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+
+    def pop(self, key: Any) -> None:
+        self._data.pop(key, None)
+
+    def clear(self) -> None:
+        self._data.clear()
+
+
+class SQLiteDatabase:
+    """Shared SQLite connection with batched writes and TTL expiry."""
+
+    def __init__(
+        self,
+        path: str,
+        flush_interval: float = 0.5,
+        batch_size: int = 256,
+        ttl_seconds: Optional[float] = 7 * 24 * 3600,
+        sweep_interval: float = 600,
+    ):
+        """Initialize SQLite database.
+
+        Args:
+            path: Database file path
+            flush_interval: Maximum seconds a queued write waits for its batch
+            batch_size: Queued writes that trigger an immediate flush
+            ttl_seconds: Idle time after which a session is deleted
+                (None disables expiry)
+            sweep_interval: Seconds between TTL sweeps
+        """
+        self.path = path
+        self.flush_interval = flush_interval
+        self.batch_size = batch_size
+        self.ttl_seconds = ttl_seconds
+        self.sweep_interval = sweep_interval
+
+        self._conn: Optional[sqlite3.Connection] = None
+        # All database work runs on one thread, in submission order
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        self._pending: list[tuple[str, tuple]] = []
+        self._flush_lock = asyncio.Lock()
+        self._flush_failures = 0
+        self._flush_wakeup = asyncio.Event()
+        self._tasks: list[asyncio.Task] = []
+        self._expire_listeners: list[Callable[[str, str], Any]] = []
+        self._refs = 0
+
+    async def _run(self, func: Callable, *args: Any) -> Any:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(self._executor, func, *args)
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        conn = sqlite3.connect(self.path, check_same_thread=False)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        conn.executescript(_SCHEMA)
+        conn.commit()
+        self._conn = conn
+
+    async def start(self) -> None:
+        """Open the database and start the flush and sweep loops.
+
+        Shared by several services: only the first call opens it.
+        """
+        self._refs += 1
+        if self._conn is not None:
+            return
+        await self._run(self._open)
+        self._tasks = [asyncio.create_task(self._flush_loop())]
+        if self.ttl_seconds:
+            self._tasks.append(asyncio.create_task(self._sweep_loop()))
+        logging.info(f"SQLite 存储已打开 - Path: {self.path}")
+
+    async def stop(self) -> None:
+        """Flush queued writes and close; the last service to stop closes it."""
+        self._refs = max(self._refs - 1, 0)
+        if self._refs or self._conn is None:
+            return
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        for _ in range(_FLUSH_ATTEMPTS):
+            try:
+                await self.flush()
+                break
+            except Exception:
+                pass
+        await self._run(self._conn.close)
+        self._conn = None
+        logging.info(f"SQLite 存储已关闭 - Path: {self.path}")
+
+    @property
+    def is_open(self) -> bool:
+        return self._conn is not None
+
+    def write(self, sql: str, params: tuple = ()) -> None:
+        """Queue a write for the next batch."""
+        if self._conn is None:
+            raise RuntimeError("Service not started")
+        self._pending.append((sql, params))
+        if len(self._pending) >= self.batch_size:
+            self._flush_wakeup.set()
+
+    def _execute_batch(self, batch: list[tuple[str, tuple]]) -> None:
+        with self._conn:
+            for sql, params in batch:
+                self._conn.execute(sql, params)
+
+    def _execute_each(
+        self, batch: list[tuple[str, tuple]]
+    ) -> list[tuple[str, Exception]]:
+        failed = []
+        for sql, params in batch:
+            try:
+                with self._conn:
+                    self._conn.execute(sql, params)
+            except sqlite3.Error as e:
+                failed.append((sql, e))
+        return failed
+
+    async def flush(self) -> None:
+        """Write all queued statements in one transaction.
+
+        A failed batch is put back at the head of the queue and retried by
+        the next flush. After ``_FLUSH_ATTEMPTS`` failures its statements are
+        written one by one and only those that still fail are dropped.
+        """
+        async with self._flush_lock:
+            if not self._pending or self._conn is None:
+                return
+            batch, self._pending = self._pending, []
+            try:
+                await self._run(self._execute_batch, batch)
+                self._flush_failures = 0
+                return
+            except Exception as e:
+                self._flush_failures += 1
+                if self._flush_failures < _FLUSH_ATTEMPTS:
+                    # Keep the batch ahead of writes queued in the meantime
+                    self._pending[:0] = batch
+                    logging.error(
+                        f"SQLite 批量写入失败，稍后重试 - {len(batch)} 条, "
+                        f"Attempt: {self._flush_failures}, Error: {e}"
+                    )
+                    raise
+            self._flush_failures = 0
+            failed = await self._run(self._execute_each, batch)
+            for sql, error in failed:
+                logging.error(f"SQLite 写入失败，已丢弃 - SQL: {sql}, Error: {error}")
+
+    async def _flush_loop(self) -> None:
+        while True:
+            try:
+                await asyncio.wait_for(self._flush_wakeup.wait(), self.flush_interval)
+            except asyncio.TimeoutError:
+                pass
+            self._flush_wakeup.clear()
+            try:
+                await self.flush()
+            except Exception:
+                pass
+
+    def _fetch(self, sql: str, params: tuple) -> list[tuple]:
+        return self._conn.execute(sql, params).fetchall()
+
+    async def query(self, sql: str, params: tuple = ()) -> list[tuple]:
+        """Run a read, after flushing queued writes (read-your-writes)."""
+        if self._conn is None:
+            raise RuntimeError("Service not started")
+        await self.flush()
+        return await self._run(self._fetch, sql, params)
+
+    def touch(self, user_id: str, session_id: str) -> None:
+        """Mark a session as active now (resets its TTL)."""
+        self.write(
+            "INSERT INTO session_activity (user_id, session_id, last_active) "
+            "VALUES (?, ?, ?) ON CONFLICT (user_id, session_id) "
+            "DO UPDATE SET last_active = excluded.last_active",
+            (user_id, session_id, time.time()),
+        )
+
+    def forget(self, user_id: str, session_id: str) -> None:
+        """Queue deletion of a session from every table."""
+        for table in _SESSION_TABLES:
+            self.write(
+                f"DELETE FROM {table} WHERE user_id = ? AND session_id = ?",
+                (user_id, session_id),
+            )
+
+    def add_expire_listener(self, listener: Callable[[str, str], Any]) -> None:
+        """Register ``listener(user_id, session_id)`` called on TTL expiry."""
+        self._expire_listeners.append(listener)
+
+    async def sweep(self) -> int:
+        """Delete sessions idle longer than ``ttl_seconds``.
+
+        Returns:
+            Number of expired sessions
+        """
+        cutoff = time.time() - self.ttl_seconds
+        expired = await self.query(
+            "SELECT user_id, session_id FROM session_activity WHERE last_active < ?",
+            (cutoff,),
+        )
+        for user_id, session_id in expired:
+            self.forget(user_id, session_id)
+        await self.flush()
+        for user_id, session_id in expired:
+            for listener in self._expire_listeners:
+                result = listener(user_id, session_id)
+                if asyncio.iscoroutine(result):
+                    await result
+        return len(expired)
+
+    async def _sweep_loop(self) -> None:
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            try:
+                expired = await self.sweep()
+                if expired:
+                    logging.info(f"清理过期会话 {expired} 个")
+            except Exception as e:
+                logging.error(f"过期会话清理失败 - Error: {e}")
+
+
+class SQLiteStateService(StateService):
+    """``StateService`` persisted in SQLite, keeping the latest rounds."""
+
+    def __init__(
+        self,
+        db: SQLiteDatabase,
+        keep_rounds: int = 3,
+        cache_size: int = 1024,
+    ):
+        """Initialize SQLite state service.
+
+        Args:
+            db: Shared database
+            keep_rounds: Rounds kept per session (older rounds are pruned)
+            cache_size: Sessions whose latest state is cached in process
+        """
+        self.db = db
+        self.keep_rounds = keep_rounds
+        # (user_id, session_id) -> (latest round_id, state JSON)
+        self._cache = _LRUCache(cache_size)
+        self._latest_round: dict[tuple[str, str], int] = {}
+        db.add_expire_listener(self._on_expire)
+
+    async def start(self) -> None:
+        await self.db.start()
+
+    async def stop(self) -> None:
+        await self.db.stop()
+        self._cache.clear()
+        self._latest_round.clear()
+
+    async def health(self) -> bool:
+        return self.db.is_open
+
+    def _on_expire(self, user_id: str, session_id: str) -> None:
+        self._cache.pop((user_id, session_id))
+        self._latest_round.pop((user_id, session_id), None)
+
+    async def _get_latest_round(self, user_id: str, sid: str) -> int:
+        key = (user_id, sid)
+        if key not in self._latest_round:
+            rows = await self.db.query(
+                "SELECT MAX(round_id) FROM agent_state "
+                "WHERE user_id = ? AND session_id = ?",
+                (user_id, sid),
+            )
+            self._latest_round[key] = rows[0][0] or 0
+        return self._latest_round[key]
+
+    async def save_state(
+        self,
+        user_id: str,
+        state: Dict[str, Any],
+        session_id: Optional[str] = None,
+        round_id: Optional[int] = None,
+    ) -> int:
+        """Queue a state write; a new round is appended if round_id is None.
+
+        Returns:
+            The round_id where the state was saved
+        """
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        sid = session_id or DEFAULT_SESSION_ID
+        key = (user_id, sid)
+        latest = await self._get_latest_round(user_id, sid)
+        if round_id is None:
+            round_id = latest + 1
+
+        data = json.dumps(state, ensure_ascii=False)
+        self.db.write(
+            "INSERT OR REPLACE INTO agent_state "
+            "(user_id, session_id, round_id, state) VALUES (?, ?, ?, ?)",
+            (user_id, sid, round_id, data),
+        )
+        if round_id >= latest:
+            self._latest_round[key] = round_id
+            self._cache.put(key, (round_id, data))
+            self.db.write(
+                "DELETE FROM agent_state WHERE user_id = ? AND session_id = ? "
+                "AND round_id <= ?",
+                (user_id, sid, round_id - self.keep_rounds),
+            )
+        self.db.touch(user_id, sid)
+        return round_id
+
+    async def export_state(
+        self,
+        user_id: str,
+        session_id: Optional[str] = None,
+        round_id: Optional[int] = None,
+    ) -> Optional[Dict[str, Any]]:
+        """Return the given round's state, or the latest if round_id is None."""
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        sid = session_id or DEFAULT_SESSION_ID
+        key = (user_id, sid)
+        cached = self._cache.get(key)
+        if cached is not None and (round_id is None or round_id == cached[0]):
+            return json.loads(cached[1])
+
+        if round_id is None:
+            rows = await self.db.query(
+                "SELECT round_id, state FROM agent_state "
+                "WHERE user_id = ? AND session_id = ? "
+                "ORDER BY round_id DESC LIMIT 1",
+                (user_id, sid),
+            )
+        else:
+            rows = await self.db.query(
+                "SELECT round_id, state FROM agent_state "
+                "WHERE user_id = ? AND session_id = ? AND round_id = ?",
+                (user_id, sid, round_id),
+            )
+        if not rows:
+            return None
+        found_round, data = rows[0]
+        if round_id is None:
+            self._cache.put(key, (found_round, data))
+        return json.loads(data)
+
+
+class SQLiteJournalBackend:
+    """``StateJournal`` backend keeping snapshots and the delta log in SQLite.
+
+    Snapshots go through ``SQLiteStateService``; the log lives in the
+    ``state_log`` table so sessions survive restarts.
+    """
+
+    def __init__(self, state_service: SQLiteStateService):
+        self.state_service = state_service
+        self.db = state_service.db
+        self._seq: Optional[int] = None
+
+    async def _next_seq(self) -> int:
+        if self._seq is None:
+            rows = await self.db.query("SELECT MAX(seq) FROM state_log")
+            self._seq = rows[0][0] or 0
+        self._seq += 1
+        return self._seq
+
+    async def load(
+        self, user_id: str, session_id: str
+    ) -> tuple[Optional[dict], list[tuple[int, dict]]]:
+        snapshot = await self.state_service.export_state(
+            session_id=session_id,
+            user_id=user_id,
+        )
+        rows = await self.db.query(
+            "SELECT seq, delta FROM state_log "
+            "WHERE user_id = ? AND session_id = ? ORDER BY seq",
+            (user_id, session_id),
+        )
+        return snapshot, [(seq, json.loads(delta)) for seq, delta in rows]
+
+    async def append(self, user_id: str, session_id: str, delta: dict) -> int:
+        seq = await self._next_seq()
+        self.db.write(
+            "INSERT INTO state_log (seq, user_id, session_id, delta) "
+            "VALUES (?, ?, ?, ?)",
+            (seq, user_id, session_id, json.dumps(delta, ensure_ascii=False)),
+        )
+        self.db.touch(user_id, session_id)
+        return seq
+
+    async def write_snapshot(
+        self, user_id: str, session_id: str, state: dict, upto_seq: int
+    ) -> None:
+        await self.state_service.save_state(
+            user_id=user_id,
+            session_id=session_id,
+            state=state,
+        )
+        # Same batch as the snapshot, so the log is never dropped without it
+        self.db.write(
+            "DELETE FROM state_log WHERE user_id = ? AND session_id = ? AND seq <= ?",
+            (user_id, session_id, upto_seq),
+        )
+
+
+class SQLiteSessionHistoryService(SessionHistoryService):
+    """``SessionHistoryService`` persisted in SQLite."""
+
+    def __init__(self, db: SQLiteDatabase, cache_size: int = 256):
+        """Initialize SQLite session history service.
+
+        Args:
+            db: Shared database
+            cache_size: Sessions (with their messages) cached in process
+        """
+        self.db = db
+        self._cache = _LRUCache(cache_size)
+        db.add_expire_listener(self._on_expire)
+
+    async def start(self) -> None:
+        await self.db.start()
+
+    async def stop(self) -> None:
+        await self.db.stop()
+        self._cache.clear()
+
+    async def health(self) -> bool:
+        return self.db.is_open
+
+    def _on_expire(self, user_id: str, session_id: str) -> None:
+        self._cache.pop((user_id, session_id))
+
+    def _insert_session(self, user_id: str, session_id: str) -> Session:
+        session = Session(id=session_id, user_id=user_id)
+        self.db.write(
+            "INSERT OR IGNORE INTO sessions (user_id, session_id) VALUES (?, ?)",
+            (user_id, session_id),
+        )
+        self.db.touch(user_id, session_id)
+        self._cache.put((user_id, session_id), session)
+        return session
+
+    async def create_session(
+        self,
+        user_id: str,
+        session_id: Optional[str] = None,
+    ) -> Session:
+        """Create and store a new session.
+
+        Returns:
+            A deep copy of the newly created Session object
+        """
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        session_id = (
+            session_id.strip()
+            if session_id and session_id.strip()
+            else str(uuid.uuid4())
+        )
+        # A re-created session starts with an empty history
+        self.db.write(
+            "DELETE FROM session_messages WHERE user_id = ? AND session_id = ?",
+            (user_id, session_id),
+        )
+        return copy.deepcopy(self._insert_session(user_id, session_id))
+
+    async def get_session(
+        self,
+        user_id: str,
+        session_id: str,
+    ) -> Session | None:
+        """Return a session with its history, creating it if missing.
+
+        Returns:
+            A deep copy of the Session object
+        """
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        key = (user_id, session_id)
+        session = self._cache.get(key)
+        if session is None:
+            exists = await self.db.query(
+                "SELECT 1 FROM sessions WHERE user_id = ? AND session_id = ?",
+                key,
+            )
+            if not exists:
+                session = self._insert_session(user_id, session_id)
+            else:
+                rows = await self.db.query(
+                    "SELECT message FROM session_messages "
+                    "WHERE user_id = ? AND session_id = ? ORDER BY id",
+                    key,
+                )
+                session = Session(
+                    id=session_id,
+                    user_id=user_id,
+                    messages=[
+                        Message.model_validate_json(message) for (message,) in rows
+                    ],
+                )
+                self._cache.put(key, session)
+        self.db.touch(user_id, session_id)
+        return copy.deepcopy(session)
+
+    async def delete_session(self, user_id: str, session_id: str) -> None:
+        """Delete a session and its history; missing sessions are ignored."""
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        self._cache.pop((user_id, session_id))
+        self.db.forget(user_id, session_id)
+
+    async def list_sessions(self, user_id: str) -> list[Session]:
+        """List a user's sessions without their message history."""
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        rows = await self.db.query(
+            "SELECT session_id FROM sessions WHERE user_id = ? ORDER BY rowid",
+            (user_id,),
+        )
+        return [Session(id=session_id, user_id=user_id) for (session_id,) in rows]
+
+    async def append_message(
+        self,
+        session: Session,
+        message: Union[
+            Message,
+            List[Message],
+            Dict[str, Any],
+            List[Dict[str, Any]],
+        ],
+    ) -> None:
+        """Append messages to the session object and queue them for storage."""
+        if not self.db.is_open:
+            raise RuntimeError("Service not started")
+
+        if not isinstance(message, list):
+            message = [message]
+        norm_message = [
+            msg if isinstance(msg, Message) else Message.model_validate(msg)
+            for msg in message
+            if msg is not None
+        ]
+        session.messages.extend(norm_message)
+
+        key = (session.user_id, session.id)
+        cached = self._cache.get(key)
+        if cached is not None and cached is not session:
+            cached.messages.extend(copy.deepcopy(norm_message))
+        self.db.write(
+            "INSERT OR IGNORE INTO sessions (user_id, session_id) VALUES (?, ?)",
+            key,
+        )
+        for msg in norm_message:
+            self.db.write(
+                "INSERT INTO session_messages (user_id, session_id, message) "
+                "VALUES (?, ?, ?)",
+                (*key, msg.model_dump_json()),
+            )
+        self.db.touch(*key)
@@ -0,0 +1,174 @@
+"""Incremental (snapshot + append-only log) agent state persistence.
+
+Instead of serializing the whole agent, including every memory message, at
+the end of each request, only the memory delta since the last save is
+appended to a per-session log. Loading restores the snapshot and replays the
+log. Once a session's log grows past ``compact_every`` entries, a background
+task folds it into a new snapshot.
+
+The agent's memory must be a ``BoundedMemory`` (delta tracking); other
+memories fall back to full snapshots.
+"""
+
+import asyncio
+import logging
+from typing import Any, Optional
+
+from .bounded_memory import BoundedMemory
+
+MEMORY_KEY = "memory"
+
+
+class StateServiceJournalBackend:
+    """Stores snapshots in a state service and the delta log in process.
+
+    Matches the durability of ``InMemoryStateService``; durable services can
+    provide their own backend with the same methods (see
+    ``sqlite_store.SQLiteJournalBackend``).
+    """
+
+    def __init__(self, state_service: Any):
+        self.state_service = state_service
+        # (user_id, session_id) -> [(seq, delta), ...]
+        self._logs: dict[tuple[str, str], list[tuple[int, dict]]] = {}
+        self._seq = 0
+
+    async def load(
+        self, user_id: str, session_id: str
+    ) -> tuple[Optional[dict], list[tuple[int, dict]]]:
+        snapshot = await self.state_service.export_state(
+            session_id=session_id,
+            user_id=user_id,
+        )
+        return snapshot, list(self._logs.get((user_id, session_id), []))
+
+    async def append(self, user_id: str, session_id: str, delta: dict) -> int:
+        self._seq += 1
+        self._logs.setdefault((user_id, session_id), []).append((self._seq, delta))
+        return self._seq
+
+    async def write_snapshot(
+        self, user_id: str, session_id: str, state: dict, upto_seq: int
+    ) -> None:
+        await self.state_service.save_state(
+            user_id=user_id,
+            session_id=session_id,
+            state=state,
+        )
+        key = (user_id, session_id)
+        log = self._logs.get(key)
+        if log is not None:
+            log[:] = [entry for entry in log if entry[0] > upto_seq]
+            if not log:
+                del self._logs[key]
+
+
+class StateJournal:
+    """Snapshot + delta-log persistence of agent state."""
+
+    def __init__(self, backend: Any, compact_every: int = 20):
+        """Initialize state journal.
+
+        Args:
+            backend: Storage backend (see ``StateServiceJournalBackend``)
+            compact_every: Log length that triggers background compaction
+        """
+        self.backend = backend
+        self.compact_every = compact_every
+        self._log_lengths: dict[tuple[str, str], int] = {}
+        self._compactions: dict[tuple[str, str], asyncio.Task] = {}
+
+    @staticmethod
+    def replay(
+        snapshot: Optional[dict], log: list[tuple[int, dict]]
+    ) -> Optional[dict]:
+        """Rebuild the full agent state from a snapshot and its delta log."""
+        state = snapshot
+        for _, delta in log:
+            agent_state = dict(delta["agent"])
+            memory_state = (state or {}).get(MEMORY_KEY, {})
+            agent_state[MEMORY_KEY] = BoundedMemory.apply_state_delta(
+                memory_state, delta["memory"]
+            )
+            state = agent_state
+        return state
+
+    async def load(self, agent: Any, user_id: str, session_id: str) -> bool:
+        """Restore agent state from snapshot + log.
+
+        Returns:
+            True if state was loaded, False if no state existed
+        """
+        snapshot, log = await self.backend.load(user_id, session_id)
+        key = (user_id, session_id)
+        self._log_lengths[key] = len(log)
+        state = self.replay(snapshot, log)
+        if not state:
+            self._log_lengths.pop(key, None)
+            return False
+        agent.load_state_dict(state)
+        return True
+
+    async def save(self, agent: Any, user_id: str, session_id: str) -> None:
+        """Persist the agent's changes since the last save."""
+        key = (user_id, session_id)
+        memory = getattr(agent, MEMORY_KEY, None)
+
+        if key not in self._log_lengths or not isinstance(memory, BoundedMemory):
+            # First save of the session (or no delta support): full snapshot
+            state = agent.state_dict()
+            await self.backend.write_snapshot(user_id, session_id, state, 0)
+            self._log_lengths[key] = 0
+            if isinstance(memory, BoundedMemory):
+                memory.mark_persisted()
+            return
+
+        with memory.content_excluded():
+            agent_state = agent.state_dict()
+        agent_state.pop(MEMORY_KEY, None)
+        delta = {"agent": agent_state, "memory": memory.state_delta()}
+        await self.backend.append(user_id, session_id, delta)
+        memory.mark_persisted()
+
+        self._log_lengths[key] += 1
+        if self._log_lengths[key] >= self.compact_every:
+            self._schedule_compaction(key)
+
+    def forget(self, user_id: str, session_id: str) -> None:
+        """Drop bookkeeping for a session whose stored state was deleted.
+
+        The next save writes a full snapshot again.
+        """
+        self._log_lengths.pop((user_id, session_id), None)
+
+    def _schedule_compaction(self, key: tuple[str, str]) -> None:
+        task = self._compactions.get(key)
+        if task is not None and not task.done():
+            return
+        self._compactions[key] = asyncio.create_task(self._compact(*key))
+
+    async def _compact(self, user_id: str, session_id: str) -> None:
+        """Fold the session's log into a new snapshot."""
+        key = (user_id, session_id)
+        try:
+            snapshot, log = await self.backend.load(user_id, session_id)
+            if not log:
+                return
+            state = self.replay(snapshot, log)
+            upto_seq = log[-1][0]
+            await self.backend.write_snapshot(user_id, session_id, state, upto_seq)
+            if key in self._log_lengths:
+                self._log_lengths[key] = max(self._log_lengths[key] - len(log), 0)
+            logging.info(
+                f"状态日志压缩完成 - SessionID: {session_id}, 合并 {len(log)} 条"
+            )
+        except Exception as e:
+            logging.error(f"状态日志压缩失败 - SessionID: {session_id}, Error: {e}")
+        finally:
+            self._compactions.pop(key, None)
+
+    async def close(self) -> None:
+        """Wait for running compactions."""
+        tasks = list(self._compactions.values())
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
@@ -0,0 +1,182 @@
+"""Token counting backends for memory accounting.
+
+Provides:
+- HeuristicTokenCounter: character-ratio estimate (no dependencies)
+- BPETokenCounter: exact counts from a local BPE vocabulary file, either a
+  HuggingFace ``tokenizer.json`` (needs ``tokenizers``) or a tiktoken
+  ``.tiktoken`` rank file (needs ``tiktoken``)
+- CachedTokenCounter: LRU cache keyed by content hash in front of a backend
+
+``get_token_counter`` picks the BPE backend when ``TOKENIZER_VOCAB_PATH``
+points to a usable vocabulary and falls back to the heuristic otherwise.
+"""
+
+import hashlib
+import logging
+import os
+from collections import OrderedDict
+from typing import Optional
+
+# cl100k 系列编码使用的预分词正则
+_TIKTOKEN_PAT_STR = (
+    r"""(?i:'s|'t|'re|'ve|'m|'ll|'d)|[^\r\n\p{L}\p{N}]?\p{L}+|\p{N}{1,3}|"""
+    r""" ?[^\s\p{L}\p{N}]+[\r\n]*|\s*[\r\n]+|\s+(?!\S)|\s+"""
+)
+
+
+class HeuristicTokenCounter:
+    """Character-ratio token estimate.
+
+    - Text content: 1 token ≈ 3 characters (conservative)
+    - HTML/code: 1 token ≈ 4 characters (more dense)
+    - Binary/base64: 1 token ≈ 5 characters
+    """
+
+    name = "heuristic"
+
+    def count(self, text: str) -> int:
+        stripped = text.strip()
+        if not stripped:
+            return 0
+        if text.startswith("<!DOCTYPE html>") or text.startswith("<html"):
+            return len(text) // 4
+        elif text.startswith("data:") or len(text) // len(stripped) > 10:
+            return len(text) // 5
+        else:
+            return len(text) // 3
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        return [self.count(text) for text in texts]
+
+
+class BPETokenCounter:
+    """Exact token counts from a local BPE vocabulary file."""
+
+    def __init__(self, vocab_path: str):
+        """Initialize BPE token counter.
+
+        Args:
+            vocab_path: Path to ``tokenizer.json`` or a ``.tiktoken`` file
+
+        Raises:
+            FileNotFoundError: If the vocabulary file does not exist
+            ImportError: If the library for the file format is missing
+        """
+        if not os.path.exists(vocab_path):
+            raise FileNotFoundError(f"Vocabulary file not found: {vocab_path}")
+        self.vocab_path = vocab_path
+        self.name = f"bpe:{os.path.basename(vocab_path)}"
+
+        if vocab_path.endswith(".json"):
+            from tokenizers import Tokenizer
+
+            tokenizer = Tokenizer.from_file(vocab_path)
+            self._encode_batch = lambda texts: [
+                len(enc.ids)
+                for enc in tokenizer.encode_batch(texts, add_special_tokens=False)
+            ]
+        else:
+            import tiktoken
+            from tiktoken.load import load_tiktoken_bpe
+
+            encoding = tiktoken.Encoding(
+                name=os.path.basename(vocab_path),
+                pat_str=_TIKTOKEN_PAT_STR,
+                mergeable_ranks=load_tiktoken_bpe(vocab_path),
+                special_tokens={},
+            )
+            self._encode_batch = lambda texts: [
+                len(ids) for ids in encoding.encode_ordinary_batch(texts)
+            ]
+
+    def count(self, text: str) -> int:
+        return self._encode_batch([text])[0]
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        if not texts:
+            return []
+        return self._encode_batch(texts)
+
+
+class CachedTokenCounter:
+    """LRU cache of token counts keyed by content hash."""
+
+    def __init__(self, backend, max_entries: int = 10000):
+        """Initialize cached token counter.
+
+        Args:
+            backend: Token counter to delegate cache misses to
+            max_entries: Maximum number of cached counts (default 10K)
+        """
+        self.backend = backend
+        self.name = backend.name
+        self.max_entries = max_entries
+        self._cache: "OrderedDict[bytes, int]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(text: str) -> bytes:
+        return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+    def _store(self, key: bytes, tokens: int) -> None:
+        self._cache[key] = tokens
+        if len(self._cache) > self.max_entries:
+            self._cache.popitem(last=False)
+
+    def count(self, text: str) -> int:
+        return self.count_batch([text])[0]
+
+    def count_batch(self, texts: list[str]) -> list[int]:
+        """Count tokens, encoding all cache misses in one backend call."""
+        keys = [self._key(text) for text in texts]
+        results: list[Optional[int]] = []
+        missing: list[int] = []
+        for i, key in enumerate(keys):
+            tokens = self._cache.get(key)
+            if tokens is None:
+                missing.append(i)
+            else:
+                self._cache.move_to_end(key)
+                self.hits += 1
+            results.append(tokens)
+
+        if missing:
+            self.misses += len(missing)
+            counts = self.backend.count_batch([texts[i] for i in missing])
+            for i, tokens in zip(missing, counts):
+                results[i] = tokens
+                self._store(keys[i], tokens)
+        return results
+
+
+_default_counter = None
+
+
+def get_token_counter(vocab_path: Optional[str] = None):
+    """Return the default (shared) token counter.
+
+    Args:
+        vocab_path: BPE vocabulary file; defaults to ``TOKENIZER_VOCAB_PATH``.
+            When unset or unusable, the heuristic counter is used.
+
+    Returns:
+        A cached token counter
+    """
+    global _default_counter
+    if vocab_path is None and _default_counter is not None:
+        return _default_counter
+
+    path = vocab_path or os.getenv("TOKENIZER_VOCAB_PATH")
+    backend = HeuristicTokenCounter()
+    if path:
+        try:
+            backend = BPETokenCounter(path)
+            logging.info(f"使用 BPE 分词器统计 token: {path}")
+        except (ImportError, OSError, ValueError) as e:
+            logging.warning(f"BPE 分词器不可用，回退到启发式估算: {e}")
+
+    counter = CachedTokenCounter(backend)
+    if vocab_path is None:
+        _default_counter = counter
+    return counter
@@ -2,19 +2,43 @@
 
 This module provides API endpoints for:
 - File upload from base64-encoded data
-- Serving uploaded files by file_id
+- Streaming, resumable chunked upload from the raw request body
+- Serving uploaded files by file_id (streamed, with Range and
+  conditional request support)
 """
 
-import base64
 import logging
-import mimetypes
-import os
+import mmap
+from email.utils import formatdate, parsedate_to_datetime
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Iterator, Mapping, Optional
 
+from fastapi.responses import (
+    FileResponse,
+    JSONResponse,
+    Response,
+    StreamingResponse,
+)
 from pydantic import BaseModel, Field
 
-from util.file_util import save_file_from_base64, UPLOADS_DIR
+from util.file_util import (
+    MAX_FILE_SIZE,
+    UploadOffsetError,
+    UploadOwnerError,
+    await_upload,
+    check_upload_quota,
+    get_chunked_upload,
+    release_chunked_upload,
+    save_file_from_base64_async,
+    schedule_extraction,
+    upload_index,
+)
+
+from util.file_io import run_file_io
+from util.upload_retention import QuotaExceededError
+
+# Bytes read from the mmap per chunk of a range response
+FILE_CHUNK_SIZE = 256 * 1024
 
 
 class UploadRequest(BaseModel):
@@ -23,10 +47,12 @@ class UploadRequest(BaseModel):
     Attributes:
         filename: Original filename of the uploaded file
         file_data: Base64-encoded file data or data URL
+        user_id: Owner of the upload (for quota accounting)
     """
 
     filename: str = Field(default="uploaded_file", description="Original filename")
     file_data: str = Field(..., description="Base64-encoded file data or data URL")
+    user_id: Optional[str] = Field(default=None, description="Owner of the upload")
 
 
 async def upload_file_handler(body: UploadRequest) -> dict:
@@ -49,8 +75,9 @@ async def upload_file_handler(body: UploadRequest) -> dict:
         if not body.file_data:
             return {"error": "Missing file_data", "status": 400}
 
-        # Use save_file_from_base64 function from util
-        result = save_file_from_base64(body.file_data, body.filename)
+        result = await save_file_from_base64_async(
+            body.file_data, body.filename, body.user_id
+        )
 
         logging.info(
             f"文件上传成功 - FileID: {result['file_id']}, "
@@ -58,6 +85,9 @@ async def upload_file_handler(body: UploadRequest) -> dict:
         )
 
         return result
+    except QuotaExceededError as e:
+        logging.warning(f"文件上传失败: {e}")
+        return {"error": str(e), "status": 413}
     except ValueError as e:
         logging.error(f"文件上传失败: {e}")
         return {"error": str(e), "status": 400}
@@ -66,52 +96,280 @@ async def upload_file_handler(body: UploadRequest) -> dict:
         return {"error": "Internal server error", "status": 500}
 
 
-async def serve_file_handler(file_id: str) -> dict:
-    """Serve uploaded files by file_id.
+async def chunked_upload_handler(
+    stream: AsyncIterator[bytes],
+    filename: str = "uploaded_file",
+    upload_id: Optional[str] = None,
+    offset: int = 0,
+    final: bool = True,
+    content_length: Optional[int] = None,
+    user_id: Optional[str] = None,
+) -> dict:
+    """Handle a streaming upload chunk written incrementally to disk.
+
+    The first request omits upload_id; later requests resume the upload by
+    sending the next bytes at ``offset``. The request with ``final=True``
+    completes the upload.
+
+    Args:
+        stream: Request body as an async byte stream
+        filename: Original filename
+        upload_id: Upload to resume (None starts a new upload)
+        offset: Byte offset of this chunk within the file
+        final: Whether this is the last chunk
+        content_length: Content-Length of the request, if known
+        user_id: Owner of the upload (for quota accounting); chunks of an
+            upload must come from the user that started it
+
+    Returns:
+        dict with upload_id, offset while the upload is incomplete
+        dict with file_id, file_url, filename, size, sha256 when complete
+        dict with error and status code on failure (409 includes the
+        expected offset)
+    """
+    try:
+        # May re-hash a partial file left by an earlier process
+        upload = await run_file_io(get_chunked_upload, upload_id, filename, user_id)
+    except UploadOwnerError as e:
+        return {"error": str(e), "status": 403}
+    except ValueError as e:
+        return {"error": str(e), "status": 400}
+
+    if content_length is not None and offset + content_length > MAX_FILE_SIZE:
+        release_chunked_upload(upload, abort=True)
+        return {"error": "File size exceeds 10MB limit", "status": 413}
+    if content_length is not None:
+        try:
+            await run_file_io(
+                check_upload_quota, upload.user_id, offset + content_length
+            )
+        except QuotaExceededError as e:
+            release_chunked_upload(upload, abort=True)
+            return {"error": str(e), "status": 413}
+
+    try:
+        size = await upload.write_stream(offset, stream)
+    except UploadOffsetError as e:
+        return {
+            "error": str(e),
+            "status": 409,
+            "upload_id": upload.upload_id,
+            "offset": e.expected,
+        }
+    except ValueError as e:
+        logging.error(f"分块上传失败 - UploadID: {upload.upload_id}, Error: {e}")
+        release_chunked_upload(upload, abort=True)
+        return {"error": str(e), "status": 413}
+    except Exception as e:
+        # Connection dropped: keep the partial file so the client can resume
+        logging.warning(
+            f"分块上传中断 - UploadID: {upload.upload_id}, "
+            f"Offset: {upload.size}, Error: {e}"
+        )
+        return {
+            "error": "Upload interrupted",
+            "status": 500,
+            "upload_id": upload.upload_id,
+            "offset": upload.size,
+        }
+
+    if not final:
+        return {"upload_id": upload.upload_id, "offset": size}
+
+    try:
+        result = await run_file_io(upload.finalize)
+    except QuotaExceededError as e:
+        release_chunked_upload(upload, abort=True)
+        return {"error": str(e), "status": 413}
+    except Exception as e:
+        logging.error(f"分块上传保存失败: {e}", exc_info=True)
+        return {"error": "Internal server error", "status": 500}
+    release_chunked_upload(upload)
+    schedule_extraction(result)
+
+    logging.info(
+        f"文件上传成功 - FileID: {result['file_id']}, "
+        f"Filename: {result['filename']}, Size: {result['size']} bytes, "
+        f"SHA256: {result['sha256']}"
+    )
+    return result
+
+
+def parse_range(header: str, size: int) -> Optional[tuple[int, int]]:
+    """Parse a single-range ``Range`` header into inclusive byte offsets.
+
+    Args:
+        header: Range header value, e.g. ``bytes=0-1023`` or ``bytes=-500``
+        size: File size in bytes
+
+    Returns:
+        (start, end) inclusive, or None if the header is not a byte range
+        this handler supports (the full file is served instead)
+
+    Raises:
+        ValueError: If the range is not satisfiable
+    """
+    unit, _, spec = header.partition("=")
+    if unit.strip().lower() != "bytes" or "," in spec:
+        return None
+    start_s, sep, end_s = spec.strip().partition("-")
+    try:
+        start = int(start_s) if start_s else None
+        end = int(end_s) if end_s else None
+    except ValueError:
+        return None
+    if not sep or start is None and end is None:
+        return None
+
+    if start is None:
+        # Suffix range: last N bytes
+        if end == 0:
+            raise ValueError("Range not satisfiable")
+        return max(size - end, 0), size - 1
+    if end is None or end >= size:
+        end = size - 1
+    if start >= size or start > end:
+        raise ValueError("Range not satisfiable")
+    return start, end
+
+
+def iter_file_range(
+    file_path: Path, start: int, end: int, chunk_size: int = FILE_CHUNK_SIZE
+) -> Iterator[bytes]:
+    """Yield bytes ``start..end`` (inclusive) of a file from an mmap.
+
+    Only one chunk is materialized at a time, so memory per request stays
+    constant regardless of file size.
+    """
+    with open(file_path, "rb") as f, mmap.mmap(
+        f.fileno(), 0, access=mmap.ACCESS_READ
+    ) as mapped:
+        position = start
+        while position <= end:
+            stop = min(position + chunk_size, end + 1)
+            yield mapped[position:stop]
+            position = stop
+
+
+def _not_modified(headers: Mapping[str, str], etag: str, mtime: float) -> bool:
+    if_none_match = headers.get("if-none-match")
+    if if_none_match is not None:
+        tags = [tag.strip().removeprefix("W/") for tag in if_none_match.split(",")]
+        return "*" in tags or etag in tags
+    if_modified_since = headers.get("if-modified-since")
+    if if_modified_since:
+        try:
+            since = parsedate_to_datetime(if_modified_since).timestamp()
+        except (TypeError, ValueError):
+            return False
+        return int(mtime) <= since
+    return False
+
+
+async def serve_file_handler(
+    file_id: str, headers: Optional[Mapping[str, str]] = None
+) -> Response:
+    """Serve an uploaded file with conditional and range request support.
+
+    Full responses use ``FileResponse`` (sendfile where the server supports
+    it); ``Range`` requests stream the requested bytes from an mmap. ETag and
+    Last-Modified are derived from the file's size and mtime, and matching
+    ``If-None-Match``/``If-Modified-Since`` headers get a 304.
 
     Args:
         file_id: UUID of the uploaded file
+        headers: Request headers (lower-case keys, e.g. starlette ``Headers``)
 
     Returns:
-        dict with file_id, filename, content_type, size, content (base64-encoded)
-        dict with error and status code if file not found
+        200/206 file response, 304 if not modified, 404/416 JSON error
 
     Examples:
-        >>> result = await serve_file_handler("a1b2c3d4-e5f6-7890-abcd-ef1234567890")
-        >>> print(result['filename'])
-        'example.pdf'
+        >>> response = await serve_file_handler(file_id, request.headers)
+        >>> response.status_code
+        200
     """
-    file_dir = os.path.join(UPLOADS_DIR, file_id)
+    headers = headers or {}
+    # Waits for an attachment that is still being saved
+    record = await await_upload(file_id)
+    if record is None:
+        return JSONResponse({"error": "File not found", "status": 404}, 404)
 
-    # Check if directory exists
-    if not os.path.exists(file_dir):
-        return {"error": "File not found", "status": 404}
+    file_path = Path(record["file_path"])
+    content_type = record["mime"]
+    try:
+        stat = await run_file_io(file_path.stat)
+    except OSError as e:
+        # Stale index entry: the file was removed from disk
+        logging.error(f"Error serving file {file_id}: {e}")
+        await run_file_io(upload_index.remove, file_id)
+        return JSONResponse({"error": "File not found", "status": 404}, 404)
+    # Serving counts as use for expiry
+    await run_file_io(upload_index.touch, file_id)
 
-    # Find the file in the directory (there's only one file per directory)
-    files = list(Path(file_dir).glob("*"))
-    if not files or not files[0].is_file():
-        return {"error": "File not found", "status": 404}
+    etag = f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"'
+    response_headers = {
+        "ETag": etag,
+        "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+        "Accept-Ranges": "bytes",
+        "Cache-Control": "private, max-age=0, must-revalidate",
+    }
+    if _not_modified(headers, etag, stat.st_mtime):
+        return Response(status_code=304, headers=response_headers)
 
-    file_path = files[0]
+    byte_range = None
+    range_header = headers.get("range")
+    if_range = headers.get("if-range")
+    if range_header and stat.st_size and (if_range is None or if_range == etag):
+        try:
+            byte_range = parse_range(range_header, stat.st_size)
+        except ValueError:
+            response_headers["Content-Range"] = f"bytes */{stat.st_size}"
+            return Response(status_code=416, headers=response_headers)
 
-    # Determine content type
-    content_type, _ = mimetypes.guess_type(str(file_path))
-    if content_type is None:
-        content_type = "application/octet-stream"
+    if byte_range is None:
+        return FileResponse(
+            file_path,
+            media_type=content_type,
+            filename=record["filename"],
+            content_disposition_type="inline",
+            headers=response_headers,
+            stat_result=stat,
+        )
 
-    # Read and return file content
-    try:
-        with open(file_path, "rb") as f:
-            content = f.read()
+    start, end = byte_range
+    response_headers["Content-Range"] = f"bytes {start}-{end}/{stat.st_size}"
+    response_headers["Content-Length"] = str(end - start + 1)
+    return StreamingResponse(
+        iter_file_range(file_path, start, end),
+        status_code=206,
+        media_type=content_type,
+        headers=response_headers,
+    )
 
-        # Return file info and content
-        return {
-            "file_id": file_id,
-            "filename": file_path.name,
-            "content_type": content_type,
-            "size": len(content),
-            "content": base64.b64encode(content).decode("utf-8"),
-        }
-    except Exception as e:
-        logging.error(f"Error serving file {file_id}: {e}")
-        return {"error": str(e), "status": 500}
+
+async def list_files_handler(user_id: str, limit: int = 100, offset: int = 0) -> dict:
+    """List a user's uploaded files from the upload index, newest first.
+
+    Args:
+        user_id: Owner whose files are listed
+        limit: Maximum number of files
+        offset: Number of files to skip
+
+    Returns:
+        dict with files (file_id, filename, size, mime, sha256, created_at)
+        and total_size in bytes, or error and status 400 if user_id is empty
+    """
+    if not user_id:
+        return {"error": "user_id is required", "status": 400}
+    records = await run_file_io(
+        upload_index.list_uploads,
+        user_id=user_id,
+        limit=min(max(limit, 1), 1000),
+        offset=max(offset, 0),
+    )
+    total_size = await run_file_io(upload_index.total_size, user_id)
+    fields = ("file_id", "filename", "size", "mime", "sha256", "created_at")
+    return {
+        "files": [{key: record[key] for key in fields} for record in records],
+        "total_size": total_size,
+    }
@@ -1,5 +1,8 @@
 # 服务器配置
 import os
+from typing import Optional
+
+import yaml
 
 API_HOST = os.getenv("API_HOST", "0.0.0.0")
 API_PORT = int(os.getenv("API_PORT", 8000))
@@ -23,6 +26,7 @@ main_agent_sys_prompt = """你是一个友好、专业的AI助手，擅长回答
 2. 提供信息和解释概念
 3. 进行简单的推理和分析
 4. 使用搜索工具获取最新信息（如果可用）
+5. 使用 read_attachment 工具读取用户上传的附件，先查看概要，再按页或分块读取所需内容
 
 回答风格：
 - 简洁明了，直击要点
@@ -62,6 +66,46 @@ simple_agent_sys_prompt = """你是一个友好、专业的AI助手，擅长回
 请直接回答用户的问题，不需要不必要的开场白或结束语。
 """
 
+# 会话与 Agent 状态存储：sqlite 持久化到本地磁盘（WAL、批量写入、闲置过期），
+# memory 为进程内存储（重启后丢失）
+STATE_BACKEND = os.getenv("STATE_BACKEND", "sqlite").lower()
+STATE_DB_PATH = os.getenv(
+    "STATE_DB_PATH", os.path.join(os.path.dirname(__file__), "data", "state.db")
+)
+# 会话闲置超过该秒数后被清理，0 表示永不过期
+SESSION_TTL_SECONDS = int(os.getenv("SESSION_TTL_SECONDS", 7 * 24 * 3600))
+
+# 上传文件保留策略：过期秒数（0 表示永久保留）、全局与单用户字节配额
+# （0 表示不限）、后台清理间隔秒数
+UPLOAD_TTL_SECONDS = int(os.getenv("UPLOAD_TTL_SECONDS", 7 * 24 * 3600))
+UPLOAD_QUOTA_BYTES = int(os.getenv("UPLOAD_QUOTA_BYTES", 10 * 1024 ** 3))
+UPLOAD_USER_QUOTA_BYTES = int(os.getenv("UPLOAD_USER_QUOTA_BYTES", 1024 ** 3))
+UPLOAD_GC_INTERVAL = int(os.getenv("UPLOAD_GC_INTERVAL", 3600))
+
+# 采集任务配置文件（collection 并发、超时、重试，sources 优先级，storage 输出目录）
+COLLECTION_CONFIG_PATH = os.getenv(
+    "COLLECTION_CONFIG_PATH", os.path.join(os.path.dirname(__file__), "config.yaml")
+)
+
+
+def load_collection_config(path: Optional[str] = None) -> dict:
+    """Load the collection settings file (config.yaml)."""
+    with open(path or COLLECTION_CONFIG_PATH, encoding="utf-8") as f:
+        return yaml.safe_load(f) or {}
+
+
+# 批量采集运行日志（每行状态、结果位置，支持中断后续跑）
+COLLECTION_DB_PATH = os.getenv(
+    "COLLECTION_DB_PATH",
+    os.path.join(os.path.dirname(__file__), "data", "collection.db"),
+)
+
+# 任务表解析结果的列式缓存目录（Arrow IPC，按路径、修改时间和内容哈希校验），
+# 设为空字符串关闭缓存
+EXCEL_CACHE_DIR = os.getenv(
+    "EXCEL_CACHE_DIR", os.path.join(os.path.dirname(__file__), "data", "excel_cache")
+)
+
 # MCP 服务器配置
 mcp_servers_config = {
         "ddg-search": {
@@ -90,3 +134,17 @@ mcp_servers_config = {
         }
     
 }
+
+# MCP 连接池配置（每个服务器的常驻进程数 size、并发调用上限 max_concurrency、
+# 启动超时 connect_timeout，lazy=True 表示首次调用工具时才启动进程；
+# 尚无工具 schema 缓存时，首次启动仍需拉起一次进程以获取工具列表）
+MCP_LAZY_START = os.getenv("MCP_LAZY_START", "false").lower() == "true"
+
+mcp_pool_config = {
+    "ddg-search": {"size": 1, "max_concurrency": 4, "connect_timeout": 30},
+    "playwright": {
+        "size": int(os.getenv("PLAYWRIGHT_POOL_SIZE", min(4, os.cpu_count() or 1))),
+        "connect_timeout": 120,
+    },
+    "minimax-coding-plan": {"size": 1, "max_concurrency": 2, "connect_timeout": 30},
+}
@@ -0,0 +1,121 @@
+"""Excel 读取性能测试：read_excel 新旧实现对比
+
+生成一个包含合并单元格的大任务表（默认 10 万行），分别用旧实现
+（load_workbook 全量加载 + pd.read_excel 二次解析 + 逐单元格填充合并区域）
+和当前的 tools.excel_reader.read_excel（read_only 单次解析 + 整块填充）读取，
+比较耗时并校验两者结果一致；再测试 tools.excel_cache.read_excel_cached
+首次读取（解析并写入 Arrow 缓存）与再次读取（内存映射加载）的耗时。
+
+用法:
+    python examples/benchmark_excel_reader.py [--rows 100000] [--merge-every 20]
+"""
+
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+import pandas as pd
+from openpyxl import Workbook, load_workbook
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from tools.excel_cache import read_excel_cached
+from tools.excel_reader import read_excel
+
+COLUMNS = ["类型", "所属部门", "职务原文名", "职务中文名", "政府届别", "数据源"]
+
+
+def read_excel_legacy(file_path: str, sheet_name=0) -> pd.DataFrame:
+    """The previous read_excel implementation (reference for comparison)."""
+    wb = load_workbook(file_path, data_only=True)
+    try:
+        if isinstance(sheet_name, int):
+            ws = wb.worksheets[sheet_name]
+        else:
+            ws = wb[sheet_name]
+        df = pd.read_excel(file_path, engine="openpyxl")
+        for merged_range in ws.merged_cells.ranges:
+            min_col, min_row, max_col, max_row = merged_range.bounds
+            start_row = min_row - 2
+            end_row = max_row - 2
+            start_col = min_col - 1
+            end_col = max_col - 1
+            if start_row >= len(df):
+                continue
+            base_value = df.iloc[start_row, start_col]
+            for row in range(start_row, min(end_row + 1, len(df))):
+                for col in range(start_col, min(end_col + 1, len(df.columns))):
+                    df.iloc[row, col] = base_value
+    finally:
+        wb.close()
+    return df
+
+
+def build_workbook(path: str, rows: int, merge_every: int) -> None:
+    """Write a task sheet with vertically merged 类型/政府届别/数据源 blocks."""
+    wb = Workbook()
+    ws = wb.active
+    ws.append(COLUMNS)
+    for i in range(rows):
+        block = i // merge_every
+        first = i % merge_every == 0
+        ws.append(
+            [
+                f"类型{block % 7}" if first else None,
+                f"部门{i % 13}",
+                f"Title {i}",
+                f"职务{i}",
+                f"第{block % 50}届" if first else None,
+                f"https://example.com/{block}" if first else None,
+            ]
+        )
+    for start in range(2, rows + 2, merge_every):
+        end = min(start + merge_every - 1, rows + 1)
+        if end > start:
+            for column in ("A", "E", "F"):
+                ws.merge_cells(f"{column}{start}:{column}{end}")
+    wb.save(path)
+
+
+def timed(func, *args) -> tuple[pd.DataFrame, float]:
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--merge-every", type=int, default=20)
+    parser.add_argument(
+        "--skip-legacy", action="store_true", help="只测试当前实现（旧实现很慢）"
+    )
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        path = os.path.join(tmp_dir, "tasks.xlsx")
+        print(f"生成 {args.rows} 行测试表 ...")
+        build_workbook(path, args.rows, args.merge_every)
+
+        df, elapsed = timed(read_excel, path)
+        print(f"read_excel         {elapsed:8.2f} s  ({len(df)} 行)")
+        cache_dir = os.path.join(tmp_dir, "cache")
+        _, cold = timed(read_excel_cached, path, 0, cache_dir)
+        cached, warm = timed(read_excel_cached, path, 0, cache_dir)
+        print(f"cached (首次)      {cold:8.3f} s")
+        print(f"cached (命中)      {warm:8.3f} s")
+        pd.testing.assert_frame_equal(df, cached)
+        if not args.skip_legacy:
+            legacy, legacy_elapsed = timed(read_excel_legacy, path)
+            print(f"read_excel_legacy  {legacy_elapsed:8.2f} s  ({len(legacy)} 行)")
+            print(f"加速比 {legacy_elapsed / elapsed:.1f}x")
+            pd.testing.assert_frame_equal(
+                df.astype(str), legacy.astype(str), check_dtype=False
+            )
+            print("结果一致")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,85 @@
+"""Token 计数基准：启发式估算 vs BPE 分词器
+
+在真实采集对话记录上比较各 token 计数后端的准确度与速度，BPE 计数作为基准值。
+
+用法:
+    python examples/benchmark_tokenizer.py <vocab_file> <transcript> [<transcript> ...]
+
+transcript 可以是 BoundedMemory.state_dict() 导出的 JSON（含 "content" 列表），
+也可以是纯文本文件（按空行分段）。
+"""
+
+import argparse
+import json
+import os
+import sys
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+from agent.tokenizer import (
+    BPETokenCounter,
+    CachedTokenCounter,
+    HeuristicTokenCounter,
+)
+
+
+def load_texts(path: str) -> list[str]:
+    """Load message texts from a state dict JSON or a plain text file."""
+    with open(path, "r", encoding="utf-8") as f:
+        raw = f.read()
+    try:
+        data = json.loads(raw)
+    except ValueError:
+        return [part for part in raw.split("\n\n") if part.strip()]
+    messages = data.get("content", []) if isinstance(data, dict) else data
+    return [str(msg.get("content", "")) for msg in messages]
+
+
+def time_counter(counter, texts: list[str], rounds: int) -> tuple[list[int], float]:
+    """Return counts and the best wall time over ``rounds`` bulk passes."""
+    best = float("inf")
+    counts: list[int] = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        counts = counter.count_batch(texts)
+        best = min(best, time.perf_counter() - started)
+    return counts, best
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("vocab", help="tokenizer.json or .tiktoken vocabulary")
+    parser.add_argument("transcripts", nargs="+", help="transcript files")
+    parser.add_argument("--rounds", type=int, default=5)
+    args = parser.parse_args()
+
+    texts = [text for path in args.transcripts for text in load_texts(path)]
+    chars = sum(len(text) for text in texts)
+    size = sum(len(text.encode("utf-8")) for text in texts)
+    print(f"消息数: {len(texts)}, 字符数: {chars}, 字节数: {size}")
+
+    bpe = BPETokenCounter(args.vocab)
+    reference, _ = time_counter(bpe, texts, 1)
+    total = sum(reference)
+
+    counters = [
+        ("heuristic", HeuristicTokenCounter()),
+        (bpe.name, bpe),
+        (f"cached {bpe.name} (warm)", CachedTokenCounter(bpe)),
+    ]
+    print(f"{'backend':<36}{'tokens':>10}{'error':>10}{'MAE/msg':>10}{'MB/s':>10}")
+    for name, counter in counters:
+        if isinstance(counter, CachedTokenCounter):
+            counter.count_batch(texts)
+        counts, elapsed = time_counter(counter, texts, args.rounds)
+        error = (sum(counts) - total) / total * 100 if total else 0.0
+        mae = sum(abs(a - b) for a, b in zip(counts, reference)) / max(len(texts), 1)
+        throughput = size / elapsed / 1e6 if elapsed else float("inf")
+        print(
+            f"{name:<36}{sum(counts):>10}{error:>9.1f}%{mae:>10.1f}{throughput:>10.1f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
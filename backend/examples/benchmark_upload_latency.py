@@ -0,0 +1,102 @@
+"""上传延迟测试：并发上传是否拖慢其他会话的流式输出
+
+模拟若干个 SSE 流（每 10ms 产出一个事件），同时并发上传大文件，统计流事件的
+调度延迟（实际间隔 - 期望间隔）。分别在两种模式下运行：
+- inline: 在事件循环中直接解码并写盘（旧实现）
+- offload: 通过 upload_file_handler（文件 I/O 线程池）
+
+用法:
+    python examples/benchmark_upload_latency.py [--uploads 4] [--size-mb 9] [--streams 8]
+"""
+
+import argparse
+import asyncio
+import base64
+import os
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.append(os.path.join(os.path.dirname(__file__), ".."))
+
+import api.file_api as file_api
+import util.file_util as file_util
+from util.blob_store import BlobStore
+from util.upload_index import UploadIndex
+
+TICK = 0.01
+
+
+def use_uploads_dir(path: str) -> None:
+    """Point the file subsystem at a scratch uploads directory."""
+    file_util.UPLOADS_DIR = path
+    file_util.PARTIAL_DIR = os.path.join(path, ".partial")
+    file_util.blob_store = BlobStore(path)
+    file_util.upload_index = file_api.upload_index = UploadIndex(
+        os.path.join(path, ".index.db")
+    )
+
+
+async def stream(stop: asyncio.Event, lags: list[float]) -> None:
+    """Emit an event every TICK seconds and record scheduling lag."""
+    expected = time.perf_counter() + TICK
+    while not stop.is_set():
+        await asyncio.sleep(max(expected - time.perf_counter(), 0))
+        lags.append(max(time.perf_counter() - expected, 0) * 1000)
+        expected += TICK
+
+
+async def upload_inline(payload: str, i: int) -> None:
+    file_util.save_file_from_base64(payload, f"inline_{i}.bin")
+
+
+async def upload_offload(payload: str, i: int) -> None:
+    result = await file_api.upload_file_handler(
+        file_api.UploadRequest(filename=f"offload_{i}.bin", file_data=payload)
+    )
+    assert "error" not in result, result
+
+
+async def run(mode: str, uploads: int, size: int, streams: int) -> list[float]:
+    # Distinct content per upload so deduplication does not skip the writes
+    payloads = [
+        base64.b64encode(os.urandom(size)).decode("ascii") for _ in range(uploads)
+    ]
+    upload = upload_inline if mode == "inline" else upload_offload
+    lags: list[float] = []
+    stop = asyncio.Event()
+    stream_tasks = [asyncio.create_task(stream(stop, lags)) for _ in range(streams)]
+    await asyncio.sleep(0.1)
+    started = time.perf_counter()
+    await asyncio.gather(*(upload(p, i) for i, p in enumerate(payloads)))
+    elapsed = time.perf_counter() - started
+    await asyncio.sleep(0.1)
+    stop.set()
+    await asyncio.gather(*stream_tasks)
+    print(f"{mode:<10}上传耗时 {elapsed * 1000:8.1f} ms", end="  ")
+    return lags
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--uploads", type=int, default=4)
+    parser.add_argument("--size-mb", type=float, default=9)
+    parser.add_argument("--streams", type=int, default=8)
+    args = parser.parse_args()
+
+    with tempfile.TemporaryDirectory() as uploads_dir:
+        use_uploads_dir(uploads_dir)
+        size = int(args.size_mb * 1024 * 1024)
+        for mode in ("inline", "offload"):
+            lags = await run(mode, args.uploads, size, args.streams)
+            lags.sort()
+            p99 = lags[int(len(lags) * 0.99) - 1] if lags else 0.0
+            print(
+                f"流延迟 p50 {statistics.median(lags):6.1f} ms, "
+                f"p99 {p99:6.1f} ms, max {lags[-1]:6.1f} ms"
+            )
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
@@ -0,0 +1,88 @@
+"""上下文压缩评估：摘要 token 预算 vs 信息保留质量
+
+将对话记录逐条写入启用抽取式压缩的 BoundedMemory，对被移出窗口的消息生成的
+滚动摘要，使用 skills/context-engineering/scripts/compression_evaluator.py 的探针
+进行打分，用于调节 summary_max_tokens。
+
+用法:
+    python examples/evaluate_compaction.py <transcript.json> [--budgets 500 1000 2000]
+
+transcript.json 为 BoundedMemory.state_dict() 导出的 JSON（含 "content" 列表）
+或消息字典列表。
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(__file__), "..")
+sys.path.append(BACKEND_DIR)
+sys.path.append(
+    os.path.join(BACKEND_DIR, "skills/context-engineering/scripts")
+)
+
+from agentscope.message import Msg
+
+from agent.bounded_memory import BoundedMemory
+from agent.memory_compaction import ExtractiveSummarizer
+from compression_evaluator import evaluate_compression
+
+
+async def run_budget(messages: list[dict], max_tokens: int, budget: int) -> dict:
+    """Replay a transcript and score the resulting rolling summary."""
+    memory = BoundedMemory(
+        max_tokens=max_tokens,
+        reserve_ratio=1.0,
+        summarizer=ExtractiveSummarizer(),
+        summary_max_tokens=budget,
+    )
+    for data in messages:
+        data = dict(data)
+        data.pop("type", None)
+        await memory.add(Msg.from_dict(data))
+
+    kept_ids = {msg.id for msg in memory.content}
+    evicted = [
+        {"role": data.get("role"), "content": str(data.get("content", ""))}
+        for data in messages
+        if data.get("id") not in kept_ids
+    ]
+    summary = memory.state_dict()["summary"] or ""
+    report = evaluate_compression(evicted, summary)
+    return {
+        "budget": budget,
+        "evicted": len(evicted),
+        "summary_tokens": memory.token_counter.count(summary),
+        "compression_ratio": report.compression_ratio,
+        "quality_score": report.quality_score,
+        "recommendations": report.recommendations,
+    }
+
+
+async def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("transcript", help="state dict JSON or message list")
+    parser.add_argument("--max-tokens", type=int, default=20000)
+    parser.add_argument("--budgets", type=int, nargs="+", default=[500, 1000, 2000])
+    args = parser.parse_args()
+
+    with open(args.transcript, "r", encoding="utf-8") as f:
+        data = json.load(f)
+    messages = data.get("content", []) if isinstance(data, dict) else data
+
+    print(f"{'budget':>8}{'evicted':>10}{'tokens':>10}{'ratio':>10}{'quality':>10}")
+    for budget in args.budgets:
+        result = await run_budget(messages, args.max_tokens, budget)
+        print(
+            f"{result['budget']:>8}{result['evicted']:>10}"
+            f"{result['summary_tokens']:>10}{result['compression_ratio']:>10.3f}"
+            f"{result['quality_score']:>10.3f}"
+        )
+        for recommendation in result["recommendations"]:
+            print(f"{'':>8}- {recommendation}")
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
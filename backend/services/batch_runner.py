@@ -0,0 +1,155 @@
+"""Bounded-concurrency batch execution for spreadsheet-driven collection.
+
+``BatchRunner`` calls an async worker once per item with at most
+``concurrency`` calls in flight. Each attempt has a timeout, and failed
+attempts are retried with exponential backoff and jitter. Results are
+returned in input order regardless of completion order; ``on_result`` sees
+each result as soon as it is final.
+"""
+
+import asyncio
+import inspect
+import logging
+import random
+from typing import Any, Awaitable, Callable, Iterable, Optional
+
+_MAX_BACKOFF = 60.0
+
+
+class BatchRunner:
+    """Run a worker over many items with bounded concurrency and retries."""
+
+    def __init__(
+        self,
+        concurrency: int = 5,
+        timeout: Optional[float] = None,
+        retry_times: int = 0,
+        backoff: float = 1.0,
+    ):
+        """Initialize batch runner.
+
+        Args:
+            concurrency: Maximum worker calls in flight
+            timeout: Seconds per attempt (None: no limit)
+            retry_times: Retries after a failed attempt
+            backoff: Base delay in seconds before the first retry; doubles
+                with every further retry (capped at 60s)
+        """
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.retry_times = max(0, retry_times)
+        self.backoff = backoff
+
+    @classmethod
+    def from_config(cls, collection: dict, **overrides) -> "BatchRunner":
+        """Create a runner from the ``collection`` section of config.yaml.
+
+        Args:
+            collection: ``collection`` section
+            **overrides: Constructor arguments replacing the configured ones
+        """
+        kwargs = {
+            "concurrency": int(collection.get("concurrency", 5)),
+            # 0 means no limit
+            "timeout": collection.get("timeout") or None,
+            "retry_times": int(collection.get("retry_times", 0)),
+        }
+        kwargs.update(overrides)
+        return cls(**kwargs)
+
+    def max_duration(self) -> Optional[float]:
+        """Longest possible ``run_item`` call in seconds (None: unbounded)."""
+        if self.timeout is None:
+            return None
+        backoff = sum(
+            min(self.backoff * 2**attempt, _MAX_BACKOFF)
+            for attempt in range(self.retry_times)
+        )
+        return self.timeout * (self.retry_times + 1) + backoff
+
+    def _retry_delay(self, attempt: int) -> float:
+        delay = min(self.backoff * 2**attempt, _MAX_BACKOFF)
+        # Jitter spreads out retries of rows that failed together
+        return delay / 2 + random.uniform(0, delay / 2)
+
+    async def run_item(
+        self, index: Any, item: Any, worker: Callable[[Any], Awaitable[Any]]
+    ) -> dict:
+        """Run the worker on one item with timeout and retries.
+
+        Args:
+            index: Identifies the item in the result and in log messages
+            item: Work item
+            worker: Async callable processing one item
+
+        Returns:
+            dict with keys: index, status ("completed" or "failed"), result,
+            error, attempts
+        """
+        error = None
+        for attempt in range(self.retry_times + 1):
+            try:
+                async with asyncio.timeout(self.timeout):
+                    result = await worker(item)
+                return {
+                    "index": index,
+                    "status": "completed",
+                    "result": result,
+                    "error": None,
+                    "attempts": attempt + 1,
+                }
+            except TimeoutError:
+                error = f"Timeout after {self.timeout}s"
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            if attempt < self.retry_times:
+                delay = self._retry_delay(attempt)
+                logging.warning(
+                    f"任务执行失败 - Item: {index}, Attempt: {attempt + 1}, "
+                    f"Error: {error}, {delay:.1f}s 后重试"
+                )
+                await asyncio.sleep(delay)
+        logging.error(f"任务最终失败 - Item: {index}, Error: {error}")
+        return {
+            "index": index,
+            "status": "failed",
+            "result": None,
+            "error": error,
+            "attempts": self.retry_times + 1,
+        }
+
+    async def run(
+        self,
+        items: Iterable[Any],
+        worker: Callable[[Any], Awaitable[Any]],
+        on_result: Optional[Callable[[dict], Any]] = None,
+    ) -> list[dict]:
+        """Run the worker over all items.
+
+        Args:
+            items: Work items, in order
+            worker: Async callable processing one item
+            on_result: Called (or awaited, if it returns an awaitable) with
+                each item's result dict as soon as it is final
+
+        Returns:
+            One result dict per item (see ``run_item``), in input order
+        """
+        items = list(items)
+        results: list[Optional[dict]] = [None] * len(items)
+        pending = iter(enumerate(items))
+
+        async def _drain() -> None:
+            # Workers share one iterator, so items start in input order
+            for index, item in pending:
+                result = await self.run_item(index, item, worker)
+                results[index] = result
+                if on_result is not None:
+                    ret = on_result(result)
+                    if inspect.isawaitable(ret):
+                        await ret
+
+        await asyncio.gather(
+            *(_drain() for _ in range(min(self.concurrency, len(items))))
+        )
+        return results
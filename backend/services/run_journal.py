@@ -0,0 +1,289 @@
+"""Checkpoint journal of spreadsheet collection runs.
+
+A run covers one sheet of a task file. Every row's status (pending, running,
+completed, failed), attempts, input hash, error and result location is
+written to a local SQLite database as soon as it changes. A restarted run of
+the same sheet resumes the unfinished run: completed rows whose input is
+unchanged are skipped and only the remaining rows are executed again.
+
+The database is in WAL mode, so progress can be read from other connections
+(or processes) while a run executes.
+"""
+
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id TEXT PRIMARY KEY,
+    file_path TEXT NOT NULL,
+    sheet_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    total INTEGER NOT NULL,
+    created_at REAL NOT NULL,
+    updated_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_source ON runs (file_path, sheet_name, created_at);
+CREATE TABLE IF NOT EXISTS run_rows (
+    run_id TEXT NOT NULL,
+    row_index INTEGER NOT NULL,
+    input_hash TEXT NOT NULL,
+    status TEXT NOT NULL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    result_path TEXT,
+    error TEXT,
+    updated_at REAL NOT NULL,
+    PRIMARY KEY (run_id, row_index)
+);
+CREATE INDEX IF NOT EXISTS idx_run_rows_status ON run_rows (run_id, status);
+"""
+
+_RUN_COLUMNS = (
+    "run_id",
+    "file_path",
+    "sheet_name",
+    "status",
+    "total",
+    "created_at",
+    "updated_at",
+)
+_ROW_COLUMNS = (
+    "run_id",
+    "row_index",
+    "input_hash",
+    "status",
+    "attempts",
+    "result_path",
+    "error",
+    "updated_at",
+)
+
+
+def task_hash(task: dict) -> str:
+    """Stable hash of a task row's content."""
+    payload = json.dumps(task, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class RunJournal:
+    """SQLite journal of collection runs and their rows.
+
+    Methods are synchronous and thread-safe; the connection is shared behind a
+    lock. Call them through ``asyncio.to_thread`` from async code.
+    """
+
+    def __init__(self, path: str):
+        """Initialize run journal.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def begin(
+        self,
+        file_path: str,
+        sheet_name,
+        input_hashes: list[str],
+        resume: bool = True,
+    ) -> dict:
+        """Start a run of a sheet, or resume its unfinished run.
+
+        Rows of a resumed run whose input hash changed are reset to pending;
+        completed rows with unchanged input are kept.
+
+        Args:
+            file_path: Task spreadsheet
+            sheet_name: Sheet index or name
+            input_hashes: ``task_hash`` of every row, in sheet order
+            resume: Resume the latest unfinished run of this sheet if any
+
+        Returns:
+            dict with keys: run_id, resumed, completed ({row_index:
+            result_path} of rows that need not run again)
+        """
+        file_path = os.path.abspath(file_path)
+        sheet = str(sheet_name)
+        now = time.time()
+        with self._lock:
+            conn = self._connection()
+            row = None
+            if resume:
+                row = conn.execute(
+                    "SELECT run_id FROM runs WHERE file_path = ? AND sheet_name = ? "
+                    "AND status != 'completed' ORDER BY created_at DESC LIMIT 1",
+                    (file_path, sheet),
+                ).fetchone()
+            with conn:
+                if row is None:
+                    run_id = str(uuid.uuid4())
+                    conn.execute(
+                        f"INSERT INTO runs ({', '.join(_RUN_COLUMNS)}) "
+                        "VALUES (?, ?, ?, 'running', ?, ?, ?)",
+                        (run_id, file_path, sheet, len(input_hashes), now, now),
+                    )
+                    existing = {}
+                else:
+                    run_id = row[0]
+                    conn.execute(
+                        "UPDATE runs SET status = 'running', total = ?, "
+                        "updated_at = ? WHERE run_id = ?",
+                        (len(input_hashes), now, run_id),
+                    )
+                    conn.execute(
+                        "DELETE FROM run_rows WHERE run_id = ? AND row_index >= ?",
+                        (run_id, len(input_hashes)),
+                    )
+                    existing = {
+                        index: (input_hash, status, result_path)
+                        for index, input_hash, status, result_path in conn.execute(
+                            "SELECT row_index, input_hash, status, result_path "
+                            "FROM run_rows WHERE run_id = ?",
+                            (run_id,),
+                        )
+                    }
+
+                completed = {}
+                reset = []
+                for index, input_hash in enumerate(input_hashes):
+                    previous = existing.get(index)
+                    if previous is None or previous[0] != input_hash:
+                        reset.append((run_id, index, input_hash, now))
+                    elif previous[1] == "completed":
+                        completed[index] = previous[2]
+                conn.executemany(
+                    "INSERT OR REPLACE INTO run_rows "
+                    "(run_id, row_index, input_hash, status, updated_at) "
+                    "VALUES (?, ?, ?, 'pending', ?)",
+                    reset,
+                )
+        return {"run_id": run_id, "resumed": row is not None, "completed": completed}
+
+    def _update_row(self, run_id: str, row_index: int, **fields) -> None:
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    f"UPDATE run_rows SET {assignments} "
+                    "WHERE run_id = ? AND row_index = ?",
+                    (*fields.values(), run_id, row_index),
+                )
+
+    def mark_running(self, run_id: str, row_index: int) -> None:
+        """Record that a row started executing."""
+        self._update_row(run_id, row_index, status="running")
+
+    def record(
+        self,
+        run_id: str,
+        row_index: int,
+        status: str,
+        attempts: int,
+        result_path: Optional[str] = None,
+        error: Optional[str] = None,
+    ) -> None:
+        """Record the final outcome of a row."""
+        self._update_row(
+            run_id,
+            row_index,
+            status=status,
+            attempts=attempts,
+            result_path=result_path,
+            error=error,
+        )
+
+    def finish(self, run_id: str) -> dict:
+        """Close a run: completed if every row completed, otherwise failed.
+
+        Returns:
+            Run summary (see ``summary``)
+        """
+        with self._lock:
+            conn = self._connection()
+            (unfinished,) = conn.execute(
+                "SELECT COUNT(*) FROM run_rows WHERE run_id = ? "
+                "AND status != 'completed'",
+                (run_id,),
+            ).fetchone()
+            with conn:
+                conn.execute(
+                    "UPDATE runs SET status = ?, updated_at = ? WHERE run_id = ?",
+                    ("failed" if unfinished else "completed", time.time(), run_id),
+                )
+        return self.summary(run_id)
+
+    def summary(self, run_id: str) -> Optional[dict]:
+        """Run record with per-status row counts, or None if unknown."""
+        with self._lock:
+            conn = self._connection()
+            row = conn.execute(
+                f"SELECT {', '.join(_RUN_COLUMNS)} FROM runs WHERE run_id = ?",
+                (run_id,),
+            ).fetchone()
+            if row is None:
+                return None
+            counts = dict(
+                conn.execute(
+                    "SELECT status, COUNT(*) FROM run_rows WHERE run_id = ? "
+                    "GROUP BY status",
+                    (run_id,),
+                ).fetchall()
+            )
+        return {**dict(zip(_RUN_COLUMNS, row)), "counts": counts}
+
+    def list_runs(self, limit: int = 20, offset: int = 0) -> list[dict]:
+        """Runs, newest first, with per-status row counts."""
+        with self._lock:
+            run_ids = [
+                run_id
+                for (run_id,) in self._connection().execute(
+                    "SELECT run_id FROM runs ORDER BY created_at DESC "
+                    "LIMIT ? OFFSET ?",
+                    (limit, offset),
+                )
+            ]
+        return [self.summary(run_id) for run_id in run_ids]
+
+    def rows(
+        self,
+        run_id: str,
+        status: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> list[dict]:
+        """Rows of a run in sheet order, optionally filtered by status."""
+        sql = f"SELECT {', '.join(_ROW_COLUMNS)} FROM run_rows WHERE run_id = ?"
+        params: tuple = (run_id,)
+        if status is not None:
+            sql += " AND status = ?"
+            params += (status,)
+        sql += " ORDER BY row_index LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._connection().execute(sql, (*params, limit, offset)).fetchall()
+        return [dict(zip(_ROW_COLUMNS, row)) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,219 @@
+"""In-process periodic scheduler for collection jobs.
+
+Registered jobs re-run every ``interval`` seconds on one asyncio task:
+
+- each job's slots are offset by a stable fraction of its interval derived
+  from its name, so jobs sharing an interval are spread across it instead of
+  all firing at the top of the hour
+- every run is delayed by a random jitter of up to ``jitter * interval``
+- a job never overlaps itself; slots missed while it was still running are
+  skipped
+- at most ``max_concurrent_jobs`` jobs run at once; when more are due, they
+  start in ``sources.priority`` order of their source
+"""
+
+import asyncio
+import hashlib
+import logging
+import random
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+
+class _Job:
+    """One registered job and its schedule state."""
+
+    def __init__(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval: float,
+        source: Optional[str],
+        jitter: float,
+        anchor: float,
+    ):
+        self.name = name
+        self.func = func
+        self.interval = interval
+        self.source = source
+        self.jitter = jitter
+        self.anchor = anchor
+        self.next_run = anchor
+        self.running = False
+        self.runs = 0
+        self.failures = 0
+        self.last_started: Optional[float] = None
+        self.last_finished: Optional[float] = None
+        self.last_error: Optional[str] = None
+
+    def schedule_next(self, now: float) -> None:
+        """Move next_run to the first slot after ``now`` (plus jitter)."""
+        slots = (now - self.anchor) // self.interval + 1
+        slot = self.anchor + slots * self.interval
+        self.next_run = slot + random.uniform(0, self.jitter * self.interval)
+
+
+class CollectionScheduler:
+    """Run registered async jobs periodically."""
+
+    def __init__(
+        self,
+        priority: Sequence[str] = (),
+        max_concurrent_jobs: int = 1,
+        jitter: float = 0.1,
+    ):
+        """Initialize collection scheduler.
+
+        Args:
+            priority: Source names, highest priority first (sources.priority)
+            max_concurrent_jobs: Jobs running at the same time
+            jitter: Default random delay per run, as a fraction of the interval
+        """
+        self.priority = list(priority)
+        self.max_concurrent_jobs = max(1, max_concurrent_jobs)
+        self.jitter = jitter
+        self._jobs: dict[str, _Job] = {}
+        self._running: dict[str, asyncio.Task] = {}
+        self._wakeup = asyncio.Event()
+        self._task: Optional[asyncio.Task] = None
+
+    def register(
+        self,
+        name: str,
+        func: Callable[[], Awaitable[Any]],
+        interval: float,
+        source: Optional[str] = None,
+        jitter: Optional[float] = None,
+        run_now: bool = False,
+    ) -> None:
+        """Register (or replace) a periodic job.
+
+        Args:
+            name: Unique job name (also seeds its offset within the interval)
+            func: Async callable run on every slot
+            interval: Seconds between runs
+            source: Source the job collects from (ranked by ``priority``)
+            jitter: Random delay per run as a fraction of the interval
+                (default: the scheduler's jitter)
+            run_now: Run once right away instead of waiting for the first slot
+        """
+        if interval <= 0:
+            raise ValueError("interval must be positive")
+        digest = hashlib.sha1(name.encode("utf-8")).digest()
+        offset = int.from_bytes(digest[:4], "big") / 2**32 * interval
+        now = time.time()
+        anchor = now - (now % interval) + offset
+        job = _Job(
+            name,
+            func,
+            interval,
+            source,
+            self.jitter if jitter is None else jitter,
+            anchor,
+        )
+        if run_now:
+            job.next_run = now
+        else:
+            job.schedule_next(now)
+        self._jobs[name] = job
+        self._wakeup.set()
+
+    def unregister(self, name: str) -> None:
+        """Remove a job; a run in progress is allowed to finish."""
+        self._jobs.pop(name, None)
+        self._wakeup.set()
+
+    def _rank(self, job: _Job) -> int:
+        try:
+            return self.priority.index(job.source)
+        except ValueError:
+            return len(self.priority)
+
+    async def _execute(self, job: _Job) -> None:
+        job.last_started = time.time()
+        logging.info(f"定时采集任务开始 - Job: {job.name}, Source: {job.source}")
+        try:
+            await job.func()
+            job.last_error = None
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            job.failures += 1
+            job.last_error = f"{type(e).__name__}: {e}"
+            logging.error(
+                f"定时采集任务失败 - Job: {job.name}, Error: {e}", exc_info=True
+            )
+        finally:
+            job.runs += 1
+            job.running = False
+            job.last_finished = time.time()
+            job.schedule_next(job.last_finished)
+            self._running.pop(job.name, None)
+            self._wakeup.set()
+        logging.info(
+            f"定时采集任务结束 - Job: {job.name}, "
+            f"耗时: {job.last_finished - job.last_started:.1f}s"
+        )
+
+    async def _run(self) -> None:
+        while True:
+            self._wakeup.clear()
+            now = time.time()
+            due = sorted(
+                (
+                    job
+                    for job in self._jobs.values()
+                    if not job.running and job.next_run <= now
+                ),
+                key=lambda job: (self._rank(job), job.next_run),
+            )
+            for job in due:
+                if len(self._running) >= self.max_concurrent_jobs:
+                    break
+                job.running = True
+                self._running[job.name] = asyncio.create_task(
+                    self._execute(job), name=f"collection-{job.name}"
+                )
+
+            waiting = [job.next_run for job in self._jobs.values() if not job.running]
+            timeout = max(min(waiting) - now, 0) if waiting else None
+            if due and len(self._running) >= self.max_concurrent_jobs:
+                # Due jobs wait for a running job to finish
+                timeout = None
+            try:
+                await asyncio.wait_for(self._wakeup.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def start(self) -> None:
+        """Start the scheduler loop."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run(), name="collection-scheduler")
+
+    async def stop(self) -> None:
+        """Stop the scheduler and cancel running jobs."""
+        tasks = list(self._running.values())
+        if self._task is not None:
+            tasks.append(self._task)
+            self._task = None
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def status(self) -> list[dict]:
+        """Schedule state of every job, in priority order."""
+        return [
+            {
+                "name": job.name,
+                "source": job.source,
+                "interval": job.interval,
+                "running": job.running,
+                "next_run": job.next_run,
+                "runs": job.runs,
+                "failures": job.failures,
+                "last_started": job.last_started,
+                "last_finished": job.last_finished,
+                "last_error": job.last_error,
+            }
+            for job in sorted(self._jobs.values(), key=self._rank)
+        ]
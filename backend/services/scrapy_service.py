@@ -1,13 +1,352 @@
-from agent.scrapy_agent import get_scrapy_agent
-from tools.excel_reader import read_excel
+"""Spreadsheet-driven batch collection.
+
+Each row of a task sheet (类型, 职务原文名, 职务中文名, 数据源, ...) becomes one
+scrapy_agent run. Rows run concurrently through ``BatchRunner`` with the
+concurrency of the ``collection`` section in config.yaml.
+
+Runs are checkpointed in a ``RunJournal``: each finished row's result is
+written to ``storage.path/<run_id>/<row>.json`` and its status recorded, so a
+restarted run of the same sheet only executes the rows that did not complete.
+
+Rows with the same canonical task key (``task_key``) run once and share the
+result; results stay in a ``TaskMemo`` for ``collection.memo_ttl`` seconds, and
+tasks with a fresh memo entry are answered without running the agent.
+
+Each task is collected through a ``SourceFallbackExecutor``: the sources of
+``sources.priority`` are tried in order (optionally hedged) until one gives a
+complete answer, each attempt bounded by ``collection.timeout`` and retried
+``collection.retry_times`` times when it fails or times out.
+
+``create_collection_scheduler`` re-runs the task sheets listed in the
+``schedule`` section of config.yaml every ``collection.interval`` seconds.
+"""
+
+import asyncio
+import functools
+import json
+import logging
+import os
+import tempfile
+import time
+from typing import Any, Optional
+
+import pandas as pd
+
+from agent.scrapy_agent import scrapy_agent_fucntion
+from config import COLLECTION_DB_PATH, load_collection_config
+from services.batch_runner import BatchRunner
+from services.run_journal import RunJournal, task_hash
+from services.scheduler import CollectionScheduler
+from services.source_fallback import (
+    SOURCE_COLUMNS,
+    SourceFallbackExecutor,
+    source_hint,
+)
+from services.task_memo import DEFAULT_KEY_FIELDS, TaskMemo, task_key
+from tools.excel_cache import read_excel_cached
+
+BASE_DIR = os.path.join(os.path.dirname(__file__), "..")
+
+
+def _is_empty(value) -> bool:
+    if isinstance(value, str):
+        return not value.strip()
+    return value is None or bool(pd.isna(value))
+
+
+def row_to_task(row: dict) -> dict:
+    """Drop empty cells of a sheet row."""
+    return {str(key): value for key, value in row.items() if not _is_empty(value)}
+
+
+def build_prompt(task: dict, source: Optional[dict] = None) -> str:
+    """Collection prompt for one task row.
+
+    Args:
+        task: Task row
+        source: Source to collect from (see ``SourceFallbackExecutor``); its
+            instruction replaces the row's source URL cells
+    """
+    if source is not None:
+        task = {
+            key: value
+            for key, value in task.items()
+            if key not in SOURCE_COLUMNS.values()
+        }
+    lines = "\n".join(f"{key}: {value}" for key, value in task.items())
+    prompt = f"请根据以下任务信息采集数据，并整理采集结果：\n{lines}"
+    if source is not None:
+        prompt += f"\n{source_hint(source)}"
+    return prompt
 
 
 class ScrapyService:
+    """Run the scrapy agent over every row of a task spreadsheet."""
+
+    def __init__(
+        self,
+        config: Optional[dict] = None,
+        journal: Optional[RunJournal] = None,
+        memo: Optional[TaskMemo] = None,
+    ):
+        """Initialize scrapy service.
+
+        Args:
+            config: Parsed config.yaml (default: loaded from
+                COLLECTION_CONFIG_PATH)
+            journal: Run journal (default: one at COLLECTION_DB_PATH)
+            memo: Result memo (default: one at COLLECTION_DB_PATH)
+        """
+        self.config = config if config is not None else load_collection_config()
+        collection = self.config.get("collection") or {}
+        # Timeouts and retries apply per source attempt; each row is capped at
+        # the fallback chain's worst case and never retried as a whole, which
+        # would repeat every source after SourceExhaustedError
+        self.fallback = SourceFallbackExecutor.from_config(
+            self.config.get("sources") or {}, collection
+        )
+        self.runner = BatchRunner.from_config(
+            collection, timeout=self.fallback.max_duration(), retry_times=0
+        )
+        # 0 disables reuse of earlier results (duplicates are still merged)
+        self.memo_ttl = float(collection.get("memo_ttl", 0))
+        self.key_fields = tuple(collection.get("dedup_fields") or DEFAULT_KEY_FIELDS)
+        storage = self.config.get("storage") or {}
+        self.output_dir = os.path.join(BASE_DIR, storage.get("path", "data/output"))
+        self.encoding = storage.get("encoding", "utf-8")
+        self.journal = journal or RunJournal(COLLECTION_DB_PATH)
+        self.memo = memo or TaskMemo(COLLECTION_DB_PATH)
+
+    async def collect_from(self, task: dict, source: dict) -> str:
+        """Collect one task row from one source with the scrapy agent.
+
+        Returns:
+            The agent's text answer
+        """
+        response = await scrapy_agent_fucntion(build_prompt(task, source))
+        return "\n".join(
+            block.get("text", "")
+            for block in response.content
+            if block.get("type") == "text"
+        )
+
+    async def run_task(self, task: dict) -> dict:
+        """Collect one task row, falling back through the sources by priority.
+
+        Returns:
+            dict with keys: text (the agent's answer), source, url and
+            attempts (see ``SourceFallbackExecutor.run``)
+
+        Raises:
+            SourceExhaustedError: If no source gave a complete answer
+        """
+        outcome = await self.fallback.run(task, self.collect_from)
+        logging.info(
+            f"任务采集完成 - Source: {outcome['source']}, "
+            f"Attempts: {len(outcome['attempts'])}"
+        )
+        return {
+            "text": outcome["result"],
+            "source": outcome["source"],
+            "url": outcome["url"],
+            "attempts": outcome["attempts"],
+        }
+
+    def _save_result(self, run_id: str, row_index: int, task: dict, result: Any) -> str:
+        path = os.path.join(self.output_dir, run_id, f"{row_index}.json")
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding=self.encoding) as f:
+                json.dump(
+                    {
+                        "row_index": row_index,
+                        "task": task,
+                        "result": result,
+                        "collected_at": time.time(),
+                    },
+                    f,
+                    ensure_ascii=False,
+                    default=str,
+                )
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return path
+
+    def _load_results(self, paths: dict[int, str]) -> dict[int, Any]:
+        results = {}
+        for row_index, path in paths.items():
+            try:
+                with open(path, encoding=self.encoding) as f:
+                    results[row_index] = json.load(f)["result"]
+            except (OSError, ValueError, KeyError):
+                results[row_index] = None
+        return results
+
+    async def _finish_row(
+        self, run_id: str, row_index: int, task: dict, outcome: dict, **extra
+    ) -> dict:
+        """Save a row's result and record its outcome in the journal."""
+        result_path = None
+        if outcome["status"] == "completed":
+            result_path = await asyncio.to_thread(
+                self._save_result, run_id, row_index, task, outcome["result"]
+            )
+        await asyncio.to_thread(
+            self.journal.record,
+            run_id,
+            row_index,
+            outcome["status"],
+            outcome["attempts"],
+            result_path,
+            outcome["error"],
+        )
+        return {**outcome, "index": row_index, "result_path": result_path, **extra}
+
+    async def start(self, file_path: str, sheet_name=0, resume: bool = True) -> dict:
+        """Collect all rows of a task spreadsheet.
+
+        Args:
+            file_path: Task spreadsheet (e.g. shuju.xlsx)
+            sheet_name: Sheet index (0-based) or sheet name
+            resume: Continue the unfinished run of this sheet, skipping rows
+                that already completed
+
+        Returns:
+            Run summary (see ``RunJournal.summary``) plus ``results``: one dict
+            per row in sheet order with index, status, result (see
+            ``run_task``), error,
+            attempts and result_path (``memoized`` rows reused an earlier
+            result, ``duplicate_of`` rows shared another row's run)
+        """
+        excel_data = await asyncio.to_thread(read_excel_cached, file_path, sheet_name)
+        tasks = [row_to_task(row) for row in excel_data.to_dict("records")]
+        run = await asyncio.to_thread(
+            self.journal.begin,
+            file_path,
+            sheet_name,
+            [task_hash(task) for task in tasks],
+            resume,
+        )
+        run_id = run["run_id"]
+        results: list[Optional[dict]] = [None] * len(tasks)
+
+        # Group the remaining rows by task key; the first row of a group runs
+        groups: dict[str, list[int]] = {}
+        for index in range(len(tasks)):
+            if index not in run["completed"]:
+                key = task_key(tasks[index], self.key_fields)
+                groups.setdefault(key, []).append(index)
+
+        memoized = {}
+        if self.memo_ttl > 0 and groups:
+            await asyncio.to_thread(self.memo.prune, self.memo_ttl)
+            memoized = await asyncio.to_thread(
+                self.memo.get_many, groups, self.memo_ttl
+            )
+        memoized_rows = 0
+        for key, result in memoized.items():
+            outcome = {
+                "status": "completed",
+                "result": result,
+                "error": None,
+                "attempts": 0,
+            }
+            for row_index in groups.pop(key):
+                results[row_index] = await self._finish_row(
+                    run_id, row_index, tasks[row_index], outcome, memoized=True
+                )
+                memoized_rows += 1
+
+        keys = list(groups)
+        logging.info(
+            f"开始批量采集 - RunID: {run_id}, File: {file_path}, Rows: {len(tasks)}, "
+            f"Skipped: {len(run['completed'])}, Memoized: {memoized_rows}, "
+            f"Unique: {len(keys)}, Concurrency: {self.runner.concurrency}"
+        )
+
+        async def _run_group(key: str) -> dict:
+            for row_index in groups[key]:
+                await asyncio.to_thread(self.journal.mark_running, run_id, row_index)
+            return await self.run_task(tasks[groups[key][0]])
+
+        async def _record(outcome: dict) -> None:
+            # The runner indexes outcomes by position in keys
+            key = keys[outcome["index"]]
+            leader = groups[key][0]
+            if outcome["status"] == "completed" and self.memo_ttl > 0:
+                await asyncio.to_thread(self.memo.put, key, outcome["result"])
+            for row_index in groups[key]:
+                extra = {} if row_index == leader else {"duplicate_of": leader}
+                results[row_index] = await self._finish_row(
+                    run_id, row_index, tasks[row_index], outcome, **extra
+                )
+
+        await self.runner.run(keys, _run_group, on_result=_record)
+
+        previous = await asyncio.to_thread(self._load_results, run["completed"])
+        for row_index, result in previous.items():
+            results[row_index] = {
+                "index": row_index,
+                "status": "completed",
+                "result": result,
+                "error": None,
+                "attempts": 0,
+                "result_path": run["completed"][row_index],
+            }
+
+        summary = await asyncio.to_thread(self.journal.finish, run_id)
+        logging.info(
+            f"批量采集结束 - RunID: {run_id}, Status: {summary['status']}, "
+            f"Counts: {summary['counts']}"
+        )
+        return {**summary, "results": results}
+
+
+def create_collection_scheduler(
+    config: Optional[dict] = None,
+    service: Optional[ScrapyService] = None,
+) -> Optional[CollectionScheduler]:
+    """Scheduler for the ``schedule.jobs`` of config.yaml.
+
+    Each job re-runs ``ScrapyService.start`` on its task sheet every
+    ``interval`` seconds (default ``collection.interval``). Every run starts
+    a fresh journal run (``resume=False``) so each interval re-collects all
+    rows; resuming would reuse the completed rows of a run that ended with
+    failed rows and stop refreshing them.
 
+    Args:
+        config: Parsed config.yaml (default: loaded from COLLECTION_CONFIG_PATH)
+        service: Service running the jobs (default: one built from config)
 
-    async def start(self, file_path):
-        async with  get_scrapy_agent() as agent:
-            excel_data = read_excel(file_path)
-            for index, row in excel_data.iterrows():
-                print(row["类型"], row["职务原文名"], row["职务中文名"], row["数据源"])
-                await agent.run(row.to_dict())
\ No newline at end of file
+    Returns:
+        Scheduler with all jobs registered (not started), or None if
+        ``schedule.enabled`` is false
+    """
+    config = config if config is not None else load_collection_config()
+    schedule = config.get("schedule") or {}
+    if not schedule.get("enabled"):
+        return None
+    service = service or ScrapyService(config)
+    interval = float((config.get("collection") or {}).get("interval", 3600))
+    scheduler = CollectionScheduler(
+        priority=(config.get("sources") or {}).get("priority") or (),
+        max_concurrent_jobs=int(schedule.get("max_concurrent_jobs", 1)),
+        jitter=float(schedule.get("jitter", 0.1)),
+    )
+    for job in schedule.get("jobs") or []:
+        file_path = os.path.join(BASE_DIR, job["file"])
+        scheduler.register(
+            job.get("name") or job["file"],
+            functools.partial(
+                service.start, file_path, job.get("sheet", 0), resume=False
+            ),
+            float(job.get("interval", interval)),
+            source=job.get("source"),
+            jitter=job.get("jitter"),
+        )
+    logging.info(f"定时采集已启用 - Jobs: {len(scheduler.status())}")
+    return scheduler
@@ -0,0 +1,265 @@
+"""Deterministic source fallback for collection tasks.
+
+Instead of letting the agent pick a source ad hoc, ``SourceFallbackExecutor``
+tries the sources of ``sources.priority`` one after another and stops at the
+first result that passes a completeness check. URL sources
+(``data_source_url``, ``backup_source_url``) come from the task row's 数据源 /
+数据源2 cells and are skipped for rows without them.
+
+Each source attempt runs through a ``BatchRunner``: it is bounded by the
+runner's timeout and an attempt that raised or timed out (MCP crash,
+connection error) is retried ``retry_times`` times with backoff. An answer
+that fails the completeness check is not retried; the next source is tried.
+
+In hedged mode (``hedge_after`` seconds), a source that has not answered
+within the threshold keeps running while the next source starts; the first
+complete result wins and the other attempts are cancelled.
+"""
+
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Optional, Sequence
+
+from services.batch_runner import BatchRunner
+
+# Task row column holding each URL source
+SOURCE_COLUMNS = {
+    "data_source_url": "数据源",
+    "backup_source_url": "数据源2",
+}
+
+# Prompt instruction per source; URL sources are formatted with the URL
+SOURCE_HINTS = {
+    "search_engine": "请仅通过搜索引擎检索公开信息完成采集。",
+    "news_site": "请仅从新闻网站获取信息完成采集。",
+    "social_media": "请仅从官方社交媒体账号获取信息完成采集。",
+    "data_source_url": "请直接访问数据源 {url} 完成采集。",
+    "backup_source_url": "请直接访问备用数据源 {url} 完成采集。",
+}
+
+# Phrases of an answer reporting that nothing was found
+FAILURE_MARKERS = (
+    "未找到",
+    "没有找到",
+    "无法获取",
+    "无法访问",
+    "无法找到",
+    "未能获取",
+    "not found",
+)
+
+
+class SourceExhaustedError(Exception):
+    """No source produced a complete result."""
+
+
+def is_complete(text: Any, min_chars: int = 20) -> bool:
+    """Default completeness check of a source's answer.
+
+    Args:
+        text: Agent answer
+        min_chars: Minimum length of the stripped answer
+
+    Returns:
+        True if the answer is long enough and does not report a failure
+    """
+    if not isinstance(text, str):
+        return False
+    text = text.strip()
+    lowered = text.lower()
+    return len(text) >= min_chars and not any(
+        marker in lowered for marker in FAILURE_MARKERS
+    )
+
+
+def source_hint(source: dict) -> str:
+    """Prompt instruction restricting the agent to one source."""
+    hint = SOURCE_HINTS.get(source["name"], "请使用数据源 {name} 完成采集。")
+    return hint.format(**source)
+
+
+class SourceFallbackExecutor:
+    """Try a task's sources in priority order until one answers completely."""
+
+    def __init__(
+        self,
+        priority: Sequence[str],
+        check: Optional[Callable[[Any], bool]] = None,
+        hedge_after: Optional[float] = None,
+        runner: Optional[BatchRunner] = None,
+    ):
+        """Initialize source fallback executor.
+
+        Args:
+            priority: Source names, highest priority first (sources.priority)
+            check: Completeness check of a result (default: ``is_complete``)
+            hedge_after: Seconds after which the next source starts while the
+                current one is still running (None: strictly sequential)
+            runner: Runs each source attempt with its timeout and retries
+                (default: no timeout, no retries)
+        """
+        self.priority = list(priority)
+        self.check = check or is_complete
+        self.hedge_after = hedge_after or None
+        self.runner = runner or BatchRunner()
+
+    @classmethod
+    def from_config(
+        cls, sources: dict, collection: Optional[dict] = None
+    ) -> "SourceFallbackExecutor":
+        """Create an executor from config.yaml.
+
+        Args:
+            sources: ``sources`` section
+            collection: ``collection`` section; its retry_times applies to
+                each source attempt, and its timeout when
+                ``sources.attempt_timeout`` is unset or 0
+        """
+        collection = collection or {}
+        min_chars = int(sources.get("min_result_chars", 20))
+        return cls(
+            priority=sources.get("priority") or list(SOURCE_HINTS),
+            check=lambda text: is_complete(text, min_chars),
+            hedge_after=sources.get("hedge_after"),
+            runner=BatchRunner.from_config(
+                collection,
+                concurrency=1,
+                timeout=sources.get("attempt_timeout")
+                or collection.get("timeout")
+                or None,
+            ),
+        )
+
+    def max_duration(self) -> Optional[float]:
+        """Longest possible ``run`` call in seconds (None: unbounded).
+
+        Hedged attempts overlap, so trying every source in turn is the
+        worst case.
+        """
+        attempt = self.runner.max_duration()
+        if attempt is None:
+            return None
+        return attempt * max(len(self.priority), 1)
+
+    def sources_for(self, task: dict) -> list[dict]:
+        """Sources applicable to a task, in priority order.
+
+        Returns:
+            One dict per source with keys: name, url (None for sources that
+            are not a URL)
+        """
+        sources = []
+        for name in self.priority:
+            url = None
+            if name in SOURCE_COLUMNS:
+                url = task.get(SOURCE_COLUMNS[name])
+                if not isinstance(url, str) or not url.strip():
+                    continue
+                url = url.strip()
+            sources.append({"name": name, "url": url})
+        return sources
+
+    async def _attempt(
+        self,
+        task: dict,
+        source: dict,
+        worker: Callable[[dict, dict], Awaitable[Any]],
+    ) -> dict:
+        started = time.monotonic()
+        # Timeouts and errors are retried; an incomplete answer is not
+        outcome = await self.runner.run_item(
+            source["name"], task, lambda row: worker(row, source)
+        )
+        status = outcome["status"]
+        if status == "completed" and not self.check(outcome["result"]):
+            status = "incomplete"
+        return {
+            "source": source["name"],
+            "url": source["url"],
+            "status": status,
+            "result": outcome["result"],
+            "error": outcome["error"],
+            "tries": outcome["attempts"],
+            "elapsed": round(time.monotonic() - started, 3),
+        }
+
+    async def run(
+        self, task: dict, worker: Callable[[dict, dict], Awaitable[Any]]
+    ) -> dict:
+        """Collect a task from the first source with a complete result.
+
+        Args:
+            task: Task row
+            worker: Async callable collecting ``task`` from one source (a
+                dict from ``sources_for``)
+
+        Returns:
+            dict with keys: source, url, result, attempts (one dict per
+            attempted source with source, url, status, error, tries, elapsed,
+            in start order; hedged attempts that lost are "cancelled")
+
+        Raises:
+            SourceExhaustedError: If no source produced a complete result
+        """
+        sources = iter(self.sources_for(task))
+        attempts: list[dict] = []
+        running: dict[asyncio.Task, int] = {}
+
+        def _start_next() -> bool:
+            source = next(sources, None)
+            if source is None:
+                return False
+            attempt = asyncio.create_task(self._attempt(task, source, worker))
+            running[attempt] = len(attempts)
+            attempts.append(
+                {"source": source["name"], "url": source["url"], "status": "running"}
+            )
+            return True
+
+        can_start = _start_next()
+        try:
+            while running:
+                done, _ = await asyncio.wait(
+                    running,
+                    timeout=self.hedge_after if can_start else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                if not done:
+                    # Hedge: the current sources are slow, start the next one
+                    logging.info(
+                        f"数据源响应缓慢，启动下一数据源 - After: {self.hedge_after}s"
+                    )
+                    can_start = _start_next()
+                    continue
+                # Prefer the higher-priority source if several finished together
+                for finished in sorted(done, key=running.get):
+                    outcome = finished.result()
+                    position = running.pop(finished)
+                    attempts[position] = {
+                        key: value for key, value in outcome.items() if key != "result"
+                    }
+                    if outcome["status"] == "completed":
+                        return {
+                            "source": outcome["source"],
+                            "url": outcome["url"],
+                            "result": outcome["result"],
+                            "attempts": attempts,
+                        }
+                    logging.warning(
+                        f"数据源未得到完整结果 - Source: {outcome['source']}, "
+                        f"Status: {outcome['status']}, Error: {outcome['error']}"
+                    )
+                    if can_start:
+                        can_start = _start_next()
+        finally:
+            for pending, position in running.items():
+                pending.cancel()
+                attempts[position]["status"] = "cancelled"
+            if running:
+                await asyncio.gather(*running, return_exceptions=True)
+
+        summary = ", ".join(f"{a['source']}={a['status']}" for a in attempts)
+        raise SourceExhaustedError(
+            f"所有数据源均未得到完整结果 ({summary or '无可用数据源'})"
+        )
@@ -0,0 +1,142 @@
+"""Canonical task keys and a persistent memo of collection results.
+
+Rows of a task sheet often repeat the same (类型, 职务原文名, 数据源)
+combination, especially after merged cells are filled. ``task_key`` maps a
+row to a canonical key so each distinct task runs once per batch, and
+``TaskMemo`` keeps each key's latest result in SQLite so a later batch can
+answer fresh tasks without any agent or browser work.
+"""
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+import unicodedata
+from typing import Any, Iterable, Optional
+from urllib.parse import urlsplit, urlunsplit
+
+# Columns identifying a collection task
+DEFAULT_KEY_FIELDS = ("类型", "职务原文名", "数据源")
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS task_memo (
+    task_key TEXT PRIMARY KEY,
+    result TEXT NOT NULL,
+    created_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS idx_task_memo_created_at ON task_memo (created_at);
+"""
+
+
+def _normalize(value: Any) -> str:
+    text = unicodedata.normalize("NFKC", str(value)).strip()
+    if re.match(r"^https?://", text, re.IGNORECASE):
+        parts = urlsplit(text)
+        path = parts.path.rstrip("/")
+        return urlunsplit(
+            (parts.scheme.lower(), parts.netloc.lower(), path, parts.query, "")
+        )
+    return re.sub(r"\s+", " ", text).casefold()
+
+
+def task_key(task: dict, fields: Iterable[str] = DEFAULT_KEY_FIELDS) -> str:
+    """Canonical key of a task row.
+
+    The key fields are Unicode-normalized, whitespace-collapsed and
+    case-folded; URLs keep their path case but drop the fragment and
+    trailing slash. Rows without any key field are keyed by all their
+    cells.
+
+    Args:
+        task: Task row (column -> value)
+        fields: Columns identifying the task
+
+    Returns:
+        Hex digest identifying the task
+    """
+    fields = [field for field in fields if field in task]
+    if not fields:
+        fields = sorted(task)
+    parts = [f"{field}={_normalize(task[field])}" for field in fields]
+    return hashlib.sha256("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class TaskMemo:
+    """SQLite store of the latest result per task key.
+
+    Methods are synchronous and thread-safe; the connection is shared behind a
+    lock. Call them through ``asyncio.to_thread`` from async code.
+    """
+
+    def __init__(self, path: str):
+        """Initialize task memo.
+
+        Args:
+            path: SQLite database file
+        """
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def get_many(self, keys: Iterable[str], max_age: float) -> dict[str, Any]:
+        """Results of the given keys stored less than ``max_age`` seconds ago."""
+        keys = list(keys)
+        found = {}
+        since = time.time() - max_age
+        with self._lock:
+            conn = self._connection()
+            # Stay below SQLite's host parameter limit
+            for start in range(0, len(keys), 500):
+                batch = keys[start : start + 500]
+                rows = conn.execute(
+                    "SELECT task_key, result FROM task_memo WHERE created_at >= ? "
+                    f"AND task_key IN ({', '.join('?' * len(batch))})",
+                    (since, *batch),
+                ).fetchall()
+                found.update((key, json.loads(result)) for key, result in rows)
+        return found
+
+    def put(self, key: str, result: Any) -> None:
+        """Store the latest result of a task."""
+        payload = json.dumps(result, ensure_ascii=False, default=str)
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO task_memo (task_key, result, created_at) "
+                    "VALUES (?, ?, ?)",
+                    (key, payload, time.time()),
+                )
+
+    def prune(self, max_age: float) -> int:
+        """Delete results older than ``max_age`` seconds.
+
+        Returns:
+            Number of entries deleted
+        """
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                return conn.execute(
+                    "DELETE FROM task_memo WHERE created_at < ?",
+                    (time.time() - max_age,),
+                ).rowcount
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
@@ -0,0 +1,122 @@
+"""
+Agent tool for reading uploaded attachments from the extraction cache.
+"""
+
+import logging
+from typing import Optional
+
+from agentscope.message import TextBlock
+from agentscope.tool import ToolResponse
+
+from util.blob_store import BlobStore
+from util.file_io import run_file_io
+from util.file_util import await_upload, extraction_cache
+from util.text_extract import chunk_text
+
+
+def _parse_numbers(spec: str, upper: int) -> list[int]:
+    """Parse "1-3,5" into sorted numbers within [0, upper).
+
+    Raises:
+        ValueError: If a part is not a number or a range of numbers
+    """
+    numbers = set()
+    for part in spec.replace("，", ",").split(","):
+        part = part.strip()
+        if not part:
+            continue
+        start, _, end = part.partition("-")
+        first = int(start)
+        last = int(end) if end.strip() else first
+        # Clamp first: a huge range like "1-999999999" must not be iterated
+        numbers.update(range(max(first, 0), min(last + 1, upper)))
+    return sorted(numbers)
+
+
+def _text_response(text: str) -> ToolResponse:
+    return ToolResponse(content=[TextBlock(type="text", text=text)])
+
+
+def _overview(doc: dict, file_id: str) -> str:
+    lines = [
+        f"文件: {doc['filename']} (file_id: {file_id})",
+        f"类型: {doc['kind']}, 页数: {len(doc['pages'])}, 分块数: {len(doc['chunks'])}",
+    ]
+    if doc["truncated"]:
+        lines.append("注意: 文件过大，仅提取了前面部分文本")
+    for table in doc["tables"]:
+        lines.append(
+            f"表格: 第 {table['page']} 页 ({table['name']}), "
+            f"{table['rows']} 行, 列: {', '.join(table['columns'])}"
+        )
+    if doc["chunks"]:
+        lines.append("\n--- 分块 0 ---")
+        lines.append(chunk_text(doc, 0))
+    return "\n".join(lines)
+
+
+async def read_attachment(
+    file_id: str,
+    pages: Optional[str] = None,
+    chunks: Optional[str] = None,
+    max_chars: int = 8000,
+) -> ToolResponse:
+    """
+    读取用户上传的附件（PDF、Excel、Word、文本等）的文本内容。
+    不指定 pages 和 chunks 时返回文件概要（页数、分块数、表格列名和第一个分块），
+    再按需读取指定的页或分块。附件文本在上传时已提取并缓存，重复读取无需重新解析。
+    Args:
+        file_id (str): 附件的 file_id，或附件的 file_url
+        pages (str, optional): 页码，从 1 开始，如 "1-3,5"（Excel 每个工作表为一页）
+        chunks (str, optional): 分块编号，从 0 开始，如 "0-2"
+        max_chars (int, optional): 返回文本的最大字符数. Defaults to 8000.
+    Returns:
+        ToolResponse: 附件文本内容
+    """
+    file_id = file_id.rstrip("/").rsplit("/", 1)[-1]
+    record = await await_upload(file_id)
+    if record is None:
+        return _text_response(f"未找到附件: {file_id}")
+
+    sha256 = record["sha256"]
+    if not sha256:
+        # Uploads indexed before content hashing was recorded
+        sha256 = await run_file_io(BlobStore.hash_file, record["file_path"])
+    try:
+        doc = await extraction_cache.extract(
+            sha256, record["file_path"], record["filename"]
+        )
+    except Exception as e:
+        logging.error(f"附件文本提取失败 - FileID: {file_id}, Error: {e}")
+        return _text_response(f"附件读取失败: {e}")
+
+    if doc["error"]:
+        return _text_response(f"附件解析失败: {doc['error']}")
+    if doc["kind"] == "unsupported":
+        return _text_response(f"不支持提取该类型文件的文本: {doc['filename']}")
+
+    try:
+        if pages:
+            sections = [
+                (f"第 {n} 页 ({doc['page_labels'][n - 1]})", doc["pages"][n - 1])
+                for n in _parse_numbers(pages, len(doc["pages"]) + 1)
+                if n >= 1
+            ]
+        elif chunks:
+            sections = [
+                (f"分块 {n} (第 {doc['chunks'][n]['page']} 页)", chunk_text(doc, n))
+                for n in _parse_numbers(chunks, len(doc["chunks"]))
+            ]
+        else:
+            return _text_response(_overview(doc, file_id)[:max_chars])
+    except ValueError:
+        return _text_response(f"页码或分块编号格式错误: {pages or chunks}")
+
+    if not sections:
+        return _text_response(
+            f"超出范围: 共 {len(doc['pages'])} 页, {len(doc['chunks'])} 个分块"
+        )
+    text = "\n\n".join(f"--- {title} ---\n{body}" for title, body in sections)
+    if len(text) > max_chars:
+        text = text[:max_chars] + "\n...（内容已截断，可按分块继续读取）"
+    return _text_response(text)
@@ -0,0 +1,139 @@
+"""
+Columnar cache for DataFrames parsed by read_excel.
+
+The merged-cell-filled DataFrame of a sheet is written to an Arrow IPC file
+under EXCEL_CACHE_DIR and reloaded through a memory map, so re-running a
+large task list skips XLSX parsing entirely. Entries are keyed by file path
+and sheet; the source's mtime and size are checked on every read and its
+SHA-256 when those changed (a touched but unchanged file stays cached).
+"""
+
+import hashlib
+import json
+import logging
+import os
+import tempfile
+from typing import Optional
+
+import pandas as pd
+
+from config import EXCEL_CACHE_DIR
+from tools.excel_reader import read_excel
+
+# Bump when read_excel output changes; older entries are re-parsed
+CACHE_VERSION = 1
+
+_META_KEY = b"excel_cache"
+
+
+def _cache_path(cache_dir: str, file_path: str, sheet_name) -> str:
+    key = f"{os.path.abspath(file_path)}\0{sheet_name!r}"
+    return os.path.join(cache_dir, hashlib.sha1(key.encode()).hexdigest() + ".arrow")
+
+
+def _hash_file(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def _read_meta(cache_path: str) -> Optional[dict]:
+    """Source metadata of a cache entry (schema only, no data is read)."""
+    import pyarrow as pa
+
+    try:
+        with pa.memory_map(cache_path, "r") as source:
+            metadata = pa.ipc.open_file(source).schema.metadata or {}
+        meta = json.loads(metadata[_META_KEY])
+    except (OSError, KeyError, ValueError, pa.ArrowException):
+        return None
+    return meta if meta.get("version") == CACHE_VERSION else None
+
+
+def _load_frame(cache_path: str) -> pd.DataFrame:
+    import pyarrow as pa
+
+    with pa.memory_map(cache_path, "r") as source:
+        table = pa.ipc.open_file(source).read_all()
+    return table.to_pandas()
+
+
+def _store_frame(cache_path: str, df: pd.DataFrame, meta: dict) -> None:
+    import pyarrow as pa
+
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    table = table.replace_schema_metadata(
+        {**(table.schema.metadata or {}), _META_KEY: json.dumps(meta)}
+    )
+    os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(cache_path), prefix=".tmp-")
+    try:
+        with os.fdopen(fd, "wb") as f, pa.ipc.new_file(f, table.schema) as writer:
+            writer.write_table(table)
+        os.replace(tmp_path, cache_path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+
+def read_excel_cached(
+    file_path: str, sheet_name=0, cache_dir: Optional[str] = None
+) -> pd.DataFrame:
+    """
+    Read an Excel file like read_excel, through the columnar cache.
+
+    Args:
+        file_path: Path to the Excel file to read.
+        sheet_name: Sheet index (0-based) or sheet name.
+        cache_dir: Cache directory (default: EXCEL_CACHE_DIR; empty disables
+            the cache).
+
+    Returns:
+        pd.DataFrame: Contents of the Excel file.
+
+    Raises:
+        FileNotFoundError: If the specified file does not exist.
+        ValueError: If the file cannot be parsed as Excel.
+    """
+    cache_dir = EXCEL_CACHE_DIR if cache_dir is None else cache_dir
+    if not cache_dir:
+        return read_excel(file_path, sheet_name)
+    try:
+        import pyarrow  # noqa: F401
+    except ImportError:
+        logging.warning("未安装 pyarrow，Excel 列式缓存不可用")
+        return read_excel(file_path, sheet_name)
+
+    stat = os.stat(file_path)
+    cache_path = _cache_path(cache_dir, file_path, sheet_name)
+    meta = _read_meta(cache_path)
+    if (
+        meta is not None
+        and meta["mtime_ns"] == stat.st_mtime_ns
+        and meta["size"] == stat.st_size
+    ):
+        return _load_frame(cache_path)
+
+    sha256 = _hash_file(file_path)
+    if meta is not None and meta["sha256"] == sha256:
+        df = _load_frame(cache_path)
+        logging.info(f"Excel 内容未变化，沿用缓存 - Path: {file_path}")
+    else:
+        df = read_excel(file_path, sheet_name)
+    new_meta = {
+        "version": CACHE_VERSION,
+        "path": os.path.abspath(file_path),
+        "sheet_name": sheet_name,
+        "mtime_ns": stat.st_mtime_ns,
+        "size": stat.st_size,
+        "sha256": sha256,
+    }
+    try:
+        _store_frame(cache_path, df, new_meta)
+    except Exception as e:
+        # e.g. columns mixing numbers and text cannot be stored as Arrow
+        logging.warning(f"Excel 列式缓存写入失败 - Path: {file_path}, Error: {e}")
+    return df
@@ -2,15 +2,106 @@
 Excel reader module for reading Excel files into pandas DataFrames.
 """
 
+import numpy as np
 import pandas as pd
 from openpyxl import load_workbook
+from openpyxl.utils.cell import range_boundaries
 
-def read_excel(file_path: str,sheet_name=0) -> pd.DataFrame:
+try:
+    # Private openpyxl API (tested with 3.1, see requirements.txt)
+    from openpyxl.worksheet._reader import WorkSheetParser
+except ImportError:
+    WorkSheetParser = None
+
+
+def _get_sheet(wb, sheet_name):
+    if isinstance(sheet_name, int):
+        return wb.worksheets[sheet_name]
+    return wb[sheet_name]
+
+
+def _read_sheet(wb, ws) -> tuple[dict[int, dict[int, object]], list[tuple]]:
+    """Read cell values and merged ranges of a read-only sheet in one pass.
+
+    ``ws.iter_rows`` discards the merged ranges stored after the cell data,
+    so the sheet XML is parsed here with the same parser openpyxl uses. This
+    relies on openpyxl internals; ``_read_sheet_public`` is the fallback.
+
+    Returns:
+        ({row: {column: value}}, [(min_col, min_row, max_col, max_row), ...])
+    """
+    rows = {}
+    with ws._get_source() as src:
+        parser = WorkSheetParser(
+            src,
+            ws._shared_strings,
+            data_only=True,
+            epoch=wb.epoch,
+            date_formats=wb._date_formats,
+            timedelta_formats=wb._timedelta_formats,
+        )
+        for row_number, cells in parser.parse():
+            values = {
+                cell["column"]: cell["value"]
+                for cell in cells
+                if cell["value"] is not None
+            }
+            if values:
+                rows[row_number] = values
+    merged = []
+    if parser.merged_cells is not None:
+        merged = [range_boundaries(cell.ref) for cell in parser.merged_cells.mergeCell]
+    return rows, merged
+
+
+def _read_sheet_public(file_path: str, sheet_name) -> tuple[dict, list[tuple]]:
+    """Same result as ``_read_sheet`` through the public openpyxl API.
+
+    Loads the full workbook (read-only worksheets have no merged ranges),
+    so it is slower and uses more memory.
+    """
+    wb = load_workbook(file_path, data_only=True)
+    try:
+        ws = _get_sheet(wb, sheet_name)
+        rows = {}
+        for row_number, cells in enumerate(
+            ws.iter_rows(values_only=True), start=ws.min_row
+        ):
+            values = {
+                column: value
+                for column, value in enumerate(cells, start=ws.min_column)
+                if value is not None
+            }
+            if values:
+                rows[row_number] = values
+        merged = [cell_range.bounds for cell_range in ws.merged_cells.ranges]
+    finally:
+        wb.close()
+    return rows, merged
+
+
+def _column_names(header: np.ndarray) -> list:
+    """Header row to column names the way pandas names them."""
+    names = []
+    seen: dict = {}
+    for i, value in enumerate(header):
+        name = f"Unnamed: {i}" if pd.isna(value) else value
+        count = seen.get(name, 0)
+        seen[name] = count + 1
+        names.append(f"{name}.{count}" if count else name)
+    return names
+
+
+def read_excel(file_path: str, sheet_name=0) -> pd.DataFrame:
     """
     Read an Excel file and return its contents as a pandas DataFrame.
 
+    The first row is the header. Merged ranges are filled with the value of
+    their top-left cell.
+
     Args:
         file_path: Path to the Excel file to read.
+        sheet_name: Sheet index (0-based) or sheet name.
 
     Returns:
         pd.DataFrame: Contents of the Excel file.
@@ -20,38 +111,34 @@ def read_excel(file_path: str,sheet_name=0) -> pd.DataFrame:
         ValueError: If the file cannot be parsed as Excel.
         Exception: Other errors from pandas/openpyxl.
     """
-    wb = load_workbook(file_path, data_only=True)  # data_only=True 读取单元格计算后的值
-    try:
-        if isinstance(sheet_name, int):
-            ws = wb.worksheets[sheet_name]
-        else:
-            ws = wb[sheet_name]
-        df = pd.read_excel(file_path, engine="openpyxl")
-        # 3. 遍历所有合并单元格，填充值到所有合并位置
-        for merged_range in ws.merged_cells.ranges:
-            # 获取合并单元格的范围（如A1:A3）
-            min_col, min_row, max_col, max_row = merged_range.bounds
-
-            # 转换为pandas的索引（注意：openpyxl是1-based，pandas是0-based）
-            start_row = min_row - 2  # Excel行号-2 = DataFrame行索引（表头占1行）
-            end_row = max_row - 2
-            start_col = min_col - 1
-            end_col = max_col - 1
-
-            # 跳过表头外的无效行（如合并范围超出数据行数）
-            if start_row >= len(df):
-                continue
-
-            # 获取合并单元格的基准值（左上角单元格的值）
-            base_value = df.iloc[start_row, start_col]
-
-            # 填充整个合并范围的所有单元格
-            for row in range(start_row, min(end_row + 1, len(df))):
-                for col in range(start_col, min(end_col + 1, len(df.columns))):
-                    df.iloc[row, col] = base_value
-
-        # 关闭工作簿，释放资源
-    finally:
-        wb.close()
-    return df
+    rows = None
+    if WorkSheetParser is not None:
+        # read_only 模式流式解析，单元格值与合并单元格范围一次读取
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            rows, merged = _read_sheet(wb, _get_sheet(wb, sheet_name))
+        except AttributeError:
+            # openpyxl internals changed; use the public API below
+            rows = None
+        finally:
+            wb.close()
+    if rows is None:
+        rows, merged = _read_sheet_public(file_path, sheet_name)
+
+    if not rows:
+        return pd.DataFrame()
+    first_row = min(rows)
+    width = max(max(values) for values in rows.values())
+    grid = np.full((max(rows) - first_row + 1, width), np.nan, dtype=object)
+    for row_number, values in rows.items():
+        for column, value in values.items():
+            grid[row_number - first_row, column - 1] = value
+
+    # 合并单元格：整块填充为左上角单元格的值
+    for min_col, min_row, max_col, max_row in merged:
+        top, left = min_row - first_row, min_col - 1
+        if 0 <= top < len(grid) and left < width:
+            grid[top : max_row - first_row + 1, left:max_col] = grid[top, left]
 
+    df = pd.DataFrame(grid[1:], columns=_column_names(grid[0]))
+    return df.infer_objects()
@@ -0,0 +1,184 @@
+"""Content-addressed blob store for uploaded files.
+
+File content is stored once under ``<root>/.blobs/ab/cd/<sha256>``. Each
+upload's ``<root>/<id[:2]>/<file_id>/<filename>`` is a hard link to its blob
+(a copy on filesystems without hard links), so the blob's link count is its
+reference count. Without hard links every alias is an independent copy: the
+blob's reference count stays 0, so it only serves as a staging copy that
+the orphan sweep removes, and content is not deduplicated on disk. Both layouts are sharded by hash prefix to keep directories
+small; uploads in the older flat ``<root>/<file_id>/`` layout still resolve.
+
+The file_id is derived from the content hash, the filename and the owner, so
+re-sending the same attachment resolves to the existing file_id without any
+disk write.
+"""
+
+import hashlib
+import logging
+import os
+import shutil
+import tempfile
+import threading
+import uuid
+from typing import Optional
+
+# Namespace for file_ids derived from (sha256, filename)
+FILE_ID_NAMESPACE = uuid.UUID("6f1c7e0a-3b5d-4c8e-9a2f-1d4b6e8c0a57")
+
+
+class BlobStore:
+    """Deduplicating store mapping file_id aliases to content blobs."""
+
+    def __init__(self, root: str):
+        """Initialize blob store.
+
+        Args:
+            root: Uploads directory holding the file_id directories
+        """
+        self.root = root
+        self.blobs_dir = os.path.join(root, ".blobs")
+        # Held by writers across put + link + index update, and by the
+        # retention sweep while deleting, so a blob cannot disappear between
+        # being stored and being linked
+        self.lock = threading.Lock()
+
+    @staticmethod
+    def file_id_for(sha256: str, filename: str, user_id: Optional[str] = None) -> str:
+        """Return the file_id of ``filename`` with the given content hash."""
+        key = f"{sha256}/{filename}"
+        if user_id:
+            key = f"{user_id}/{key}"
+        return str(uuid.uuid5(FILE_ID_NAMESPACE, key))
+
+    def blob_path(self, sha256: str) -> str:
+        return os.path.join(self.blobs_dir, sha256[:2], sha256[2:4], sha256)
+
+    def alias_dir(self, file_id: str) -> str:
+        return os.path.join(self.root, file_id[:2], file_id)
+
+    def alias_path(self, file_id: str, filename: str) -> str:
+        return os.path.join(self.alias_dir(file_id), filename)
+
+    def iter_blobs(self):
+        """Yield (sha256, path) of every stored blob."""
+        for dirpath, _, filenames in os.walk(self.blobs_dir):
+            for name in filenames:
+                if not name.startswith("."):
+                    yield name, os.path.join(dirpath, name)
+
+    def has_blob(self, sha256: str) -> bool:
+        return os.path.exists(self.blob_path(sha256))
+
+    def refcount(self, sha256: str) -> int:
+        """Number of file_id aliases linked to a blob (0 if unknown)."""
+        try:
+            return os.stat(self.blob_path(sha256)).st_nlink - 1
+        except OSError:
+            return 0
+
+    def put_bytes(self, data: bytes, sha256: Optional[str] = None) -> tuple[str, bool]:
+        """Store content, skipping the write if the blob already exists.
+
+        Returns:
+            (sha256, created)
+        """
+        sha256 = sha256 or hashlib.sha256(data).hexdigest()
+        if self.has_blob(sha256):
+            return sha256, False
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(blob_path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, blob_path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+        return sha256, True
+
+    def put_file(self, path: str, sha256: str) -> bool:
+        """Move a file with known hash into the store.
+
+        The source file is consumed (moved, or deleted if the blob exists).
+
+        Returns:
+            True if a new blob was created
+        """
+        if self.has_blob(sha256):
+            os.remove(path)
+            return False
+        blob_path = self.blob_path(sha256)
+        os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+        os.replace(path, blob_path)
+        return True
+
+    def link(
+        self,
+        sha256: str,
+        filename: str,
+        user_id: Optional[str] = None,
+        file_id: Optional[str] = None,
+    ) -> tuple[str, str, bool]:
+        """Create (or reuse) the file_id alias of a stored blob.
+
+        Args:
+            sha256: Content hash of a stored blob
+            filename: Sanitized filename of the alias
+            user_id: Owner of the alias
+            file_id: Alias to create (default: derived from the content hash)
+
+        Returns:
+            (file_id, alias path, created)
+        """
+        file_id = file_id or self.file_id_for(sha256, filename, user_id)
+        alias = self.alias_path(file_id, filename)
+        if os.path.exists(alias):
+            return file_id, alias, False
+
+        os.makedirs(os.path.dirname(alias), exist_ok=True)
+        try:
+            os.link(self.blob_path(sha256), alias)
+        except FileExistsError:
+            pass
+        except OSError as e:
+            # No hard link support (e.g. some network filesystems)
+            logging.warning(f"无法创建硬链接，改为复制 - FileID: {file_id}, Error: {e}")
+            shutil.copyfile(self.blob_path(sha256), alias)
+        return file_id, alias, True
+
+    def unlink(self, file_id: str, sha256: Optional[str] = None) -> Optional[str]:
+        """Remove a file_id alias; its blob is deleted with the last alias.
+
+        Args:
+            file_id: Alias to remove
+            sha256: Content hash of the alias (hashed from the file if None)
+
+        Returns:
+            The content hash of the removed alias, or None if not found
+        """
+        alias_dir = self.alias_dir(file_id)
+        if not os.path.isdir(alias_dir):
+            # Flat layout of older uploads
+            alias_dir = os.path.join(self.root, file_id)
+            if not os.path.isdir(alias_dir):
+                return None
+        for name in os.listdir(alias_dir):
+            path = os.path.join(alias_dir, name)
+            if sha256 is None:
+                sha256 = self.hash_file(path)
+            os.remove(path)
+        os.rmdir(alias_dir)
+        if sha256 is not None and self.refcount(sha256) == 0 and self.has_blob(sha256):
+            os.remove(self.blob_path(sha256))
+        return sha256
+
+    @staticmethod
+    def hash_file(path: str) -> str:
+        """SHA-256 of a file, read in blocks."""
+        digest = hashlib.sha256()
+        with open(path, "rb") as f:
+            for block in iter(lambda: f.read(1024 * 1024), b""):
+                digest.update(block)
+        return digest.hexdigest()
@@ -0,0 +1,85 @@
+"""Bounded executors for blocking file work.
+
+Disk writes, index lookups and hashing are blocking; running them on the
+event loop stalls every concurrent SSE stream. ``run_file_io`` runs them on a
+small dedicated thread pool instead (FILE_IO_WORKERS threads, default 4), so
+heavy file work queues behind itself rather than behind the default executor
+used by the rest of the app.
+
+Base64 decoding holds the GIL. Several decodes in parallel threads starve the
+event loop thread, so ``run_cpu_bound`` serializes them on one thread. The
+loop then competes with a single GIL holder and keeps its latency.
+
+Document text extraction (PDF, XLSX parsing) can take seconds per file, so
+``run_extraction`` gives it a separate single thread: a large document never
+delays the decoding of attachments being saved.
+"""
+
+import asyncio
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, TypeVar
+
+T = TypeVar("T")
+
+FILE_IO_WORKERS = int(os.getenv("FILE_IO_WORKERS", "4"))
+
+_executor = ThreadPoolExecutor(
+    max_workers=FILE_IO_WORKERS, thread_name_prefix="file-io"
+)
+_cpu_executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="file-cpu")
+_extract_executor = ThreadPoolExecutor(
+    max_workers=1, thread_name_prefix="file-extract"
+)
+
+
+async def run_file_io(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run a blocking file operation on the file I/O thread pool.
+
+    Args:
+        func: Blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The result of func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_cpu_bound(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run GIL-bound work (e.g. base64 decoding) on the single CPU thread.
+
+    Args:
+        func: Blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The result of func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _cpu_executor, functools.partial(func, *args, **kwargs)
+    )
+
+
+async def run_extraction(func: Callable[..., T], *args: Any, **kwargs: Any) -> T:
+    """Run document parsing on the dedicated extraction thread.
+
+    Args:
+        func: Blocking callable
+        *args: Positional arguments for func
+        **kwargs: Keyword arguments for func
+
+    Returns:
+        The result of func
+    """
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(
+        _extract_executor, functools.partial(func, *args, **kwargs)
+    )
@@ -4,23 +4,53 @@ This module provides utilities for:
 - Filename sanitization to prevent path traversal attacks
 - File size validation
 - MIME type validation
-- Saving files from base64 or binary data
-- Processing file content in messages
+- Saving files from base64 or binary data into the deduplicating blob store
+- Chunked (streaming, resumable) uploads written incrementally to disk
+- Upload metadata lookup through the persistent upload index
+- Processing file content in messages, saving attachments concurrently in
+  the background
+- Starting text extraction of stored documents (see ``util.text_extract``)
 """
 
+import asyncio
 import base64
+import hashlib
 import logging
+import mimetypes
 import os
 import re
 import uuid
 from pathlib import Path
-from typing import Optional
+from typing import AsyncIterator, Optional
 
 from agentscope_runtime.engine.schemas.agent_schemas import FileContent
 from agentscope.message import Msg
 
+from util.blob_store import BlobStore
+from util.file_io import run_cpu_bound, run_file_io
+from util.text_extract import ExtractionCache
+from util.upload_index import UploadIndex
+from util.upload_retention import get_upload_retention
+
 # Configure uploads directory
 UPLOADS_DIR = os.path.join(os.path.dirname(__file__), "../uploads")
+# Partial files of chunked uploads in progress
+PARTIAL_DIR = os.path.join(UPLOADS_DIR, ".partial")
+
+MAX_FILE_SIZE = 10 * 1024 * 1024
+# Bytes of a chunked upload buffered in memory before each disk write
+WRITE_BUFFER_SIZE = 1024 * 1024
+
+_UPLOAD_ID_PATTERN = re.compile(r"^[0-9a-f\-]{32,36}$")
+
+# Attachments decoded and written at the same time (bounds memory of
+# decoded buffers in flight)
+ATTACHMENT_CONCURRENCY = int(os.getenv("ATTACHMENT_CONCURRENCY", "4"))
+
+
+blob_store = BlobStore(UPLOADS_DIR)
+upload_index = UploadIndex(os.path.join(UPLOADS_DIR, ".index.db"))
+extraction_cache = ExtractionCache(os.path.join(UPLOADS_DIR, ".extract"))
 
 
 def sanitize_filename(filename: str) -> str:
@@ -72,7 +102,7 @@ def sanitize_filename(filename: str) -> str:
     return base_name + ext
 
 
-def validate_file_size(file_data: bytes, max_size: int = 10 * 1024 * 1024) -> bool:
+def validate_file_size(file_data: bytes, max_size: int = MAX_FILE_SIZE) -> bool:
     """Check if file data size is within limit (default 10MB).
 
     Args:
@@ -108,27 +138,79 @@ def validate_mime_type(file_data: bytes) -> bool:
     return True
 
 
-def save_file_from_base64(file_data: str, filename: str) -> dict:
-    """Save base64-encoded file to uploads directory.
+def guess_mime_type(filename: str) -> str:
+    """Guess a content type from the filename extension."""
+    content_type, _ = mimetypes.guess_type(filename)
+    return content_type or "application/octet-stream"
+
+
+def file_url_for(file_id: str) -> str:
+    """URL an upload is served from."""
+    return f"http://localhost:8080/files/{file_id}"
+
+
+def _saved_file_result(
+    file_id: str,
+    file_path: str,
+    filename: str,
+    size: int,
+    sha256: str,
+    created: bool,
+    user_id: Optional[str] = None,
+) -> dict:
+    upload_index.add(
+        file_id,
+        os.path.relpath(file_path, UPLOADS_DIR),
+        filename,
+        size,
+        guess_mime_type(filename),
+        sha256,
+        user_id,
+    )
+    return {
+        "file_id": file_id,
+        "file_url": file_url_for(file_id),
+        "file_path": file_path,
+        "filename": filename,
+        "size": size,
+        "sha256": sha256,
+        "deduplicated": not created,
+    }
 
-    Args:
-        file_data: Base64 string or data URL (data:mime/type;base64,...)
-        filename: Original filename
 
-    Returns:
-        dict with keys: file_id, file_url, file_path, filename, size
+def _b64decode_chunked(b64_data: str, chunk_chars: int = 1 << 20) -> bytes:
+    """Decode base64 in slices so worker threads release the GIL in between.
 
-    Raises:
-        ValueError: If file size exceeds limit or base64 is invalid
+    Decoding a 10MB payload in one call holds the GIL for tens of
+    milliseconds, stalling the event loop even when run in a thread.
+    """
+    if len(b64_data) <= chunk_chars or any(c in b64_data for c in " \r\n\t"):
+        return base64.b64decode(b64_data)
+    return b"".join(
+        base64.b64decode(b64_data[i : i + chunk_chars])
+        for i in range(0, len(b64_data), chunk_chars)
+    )
 
-    Examples:
-        >>> result = save_file_from_base64("SGVsbG8gV29ybGQ=", "hello.txt")
-        >>> print(result['file_id'])
-        a1b2c3d4-e5f6-7890-abcd-ef1234567890
+
+def check_upload_quota(
+    user_id: Optional[str], size: int, sha256: Optional[str] = None
+) -> None:
+    """Check the user's upload quota, if retention is configured.
+
+    Raises:
+        QuotaExceededError: If the upload would exceed the user's quota
     """
-    # Ensure uploads directory exists
-    os.makedirs(UPLOADS_DIR, exist_ok=True)
+    retention = get_upload_retention()
+    if retention is not None:
+        retention.check_quota(user_id, size, sha256)
 
+
+def _base64_payload(file_data: str) -> str:
+    """Extract and size-check the base64 part of a file payload.
+
+    Raises:
+        ValueError: If the data URL is invalid or the file exceeds the limit
+    """
     # Detect and extract base64 from data URL if needed
     if file_data.startswith("data:"):
         # Extract base64 portion from data URL
@@ -142,9 +224,34 @@ def save_file_from_base64(file_data: str, filename: str) -> dict:
         # Standard base64 string
         b64_data = file_data
 
+    # Reject oversized payloads before decoding them
+    if _estimated_size(b64_data) > MAX_FILE_SIZE:
+        raise ValueError(f"File size exceeds 10MB limit")
+    return b64_data
+
+
+def _estimated_size(b64_data: str) -> int:
+    encoded_len = len(b64_data) - b64_data.count("\n")
+    return encoded_len * 3 // 4 - b64_data.count("=", -2)
+
+
+def decode_base64_file(file_data: str) -> bytes:
+    """Decode and size-check a base64 file payload.
+
+    Args:
+        file_data: Base64 string or data URL (data:mime/type;base64,...)
+
+    Returns:
+        Decoded file bytes
+
+    Raises:
+        ValueError: If file size exceeds limit or base64 is invalid
+    """
+    b64_data = _base64_payload(file_data)
+
     # Decode base64 to bytes
     try:
-        file_bytes = base64.b64decode(b64_data)
+        file_bytes = _b64decode_chunked(b64_data)
     except (base64.binascii.Error, ValueError) as e:
         raise ValueError(f"Invalid base64 data: {e}") from e
 
@@ -152,45 +259,150 @@ def save_file_from_base64(file_data: str, filename: str) -> dict:
     if not validate_file_size(file_bytes):
         raise ValueError(f"File size exceeds 10MB limit")
 
-    # Generate UUID4 file_id
-    file_id = str(uuid.uuid4())
+    return file_bytes
 
-    # Sanitize filename
-    safe_filename = sanitize_filename(filename)
 
-    # Create file_id subdirectory
-    file_dir = os.path.join(UPLOADS_DIR, file_id)
-    os.makedirs(file_dir, exist_ok=True)
+def save_file_from_base64(
+    file_data: str, filename: str, user_id: Optional[str] = None
+) -> dict:
+    """Save base64-encoded file to uploads directory.
 
-    # Save file
-    file_path = os.path.join(file_dir, safe_filename)
-    with open(file_path, "wb") as f:
-        f.write(file_bytes)
+    Args:
+        file_data: Base64 string or data URL (data:mime/type;base64,...)
+        filename: Original filename
+        user_id: Owner of the upload (for quota accounting)
 
-    # Generate file URL
-    file_url = f"http://localhost:8080/files/{file_id}"
+    Returns:
+        dict with keys: file_id, file_url, file_path, filename, size, sha256,
+        deduplicated (True if the same file was already stored)
 
-    return {
-        "file_id": file_id,
-        "file_url": file_url,
-        "file_path": file_path,
-        "filename": safe_filename,
-        "size": len(file_bytes),
-    }
+    Raises:
+        ValueError: If file size exceeds limit or base64 is invalid
+        QuotaExceededError: If the user's upload quota is exceeded
+
+    Examples:
+        >>> result = save_file_from_base64("SGVsbG8gV29ybGQ=", "hello.txt")
+        >>> print(result['file_id'])
+        a1b2c3d4-e5f6-7890-abcd-ef1234567890
+    """
+    file_id, existing = find_base64_upload(file_data, filename, user_id)
+    if existing is not None:
+        return existing
+    return save_file_from_binary(
+        decode_base64_file(file_data), filename, user_id, file_id
+    )
+
+
+async def save_file_from_base64_async(
+    file_data: str, filename: str, user_id: Optional[str] = None
+) -> dict:
+    """Save a base64 file without blocking the event loop.
+
+    The payload is hashed on the file I/O pool first; an attachment that is
+    already stored is returned without being decoded. Otherwise it is decoded
+    on the CPU thread and written on the file I/O pool.
+
+    Args:
+        file_data: Base64 string or data URL (data:mime/type;base64,...)
+        filename: Original filename
+        user_id: Owner of the upload (for quota accounting)
+
+    Returns:
+        Same dict as ``save_file_from_base64``
+
+    Raises:
+        ValueError: If file size exceeds limit or base64 is invalid
+        QuotaExceededError: If the user's upload quota is exceeded
+    """
+    file_id, existing = await run_file_io(
+        find_base64_upload, file_data, filename, user_id
+    )
+    if existing is not None:
+        return existing
+    file_bytes = await run_cpu_bound(decode_base64_file, file_data)
+    result = await run_file_io(
+        save_file_from_binary, file_bytes, filename, user_id, file_id
+    )
+    schedule_extraction(result)
+    return result
+
+
+def schedule_extraction(result: dict) -> None:
+    """Start text extraction of a newly saved upload in the background.
+
+    Args:
+        result: Saved file dict (file_path, filename, sha256)
+    """
+    if not result["deduplicated"]:
+        extraction_cache.schedule(
+            result["sha256"], result["file_path"], result["filename"]
+        )
+
+
+def find_base64_upload(
+    file_data: str, filename: str, user_id: Optional[str] = None
+) -> tuple[str, Optional[dict]]:
+    """Resolve the file_id of a base64 payload without decoding it.
 
+    The file_id is derived from the hash of the encoded payload, so checking
+    whether an attachment was already stored costs one hash and one index
+    read. New payloads are size- and quota-checked from their encoded length.
 
-def save_file_from_binary(file_data: bytes, filename: str) -> dict:
+    Args:
+        file_data: Base64 string or data URL (data:mime/type;base64,...)
+        filename: Original filename
+        user_id: Owner of the upload (for quota accounting)
+
+    Returns:
+        (file_id, saved file dict if already stored, else None)
+
+    Raises:
+        ValueError: If the data URL is invalid or the file exceeds the limit
+        QuotaExceededError: If the user's upload quota would be exceeded
+    """
+    b64_data = _base64_payload(file_data)
+    digest = hashlib.sha256(b64_data.encode("ascii", "replace")).hexdigest()
+    safe_filename = sanitize_filename(filename)
+    file_id = blob_store.file_id_for(f"base64:{digest}", safe_filename, user_id)
+
+    record = lookup_upload(file_id)
+    if record is not None and os.path.exists(record["file_path"]):
+        upload_index.touch(file_id)
+        return file_id, {
+            "file_id": file_id,
+            "file_url": file_url_for(file_id),
+            "file_path": record["file_path"],
+            "filename": record["filename"],
+            "size": record["size"],
+            "sha256": record["sha256"],
+            "deduplicated": True,
+        }
+    check_upload_quota(user_id, _estimated_size(b64_data))
+    return file_id, None
+
+
+def save_file_from_binary(
+    file_data: bytes,
+    filename: str,
+    user_id: Optional[str] = None,
+    file_id: Optional[str] = None,
+) -> dict:
     """Save binary file to uploads directory.
 
     Args:
         file_data: File binary data
         filename: Original filename
+        user_id: Owner of the upload (for quota accounting)
+        file_id: file_id to store the upload under (default: derived from
+            the content hash)
 
     Returns:
-        dict with keys: file_id, file_url, file_path, filename, size
+        dict with keys: file_id, file_url, file_path, filename, size, sha256,
+        deduplicated (True if the same file was already stored)
 
     Raises:
         ValueError: If file size exceeds limit
+        QuotaExceededError: If the user's upload quota is exceeded
 
     Examples:
         >>> result = save_file_from_binary(b"Hello World", "hello.txt")
@@ -204,59 +416,390 @@ def save_file_from_binary(file_data: bytes, filename: str) -> dict:
     if not validate_file_size(file_data):
         raise ValueError(f"File size exceeds 10MB limit")
 
-    # Generate UUID4 file_id
-    file_id = str(uuid.uuid4())
-
-    # Sanitize filename
+    # Store content once; repeated uploads reuse the blob and file_id
     safe_filename = sanitize_filename(filename)
+    sha256 = hashlib.sha256(file_data).hexdigest()
+    file_id = file_id or blob_store.file_id_for(sha256, safe_filename, user_id)
+    if upload_index.get(file_id) is None:
+        check_upload_quota(user_id, len(file_data), sha256)
+    with blob_store.lock:
+        blob_store.put_bytes(file_data, sha256)
+        file_id, file_path, created = blob_store.link(
+            sha256, safe_filename, user_id, file_id
+        )
+        return _saved_file_result(
+            file_id, file_path, safe_filename, len(file_data), sha256, created, user_id
+        )
 
-    # Create file_id subdirectory
-    file_dir = os.path.join(UPLOADS_DIR, file_id)
-    os.makedirs(file_dir, exist_ok=True)
 
-    # Save file
-    file_path = os.path.join(file_dir, safe_filename)
-    with open(file_path, "wb") as f:
-        f.write(file_data)
+def lookup_upload(file_id: str) -> Optional[dict]:
+    """Find an upload's metadata record by file_id.
 
-    # Generate file URL
-    file_url = f"http://localhost:8080/files/{file_id}"
+    Uploads stored before the index existed are located once by scanning
+    their directory and then added to the index.
 
-    return {
-        "file_id": file_id,
-        "file_url": file_url,
-        "file_path": file_path,
-        "filename": safe_filename,
-        "size": len(file_data),
-    }
+    Args:
+        file_id: UUID of the uploaded file
+
+    Returns:
+        Index record (with absolute ``file_path``), or None if not found
+    """
+    # Hidden entries (e.g. partial uploads) are not files
+    if not file_id or file_id.startswith(".") or "/" in file_id:
+        return None
 
+    record = upload_index.get(file_id)
+    if record is None:
+        file_dir = os.path.join(UPLOADS_DIR, file_id)
+        if not os.path.isdir(file_dir):
+            return None
+        # Find the file in the directory (there's only one file per directory)
+        files = list(Path(file_dir).glob("*"))
+        if not files or not files[0].is_file():
+            return None
+        file_path = files[0]
+        stat = file_path.stat()
+        record = upload_index.add(
+            file_id,
+            os.path.relpath(file_path, UPLOADS_DIR),
+            file_path.name,
+            stat.st_size,
+            guess_mime_type(file_path.name),
+            created_at=stat.st_mtime,
+        )
+    return {**record, "file_path": os.path.join(UPLOADS_DIR, record["path"])}
+
+
+def index_legacy_uploads() -> int:
+    """Add uploads in the flat pre-index layout to the upload index.
+
+    Lets retention sweeps see files that were uploaded before the index
+    existed. Blocking; run it in a worker thread.
+
+    Returns:
+        Number of upload directories scanned
+    """
+    if not os.path.isdir(UPLOADS_DIR):
+        return 0
+    scanned = 0
+    for name in os.listdir(UPLOADS_DIR):
+        # Skip hidden entries and the two-character shard directories
+        if name.startswith(".") or len(name) <= 2:
+            continue
+        if upload_index.get(name) is None:
+            lookup_upload(name)
+            scanned += 1
+    return scanned
+
+
+class UploadOffsetError(ValueError):
+    """Raised when a chunk does not start where the partial upload ends."""
+
+    def __init__(self, expected: int):
+        super().__init__(f"Upload offset mismatch, expected {expected}")
+        self.expected = expected
+
+
+class UploadOwnerError(PermissionError):
+    """Raised when a chunk is sent for another user's upload."""
+
+
+class ChunkedUpload:
+    """Upload written to disk incrementally, resumable by offset.
+
+    Chunks are appended to a partial file under ``PARTIAL_DIR`` while the size
+    and SHA-256 are computed on the fly; the upload aborts as soon as the size
+    limit is exceeded. ``finalize`` moves the file into its file_id directory.
+    The owner is kept next to the partial file (``<upload_id>.owner``) so a
+    resumed upload stays tied to the user that started it.
+    """
+
+    def __init__(
+        self,
+        upload_id: str,
+        filename: str,
+        max_size: int = MAX_FILE_SIZE,
+        user_id: Optional[str] = None,
+    ):
+        """Initialize chunked upload.
+
+        Args:
+            upload_id: Upload identifier (uuid)
+            filename: Original filename
+            max_size: Maximum allowed size in bytes
+            user_id: Owner of the upload (for quota accounting)
+
+        Raises:
+            ValueError: If upload_id is invalid
+        """
+        if not _UPLOAD_ID_PATTERN.match(upload_id):
+            raise ValueError("Invalid upload_id")
+        self.upload_id = upload_id
+        self.filename = sanitize_filename(filename)
+        self.max_size = max_size
+        self.user_id = user_id or None
+        self.path = os.path.join(PARTIAL_DIR, upload_id)
+        self.owner_path = f"{self.path}.owner"
+        self.size = 0
+        self._hash = hashlib.sha256()
+        self._lock = asyncio.Lock()
+
+        # Resume a partial file left by an earlier process
+        if os.path.exists(self.path):
+            try:
+                with open(self.owner_path, encoding="utf-8") as f:
+                    self.user_id = f.read() or None
+            except FileNotFoundError:
+                self.user_id = None
+            with open(self.path, "rb") as f:
+                for block in iter(lambda: f.read(1024 * 1024), b""):
+                    self._hash.update(block)
+                    self.size += len(block)
+
+    async def write_stream(self, offset: int, stream: AsyncIterator[bytes]) -> int:
+        """Append a stream of chunks starting at ``offset``.
+
+        Args:
+            offset: Byte offset the stream starts at (must equal ``size``)
+            stream: Async iterator of byte chunks (e.g. ``request.stream()``)
+
+        Returns:
+            Size of the partial file after writing
+
+        Raises:
+            UploadOffsetError: If offset does not match the partial file
+            ValueError: If the size limit is exceeded
+        """
+        async with self._lock:
+            if offset != self.size:
+                raise UploadOffsetError(self.size)
+            # Chunks are buffered and written off the event loop
+            pending: list[bytes] = []
+            pending_size = 0
+            try:
+                async for chunk in stream:
+                    if not chunk:
+                        continue
+                    if self.size + pending_size + len(chunk) > self.max_size:
+                        pending = []
+                        raise ValueError(
+                            f"File size exceeds {self.max_size // (1024 * 1024)}MB limit"
+                        )
+                    pending.append(chunk)
+                    pending_size += len(chunk)
+                    if pending_size >= WRITE_BUFFER_SIZE:
+                        await run_file_io(self._append, b"".join(pending))
+                        pending = []
+                        pending_size = 0
+            finally:
+                # Keep what was received so an interrupted upload can resume
+                if pending:
+                    await run_file_io(self._append, b"".join(pending))
+            return self.size
+
+    def _append(self, data: bytes) -> None:
+        os.makedirs(PARTIAL_DIR, exist_ok=True)
+        if not os.path.exists(self.owner_path):
+            with open(self.owner_path, "w", encoding="utf-8") as f:
+                f.write(self.user_id or "")
+        with open(self.path, "ab") as f:
+            f.write(data)
+        self._hash.update(data)
+        self.size += len(data)
+
+    @property
+    def sha256(self) -> str:
+        return self._hash.hexdigest()
+
+    def finalize(self) -> dict:
+        """Move the completed upload into the blob store and link its file_id.
+
+        Returns:
+            dict with keys: file_id, file_url, file_path, filename, size, sha256,
+            deduplicated
+
+        Raises:
+            QuotaExceededError: If the user's upload quota is exceeded
+        """
+        file_id = blob_store.file_id_for(self.sha256, self.filename, self.user_id)
+        if upload_index.get(file_id) is None:
+            check_upload_quota(self.user_id, self.size, self.sha256)
+        with blob_store.lock:
+            if os.path.exists(self.path):
+                blob_store.put_file(self.path, self.sha256)
+            else:
+                blob_store.put_bytes(b"", self.sha256)
+            file_id, file_path, created = blob_store.link(
+                self.sha256, self.filename, self.user_id
+            )
+            result = _saved_file_result(
+                file_id,
+                file_path,
+                self.filename,
+                self.size,
+                self.sha256,
+                created,
+                self.user_id,
+            )
+        self._remove_owner()
+        return result
 
-def process_file_content(item: FileContent, session_id: str) -> Optional[FileContent]:
+    def _remove_owner(self) -> None:
+        if os.path.exists(self.owner_path):
+            os.remove(self.owner_path)
+
+    def abort(self) -> None:
+        """Delete the partial file."""
+        if os.path.exists(self.path):
+            os.remove(self.path)
+        self._remove_owner()
+
+
+# upload_id -> ChunkedUpload (keeps the running hash between requests)
+_chunked_uploads: dict[str, ChunkedUpload] = {}
+
+
+def get_chunked_upload(
+    upload_id: Optional[str] = None,
+    filename: str = "uploaded_file",
+    user_id: Optional[str] = None,
+) -> ChunkedUpload:
+    """Get an upload in progress, or start a new one if upload_id is None.
+
+    Raises:
+        ValueError: If upload_id is invalid
+        UploadOwnerError: If the upload was started by another user
+    """
+    if upload_id is None:
+        upload_id = str(uuid.uuid4())
+    upload = _chunked_uploads.get(upload_id)
+    if upload is None:
+        upload = ChunkedUpload(upload_id, filename, user_id=user_id)
+        _chunked_uploads[upload_id] = upload
+    if upload.user_id != (user_id or None):
+        raise UploadOwnerError("Upload belongs to another user")
+    return upload
+
+
+def release_chunked_upload(upload: ChunkedUpload, abort: bool = False) -> None:
+    """Forget a finished or failed upload, deleting its partial file on abort."""
+    _chunked_uploads.pop(upload.upload_id, None)
+    if abort:
+        upload.abort()
+
+
+def forget_chunked_upload(upload_id: str) -> None:
+    """Drop the in-memory state of an upload whose partial file was swept."""
+    _chunked_uploads.pop(upload_id, None)
+
+
+# file_id -> background save of an attachment not yet on disk
+_pending_saves: dict[str, asyncio.Task] = {}
+_attachment_semaphore = asyncio.Semaphore(ATTACHMENT_CONCURRENCY)
+
+
+async def _save_attachment(
+    file_data: str,
+    filename: str,
+    user_id: Optional[str],
+    file_id: str,
+    session_id: str,
+) -> Optional[dict]:
+    async with _attachment_semaphore:
+        try:
+            file_bytes = await run_cpu_bound(decode_base64_file, file_data)
+            result = await run_file_io(
+                save_file_from_binary, file_bytes, filename, user_id, file_id
+            )
+        except ValueError as e:
+            logging.warning(
+                f"文件保存失败 - SessionID: {session_id}, "
+                f"FileID: {file_id}, Error: {e}"
+            )
+            return None
+        except Exception as e:
+            logging.error(
+                f"文件保存失败（未知错误） - SessionID: {session_id}, "
+                f"FileID: {file_id}, Error: {e}",
+                exc_info=True,
+            )
+            return None
+    schedule_extraction(result)
+    logging.info(
+        f"文件保存成功 - SessionID: {session_id}, "
+        f"FileID: {result['file_id']}, "
+        f"Filename: {result['filename']}, "
+        f"Size: {result['size']} bytes, "
+        f"Deduplicated: {result['deduplicated']}"
+    )
+    return result
+
+
+async def await_upload(file_id: str) -> Optional[dict]:
+    """Wait for an attachment still being saved, then look it up.
+
+    Attachments in messages are saved in the background; anything that reads
+    an upload by file_id (file serving, tools) goes through this first.
+
+    Args:
+        file_id: UUID of the uploaded file
+
+    Returns:
+        Index record (with absolute ``file_path``), or None if not found
+    """
+    task = _pending_saves.get(file_id)
+    if task is not None:
+        # asyncio.wait: a cancelled caller must not cancel the save
+        await asyncio.wait({task})
+    return await run_file_io(lookup_upload, file_id)
+
+
+async def wait_pending_uploads() -> None:
+    """Wait for all background attachment saves (e.g. before shutdown)."""
+    if _pending_saves:
+        await asyncio.wait(set(_pending_saves.values()))
+
+
+async def process_file_content(
+    item: FileContent, session_id: str, user_id: Optional[str] = None
+) -> Optional[FileContent]:
     """Process a single FileContent item (save new uploads or validate existing).
 
+    New uploads get their file_id and file_url right away; decoding and
+    writing continue in the background (see ``await_upload``). Payloads that
+    were already stored are not decoded again.
+
     Args:
         item: FileContent to process
         session_id: Session identifier for logging
+        user_id: Owner of new uploads (for quota accounting)
 
     Returns:
         Processed FileContent or None if processing failed
     """
     if item.file_data:
+        filename = item.filename or "uploaded_file"
         try:
-            filename = item.filename or "uploaded_file"
-            result = save_file_from_base64(item.file_data, filename)
-            item.file_id = result["file_id"]
-            item.file_url = result["file_url"]
-            logging.info(
-                f"文件保存成功 - SessionID: {session_id}, "
-                f"FileID: {result['file_id']}, "
-                f"Filename: {result['filename']}, "
-                f"Size: {result['size']} bytes"
+            file_id, existing = await run_file_io(
+                find_base64_upload, item.file_data, filename, user_id
             )
-            return item
         except ValueError as e:
             logging.warning(f"文件处理失败 - SessionID: {session_id}, Error: {e}")
             return None
+        item.file_id = file_id
+        item.file_url = file_url_for(file_id)
+        if existing is not None:
+            logging.info(
+                f"文件已存在，跳过保存 - SessionID: {session_id}, "
+                f"FileID: {file_id}, Filename: {existing['filename']}"
+            )
+        elif file_id not in _pending_saves:
+            task = asyncio.create_task(
+                _save_attachment(item.file_data, filename, user_id, file_id, session_id)
+            )
+            _pending_saves[file_id] = task
+            task.add_done_callback(lambda _: _pending_saves.pop(file_id, None))
+        return item
     elif item.file_url:
         logging.info(
             f"使用已有文件 - SessionID: {session_id}, FileURL: {item.file_url}"
@@ -269,43 +812,56 @@ def process_file_content(item: FileContent, session_id: str) -> Optional[FileCon
         return None
 
 
-def process_message_content(msg: Msg, session_id: str) -> None:
+async def process_message_content(
+    msg: Msg, session_id: str, user_id: Optional[str] = None
+) -> None:
     """Process message content, handling files and text.
 
+    File items are processed concurrently; content order is preserved.
+
     Args:
         msg: Message to process
         session_id: Session identifier for logging
+        user_id: Owner of new uploads (for quota accounting)
     """
     if not msg or not hasattr(msg, "content") or not msg.content:
         return
 
-    processed_content = []
-    for item in msg.content:
-        if isinstance(item, FileContent):
-            processed_item = process_file_content(item, session_id)
-            if processed_item is not None:
-                processed_content.append(processed_item)
-        else:
-            # TextContent or other types
-            processed_content.append(item)
-
-    msg.content = processed_content
+    file_items = [item for item in msg.content if isinstance(item, FileContent)]
+    if not file_items:
+        return
+    processed = await asyncio.gather(
+        *(process_file_content(item, session_id, user_id) for item in file_items)
+    )
+    dropped = {
+        id(item) for item, result in zip(file_items, processed) if result is None
+    }
+    # TextContent and other types are kept as they are
+    msg.content = [item for item in msg.content if id(item) not in dropped]
 
 
-def process_messages(msgs, session_id: str):
+async def process_messages(msgs, session_id: str, user_id: Optional[str] = None):
     """Process all messages, handling file uploads and content transformation.
 
+    Attachments of all messages are resolved concurrently. This returns once
+    every attachment has a file_id; the decoding and writing of new ones runs
+    in the background, at most ``ATTACHMENT_CONCURRENCY`` at a time.
+
     Args:
         msgs: Messages to process
         session_id: Session identifier for logging
+        user_id: Owner of new uploads (for quota accounting)
 
     Returns:
         Processed messages
     """
     if msgs and hasattr(msgs, "__iter__"):
-        processed_msgs = []
-        for msg in msgs:
-            process_message_content(msg, session_id)
-            processed_msgs.append(msg)
+        processed_msgs = list(msgs)
+        await asyncio.gather(
+            *(
+                process_message_content(msg, session_id, user_id)
+                for msg in processed_msgs
+            )
+        )
         return processed_msgs
     return msgs
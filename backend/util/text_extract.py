@@ -0,0 +1,350 @@
+"""Text extraction cache for uploaded documents.
+
+Uploaded documents (PDF, XLSX, DOCX, plain text) are parsed once per content
+hash into page texts, table summaries and chunk offsets, and the result is
+cached on disk as ``<root>/<sha[:2]>/<sha256>.json``. Re-uploads of the same
+content and follow-up questions about a file reuse the cached extraction
+instead of parsing the document again.
+
+Extraction is started in the background when an upload is stored
+(``ExtractionCache.schedule``); readers call ``ExtractionCache.extract``,
+which returns the cached result, waits for an extraction in progress, or
+extracts on demand.
+"""
+
+import asyncio
+import json
+import logging
+import os
+import re
+import tempfile
+import zipfile
+from collections import OrderedDict
+from typing import Optional
+from xml.etree import ElementTree
+
+from util.file_io import run_extraction, run_file_io
+
+# Bump when the extraction format changes; older cache entries are re-extracted
+EXTRACT_VERSION = 1
+
+# Target characters per chunk
+CHUNK_CHARS = 2000
+
+# Text kept per document (larger documents are truncated)
+MAX_EXTRACT_CHARS = 5_000_000
+
+PDF_EXTENSIONS = {".pdf"}
+SPREADSHEET_EXTENSIONS = {".xlsx", ".xlsm"}
+DOCX_EXTENSIONS = {".docx"}
+TEXT_EXTENSIONS = {
+    ".txt",
+    ".md",
+    ".csv",
+    ".tsv",
+    ".json",
+    ".log",
+    ".xml",
+    ".yaml",
+    ".yml",
+    ".html",
+    ".htm",
+}
+
+_WORD_NS = "{http://schemas.openxmlformats.org/wordprocessingml/2006/main}"
+
+
+def is_extractable(filename: str) -> bool:
+    """Whether documents with this filename have an extractor."""
+    ext = os.path.splitext(filename)[1].lower()
+    return ext in (
+        PDF_EXTENSIONS | SPREADSHEET_EXTENSIONS | DOCX_EXTENSIONS | TEXT_EXTENSIONS
+    )
+
+
+def _decode_text(data: bytes) -> str:
+    for encoding in ("utf-8-sig", "gb18030"):
+        try:
+            return data.decode(encoding)
+        except UnicodeDecodeError:
+            continue
+    return data.decode("utf-8", errors="replace")
+
+
+def _extract_pdf(path: str) -> tuple[list[str], list[str], list[dict]]:
+    from pypdf import PdfReader
+
+    reader = PdfReader(path)
+    pages = [page.extract_text() or "" for page in reader.pages]
+    labels = [str(i + 1) for i in range(len(pages))]
+    return pages, labels, []
+
+
+def _extract_spreadsheet(path: str) -> tuple[list[str], list[str], list[dict]]:
+    from openpyxl import load_workbook
+
+    wb = load_workbook(path, read_only=True, data_only=True)
+    pages, labels, tables = [], [], []
+    try:
+        for ws in wb.worksheets:
+            lines = []
+            columns: list[str] = []
+            for row in ws.iter_rows(values_only=True):
+                cells = ["" if v is None else str(v) for v in row]
+                while cells and not cells[-1]:
+                    cells.pop()
+                if not cells:
+                    continue
+                if not columns:
+                    columns = cells
+                lines.append("\t".join(cells))
+            tables.append(
+                {
+                    "page": len(pages) + 1,
+                    "name": ws.title,
+                    "columns": columns,
+                    "rows": max(len(lines) - 1, 0),
+                }
+            )
+            pages.append("\n".join(lines))
+            labels.append(ws.title)
+    finally:
+        wb.close()
+    return pages, labels, tables
+
+
+def _extract_docx(path: str) -> tuple[list[str], list[str], list[dict]]:
+    with zipfile.ZipFile(path) as archive:
+        root = ElementTree.fromstring(archive.read("word/document.xml"))
+    paragraphs = []
+    for paragraph in root.iter(f"{_WORD_NS}p"):
+        text = "".join(node.text or "" for node in paragraph.iter(f"{_WORD_NS}t"))
+        if text:
+            paragraphs.append(text)
+    return ["\n".join(paragraphs)], ["1"], []
+
+
+def _extract_text(path: str, ext: str) -> tuple[list[str], list[str], list[dict]]:
+    with open(path, "rb") as f:
+        text = _decode_text(f.read())
+    if ext in (".html", ".htm"):
+        from bs4 import BeautifulSoup
+
+        text = BeautifulSoup(text, "html.parser").get_text("\n")
+    return [text], ["1"], []
+
+
+def _chunk_page(text: str, size: int = CHUNK_CHARS) -> list[tuple[int, int]]:
+    """Split text into (start, end) spans of about ``size`` characters.
+
+    Spans end at a paragraph or line break when one is close to the limit.
+    """
+    spans = []
+    start = 0
+    while start < len(text):
+        end = min(start + size, len(text))
+        if end < len(text):
+            cut = max(text.rfind("\n\n", start, end), text.rfind("\n", start, end))
+            if cut > start + size // 2:
+                end = cut + 1
+        spans.append((start, end))
+        start = end
+    return spans
+
+
+def extract_document(path: str, filename: str) -> dict:
+    """Extract page texts, tables and chunks from a document (blocking).
+
+    Args:
+        path: File to parse
+        filename: Original filename (its extension selects the extractor)
+
+    Returns:
+        dict with keys: version, filename, kind, pages, page_labels, tables,
+        chunks (page number and character span of each chunk), truncated and
+        error (set when parsing failed)
+    """
+    ext = os.path.splitext(filename)[1].lower()
+    if ext in PDF_EXTENSIONS:
+        kind, extractor = "pdf", _extract_pdf
+    elif ext in SPREADSHEET_EXTENSIONS:
+        kind, extractor = "spreadsheet", _extract_spreadsheet
+    elif ext in DOCX_EXTENSIONS:
+        kind, extractor = "docx", _extract_docx
+    elif ext in TEXT_EXTENSIONS:
+        kind, extractor = "text", lambda p: _extract_text(p, ext)
+    else:
+        kind, extractor = "unsupported", None
+
+    doc = {
+        "version": EXTRACT_VERSION,
+        "filename": filename,
+        "kind": kind,
+        "pages": [],
+        "page_labels": [],
+        "tables": [],
+        "chunks": [],
+        "truncated": False,
+        "error": None,
+    }
+    if extractor is None:
+        return doc
+    try:
+        pages, labels, tables = extractor(path)
+    except Exception as e:
+        doc["error"] = f"{type(e).__name__}: {e}"
+        return doc
+
+    total = 0
+    for i, text in enumerate(pages):
+        text = re.sub(r"[ \t]+\n", "\n", text)
+        if total + len(text) > MAX_EXTRACT_CHARS:
+            text = text[: MAX_EXTRACT_CHARS - total]
+            doc["truncated"] = True
+        total += len(text)
+        doc["pages"].append(text)
+        doc["page_labels"].append(labels[i])
+        for start, end in _chunk_page(text):
+            doc["chunks"].append({"page": i + 1, "start": start, "end": end})
+        if doc["truncated"]:
+            break
+    doc["tables"] = [t for t in tables if t["page"] <= len(doc["pages"])]
+    return doc
+
+
+def chunk_text(doc: dict, chunk: int) -> str:
+    """Text of chunk number ``chunk`` (0-based) of an extracted document."""
+    span = doc["chunks"][chunk]
+    return doc["pages"][span["page"] - 1][span["start"] : span["end"]]
+
+
+class ExtractionCache:
+    """On-disk cache of document extractions keyed by content hash.
+
+    Recently used extractions are also kept in memory, so repeated tool
+    calls on the same file do not re-read the cache file.
+    """
+
+    def __init__(self, root: str, memory_size: int = 16):
+        """Initialize extraction cache.
+
+        Args:
+            root: Cache directory
+            memory_size: Extractions kept in memory
+        """
+        self.root = root
+        self.memory_size = memory_size
+        self._memory: OrderedDict[str, dict] = OrderedDict()
+        # sha256 -> extraction in progress
+        self._pending: dict[str, asyncio.Task] = {}
+
+    def path_for(self, sha256: str) -> str:
+        return os.path.join(self.root, sha256[:2], f"{sha256}.json")
+
+    def _remember(self, sha256: str, doc: dict) -> None:
+        self._memory[sha256] = doc
+        self._memory.move_to_end(sha256)
+        while len(self._memory) > self.memory_size:
+            self._memory.popitem(last=False)
+
+    def load(self, sha256: str) -> Optional[dict]:
+        """Read a cached extraction from disk (blocking), or None."""
+        try:
+            with open(self.path_for(sha256), encoding="utf-8") as f:
+                doc = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if doc.get("version") != EXTRACT_VERSION:
+            return None
+        return doc
+
+    def store(self, sha256: str, doc: dict) -> None:
+        """Write an extraction to disk atomically (blocking)."""
+        path = self.path_for(sha256)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix=".tmp-")
+        try:
+            with os.fdopen(fd, "w", encoding="utf-8") as f:
+                json.dump(doc, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def forget(self, sha256: str) -> None:
+        """Drop an extraction from memory (call on the event loop)."""
+        self._memory.pop(sha256, None)
+
+    def iter_hashes(self):
+        """Yield the content hash of every cached extraction."""
+        if not os.path.isdir(self.root):
+            return
+        for shard in os.listdir(self.root):
+            shard_dir = os.path.join(self.root, shard)
+            if shard.startswith(".") or not os.path.isdir(shard_dir):
+                continue
+            for name in os.listdir(shard_dir):
+                if name.endswith(".json") and not name.startswith("."):
+                    yield name[: -len(".json")]
+
+    async def _extract(self, sha256: str, path: str, filename: str) -> dict:
+        doc = await run_file_io(self.load, sha256)
+        if doc is None:
+            # Own thread: a slow document must not hold up attachment decoding
+            doc = await run_extraction(extract_document, path, filename)
+            logging.info(
+                f"附件文本提取完成 - SHA256: {sha256}, Filename: {filename}, "
+                f"Pages: {len(doc['pages'])}, Chunks: {len(doc['chunks'])}"
+                + (f", Error: {doc['error']}" if doc["error"] else "")
+            )
+            # Failed or empty extractions may be transient; retry next time
+            if doc["error"] or not doc["pages"]:
+                return doc
+            await run_file_io(self.store, sha256, doc)
+        self._remember(sha256, doc)
+        return doc
+
+    async def extract(self, sha256: str, path: str, filename: str) -> dict:
+        """Return the extraction of a document, extracting it if needed.
+
+        Concurrent calls for the same content share one extraction.
+
+        Args:
+            sha256: Content hash of the document
+            path: File to parse on a cache miss
+            filename: Original filename
+
+        Returns:
+            Extraction dict (see ``extract_document``)
+        """
+        doc = self._memory.get(sha256)
+        if doc is not None:
+            self._memory.move_to_end(sha256)
+            return doc
+        task = self._pending.get(sha256)
+        if task is None:
+            task = asyncio.create_task(self._extract(sha256, path, filename))
+            self._pending[sha256] = task
+            task.add_done_callback(lambda _: self._pending.pop(sha256, None))
+        # asyncio.wait: a cancelled caller must not cancel the extraction
+        await asyncio.wait({task})
+        return task.result()
+
+    def schedule(self, sha256: str, path: str, filename: str) -> None:
+        """Start extracting a newly stored document in the background."""
+        if not is_extractable(filename) or sha256 in self._memory:
+            return
+        if sha256 in self._pending:
+            return
+        task = asyncio.create_task(self._extract(sha256, path, filename))
+        self._pending[sha256] = task
+
+        def _done(task: asyncio.Task) -> None:
+            self._pending.pop(sha256, None)
+            if not task.cancelled() and task.exception() is not None:
+                logging.error(
+                    f"附件文本提取失败 - SHA256: {sha256}, Error: {task.exception()}"
+                )
+
+        task.add_done_callback(_done)
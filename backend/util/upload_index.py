@@ -0,0 +1,261 @@
+"""Persistent metadata index of uploaded files.
+
+Each upload's metadata (path, filename, size, mime, hash, created_at) is
+written to a local SQLite table at upload time, so serving a file is one
+indexed read instead of a directory glob plus a mimetype guess. Lookups go
+through an in-memory LRU. The index also backs listing, quota accounting and
+expiry sweeps; ``last_used`` is refreshed whenever an upload is re-sent or
+served, and expiry goes by it rather than by the first upload time.
+"""
+
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS uploads (
+    file_id TEXT PRIMARY KEY,
+    path TEXT NOT NULL,
+    filename TEXT NOT NULL,
+    size INTEGER NOT NULL,
+    mime TEXT NOT NULL,
+    sha256 TEXT,
+    user_id TEXT,
+    created_at REAL NOT NULL,
+    last_used REAL
+);
+CREATE INDEX IF NOT EXISTS idx_uploads_sha256 ON uploads (sha256);
+CREATE INDEX IF NOT EXISTS idx_uploads_created_at ON uploads (created_at);
+CREATE INDEX IF NOT EXISTS idx_uploads_user ON uploads (user_id, created_at);
+"""
+
+# Indexes on columns added after the first release (created after migrating)
+_MIGRATED_INDEXES = """
+CREATE INDEX IF NOT EXISTS idx_uploads_last_used ON uploads (last_used);
+"""
+
+# Minimum seconds between two last_used refreshes of the same upload
+_TOUCH_INTERVAL = 60
+
+_COLUMNS = (
+    "file_id",
+    "path",
+    "filename",
+    "size",
+    "mime",
+    "sha256",
+    "user_id",
+    "created_at",
+    "last_used",
+)
+
+
+class UploadIndex:
+    """SQLite upload metadata index with an LRU read cache.
+
+    Methods are synchronous and thread-safe; the connection is shared behind a
+    lock.
+    """
+
+    def __init__(self, path: str, cache_size: int = 4096):
+        """Initialize upload index.
+
+        Args:
+            path: SQLite database file
+            cache_size: Records kept in the in-memory LRU
+        """
+        self.path = path
+        self.cache_size = cache_size
+        self._cache: OrderedDict[str, dict] = OrderedDict()
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    def _connection(self) -> sqlite3.Connection:
+        if self._conn is None:
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(_SCHEMA)
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(uploads)")}
+            if "last_used" not in columns:
+                with conn:
+                    conn.execute("ALTER TABLE uploads ADD COLUMN last_used REAL")
+                    conn.execute("UPDATE uploads SET last_used = created_at")
+            conn.executescript(_MIGRATED_INDEXES)
+            self._conn = conn
+        return self._conn
+
+    def _cache_put(self, record: dict) -> None:
+        self._cache[record["file_id"]] = record
+        self._cache.move_to_end(record["file_id"])
+        while len(self._cache) > self.cache_size:
+            self._cache.popitem(last=False)
+
+    def add(
+        self,
+        file_id: str,
+        path: str,
+        filename: str,
+        size: int,
+        mime: str,
+        sha256: Optional[str] = None,
+        user_id: Optional[str] = None,
+        created_at: Optional[float] = None,
+    ) -> dict:
+        """Record an upload; an existing record for file_id is kept.
+
+        Re-adding an existing file_id refreshes its ``last_used``.
+
+        Args:
+            file_id: Upload identifier
+            path: File path relative to the uploads directory
+            filename: Sanitized filename
+            size: Size in bytes
+            mime: Content type
+            sha256: Content hash
+            user_id: Owner of the upload
+            created_at: Upload time (default: now)
+
+        Returns:
+            The stored record
+        """
+        record = {
+            "file_id": file_id,
+            "path": path,
+            "filename": filename,
+            "size": size,
+            "mime": mime,
+            "sha256": sha256,
+            "user_id": user_id,
+            "created_at": created_at or time.time(),
+            "last_used": created_at or time.time(),
+        }
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    f"INSERT INTO uploads ({', '.join(_COLUMNS)}) "
+                    f"VALUES ({', '.join('?' * len(_COLUMNS))}) "
+                    "ON CONFLICT (file_id) "
+                    "DO UPDATE SET last_used = excluded.last_used",
+                    tuple(record[column] for column in _COLUMNS),
+                )
+            self._cache.pop(file_id, None)
+        return self.get(file_id) or record
+
+    def get(self, file_id: str) -> Optional[dict]:
+        """Return the record of an upload, or None if unknown."""
+        with self._lock:
+            record = self._cache.get(file_id)
+            if record is not None:
+                self._cache.move_to_end(file_id)
+                return record
+            row = (
+                self._connection()
+                .execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM uploads WHERE file_id = ?",
+                    (file_id,),
+                )
+                .fetchone()
+            )
+            if row is None:
+                return None
+            record = dict(zip(_COLUMNS, row))
+            self._cache_put(record)
+            return record
+
+    def touch(self, file_id: str) -> None:
+        """Mark an upload as used now (at most once per minute)."""
+        now = time.time()
+        with self._lock:
+            record = self._cache.get(file_id)
+            if record is not None and now - record["last_used"] < _TOUCH_INTERVAL:
+                return
+            conn = self._connection()
+            with conn:
+                conn.execute(
+                    "UPDATE uploads SET last_used = ? WHERE file_id = ? "
+                    "AND last_used < ?",
+                    (now, file_id, now - _TOUCH_INTERVAL),
+                )
+            if record is not None:
+                self._cache[file_id] = {**record, "last_used": now}
+
+    def remove(self, file_id: str) -> None:
+        """Delete the record of an upload."""
+        with self._lock:
+            conn = self._connection()
+            with conn:
+                conn.execute("DELETE FROM uploads WHERE file_id = ?", (file_id,))
+            self._cache.pop(file_id, None)
+
+    def list_uploads(
+        self,
+        user_id: Optional[str] = None,
+        limit: int = 100,
+        offset: int = 0,
+    ) -> list[dict]:
+        """List uploads, newest first, optionally for one user."""
+        sql = f"SELECT {', '.join(_COLUMNS)} FROM uploads"
+        params: tuple = ()
+        if user_id is not None:
+            sql += " WHERE user_id = ?"
+            params = (user_id,)
+        sql += " ORDER BY created_at DESC LIMIT ? OFFSET ?"
+        with self._lock:
+            rows = self._connection().execute(sql, (*params, limit, offset)).fetchall()
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def total_size(self, user_id: Optional[str] = None) -> int:
+        """Bytes of unique stored content, optionally for one user.
+
+        Aliases of the same content (same sha256) are counted once.
+        """
+        where, params = "", ()
+        if user_id is not None:
+            where, params = "WHERE user_id = ? ", (user_id,)
+        sql = (
+            "SELECT COALESCE(SUM(size), 0) FROM ("
+            f"SELECT MAX(size) AS size FROM uploads {where}"
+            "GROUP BY COALESCE(sha256, file_id))"
+        )
+        with self._lock:
+            return self._connection().execute(sql, params).fetchone()[0]
+
+    def has_content(self, sha256: str, user_id: Optional[str] = None) -> bool:
+        """Whether any upload (optionally of one user) stores this content."""
+        sql = "SELECT 1 FROM uploads WHERE sha256 = ?"
+        params: tuple = (sha256,)
+        if user_id is not None:
+            sql += " AND user_id = ?"
+            params += (user_id,)
+        with self._lock:
+            return (
+                self._connection().execute(f"{sql} LIMIT 1", params).fetchone()
+                is not None
+            )
+
+    def used_before(self, timestamp: float, limit: int = 1000) -> list[dict]:
+        """Uploads last used before ``timestamp``, least recently used first."""
+        with self._lock:
+            rows = (
+                self._connection()
+                .execute(
+                    f"SELECT {', '.join(_COLUMNS)} FROM uploads "
+                    "WHERE last_used < ? ORDER BY last_used LIMIT ?",
+                    (timestamp, limit),
+                )
+                .fetchall()
+            )
+        return [dict(zip(_COLUMNS, row)) for row in rows]
+
+    def close(self) -> None:
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+            self._cache.clear()
@@ -0,0 +1,249 @@
+"""Retention, garbage collection and quotas for the uploads directory.
+
+A background asyncio task periodically:
+- deletes uploads not used (uploaded again or served) for ``max_age`` seconds
+- evicts the least recently used uploads while the global quota is exceeded
+- removes orphaned blobs (no file_id alias left, e.g. after a crash between
+  storing and linking), abandoned partial chunked uploads and extracted
+  texts of deleted content
+
+Quotas count each stored content (sha256) once, however many file_ids alias
+it. Per-user quotas are checked at upload time (``check_quota``). Sweeps run
+in a worker thread so the event loop is never blocked by filesystem work;
+in-memory state (extraction cache, chunked uploads) is updated back on the
+event loop. Deletions hold the blob store's lock, so they never interleave
+with an upload storing and linking the same content.
+"""
+
+import asyncio
+import logging
+import os
+import time
+from typing import Any, Callable, Optional
+
+from util.blob_store import BlobStore
+from util.text_extract import ExtractionCache
+from util.upload_index import UploadIndex
+
+# Orphans younger than this may still be linked by an upload in progress
+_ORPHAN_GRACE_SECONDS = 3600
+
+
+class QuotaExceededError(ValueError):
+    """Raised when an upload would exceed a byte quota."""
+
+
+class UploadRetention:
+    """Background sweeper and quota enforcement for uploads."""
+
+    def __init__(
+        self,
+        index: UploadIndex,
+        blob_store: BlobStore,
+        partial_dir: str,
+        max_age: Optional[float] = 7 * 24 * 3600,
+        global_quota: Optional[int] = None,
+        user_quota: Optional[int] = None,
+        interval: float = 3600,
+        partial_max_age: float = 24 * 3600,
+        extraction_cache: Optional[ExtractionCache] = None,
+        on_partial_removed: Optional[Callable[[str], Any]] = None,
+    ):
+        """Initialize upload retention.
+
+        Args:
+            index: Upload metadata index
+            blob_store: Blob store holding the uploaded content
+            partial_dir: Directory of partial chunked uploads
+            max_age: Seconds an unused upload is kept (None keeps forever)
+            global_quota: Total bytes of all uploads (None: unlimited)
+            user_quota: Bytes per user (None: unlimited)
+            interval: Seconds between sweeps
+            partial_max_age: Seconds an idle partial upload is kept
+            extraction_cache: Cache of extracted document texts
+            on_partial_removed: Called on the event loop with the upload_id
+                of every swept partial upload
+        """
+        self.index = index
+        self.blob_store = blob_store
+        self.partial_dir = partial_dir
+        self.max_age = max_age
+        self.global_quota = global_quota
+        self.user_quota = user_quota
+        self.interval = interval
+        self.partial_max_age = partial_max_age
+        self.extraction_cache = extraction_cache
+        self.on_partial_removed = on_partial_removed
+        self._removed_partials: list[str] = []
+        self._removed_extractions: list[str] = []
+        self._task: Optional[asyncio.Task] = None
+
+    def check_quota(
+        self, user_id: Optional[str], size: int, sha256: Optional[str] = None
+    ) -> None:
+        """Reject an upload of ``size`` bytes that exceeds the user's quota.
+
+        The global quota is enforced by evicting the least recently used
+        uploads instead, so it never rejects uploads.
+
+        Args:
+            user_id: Owner of the upload
+            size: Size of the upload in bytes
+            sha256: Content hash, if known; content the user already stores
+                costs nothing
+
+        Raises:
+            QuotaExceededError: If the user's quota would be exceeded
+        """
+        if self.user_quota is None or not user_id:
+            return
+        if sha256 is not None and self.index.has_content(sha256, user_id):
+            return
+        used = self.index.total_size(user_id)
+        if used + size > self.user_quota:
+            raise QuotaExceededError(
+                f"Upload quota exceeded: {used + size} > {self.user_quota} bytes"
+            )
+
+    def _delete(self, record: dict) -> None:
+        with self.blob_store.lock:
+            try:
+                self.blob_store.unlink(record["file_id"], record.get("sha256"))
+            except OSError as e:
+                logging.warning(
+                    f"删除上传文件失败 - FileID: {record['file_id']}, Error: {e}"
+                )
+            self.index.remove(record["file_id"])
+
+    def _sweep_expired(self, now: float) -> int:
+        if not self.max_age:
+            return 0
+        deleted = 0
+        while True:
+            records = self.index.used_before(now - self.max_age)
+            if not records:
+                return deleted
+            for record in records:
+                self._delete(record)
+            deleted += len(records)
+
+    def _sweep_quota(self) -> int:
+        if self.global_quota is None:
+            return 0
+        excess = self.index.total_size() - self.global_quota
+        deleted = 0
+        while excess > 0:
+            # Least recently used first; used_before(inf) lists the whole index
+            records = self.index.used_before(float("inf"), limit=100)
+            if not records:
+                break
+            for record in records:
+                if excess <= 0:
+                    break
+                self._delete(record)
+                deleted += 1
+                # Content is freed only with its last alias
+                sha256 = record.get("sha256")
+                if not sha256 or not self.index.has_content(sha256):
+                    excess -= record["size"]
+        return deleted
+
+    def _sweep_orphans(self, now: float) -> int:
+        deleted = 0
+        for _, path in self.blob_store.iter_blobs():
+            try:
+                with self.blob_store.lock:
+                    stat = os.stat(path)
+                    if stat.st_nlink != 1 or now - stat.st_mtime <= _ORPHAN_GRACE_SECONDS:
+                        continue
+                    os.remove(path)
+                deleted += 1
+            except OSError:
+                continue
+        if os.path.isdir(self.partial_dir):
+            for name in os.listdir(self.partial_dir):
+                path = os.path.join(self.partial_dir, name)
+                # Owner files go with their partial file, or once stale alone
+                if name.endswith(".owner") and os.path.exists(path[: -len(".owner")]):
+                    continue
+                try:
+                    if now - os.stat(path).st_mtime <= self.partial_max_age:
+                        continue
+                    os.remove(path)
+                    if not name.endswith(".owner"):
+                        if os.path.exists(f"{path}.owner"):
+                            os.remove(f"{path}.owner")
+                        self._removed_partials.append(name)
+                        deleted += 1
+                except OSError:
+                    continue
+        if self.extraction_cache is not None:
+            for sha256 in list(self.extraction_cache.iter_hashes()):
+                if not self.blob_store.has_blob(sha256):
+                    try:
+                        os.remove(self.extraction_cache.path_for(sha256))
+                    except OSError:
+                        continue
+                    self._removed_extractions.append(sha256)
+                    deleted += 1
+        return deleted
+
+    def sweep(self) -> dict:
+        """Run one retention pass (blocking; called from a worker thread).
+
+        Returns:
+            dict with counts of expired, evicted and orphaned entries removed
+        """
+        now = time.time()
+        return {
+            "expired": self._sweep_expired(now),
+            "evicted": self._sweep_quota(),
+            "orphaned": self._sweep_orphans(now),
+        }
+
+    async def _run(self) -> None:
+        while True:
+            try:
+                result = await asyncio.to_thread(self.sweep)
+                removed, self._removed_partials = self._removed_partials, []
+                if self.on_partial_removed is not None:
+                    for upload_id in removed:
+                        self.on_partial_removed(upload_id)
+                removed, self._removed_extractions = self._removed_extractions, []
+                if self.extraction_cache is not None:
+                    for sha256 in removed:
+                        self.extraction_cache.forget(sha256)
+                if any(result.values()):
+                    logging.info(
+                        f"上传目录清理完成 - 过期: {result['expired']}, "
+                        f"超额淘汰: {result['evicted']}, 孤立文件: {result['orphaned']}"
+                    )
+            except Exception as e:
+                logging.error(f"上传目录清理失败 - Error: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        """Start the background sweep task."""
+        if self._task is None or self._task.done():
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> None:
+        """Stop the background sweep task."""
+        if self._task is not None:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+
+_upload_retention: Optional[UploadRetention] = None
+
+
+def set_upload_retention(retention: Optional[UploadRetention]) -> None:
+    """Register the process-wide upload retention (None to unset)."""
+    global _upload_retention
+    _upload_retention = retention
+
+
+def get_upload_retention() -> Optional[UploadRetention]:
+    """Return the process-wide upload retention, if any."""
+    return _upload_retention